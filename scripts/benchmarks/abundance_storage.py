@@ -0,0 +1,67 @@
+"""
+Compare the storage of the mixing proportions of a synthetic scene (spatially
+correlated, mostly dominated by one or two endmembers) as dense float64 CSV
+and ``.npy`` files and as `TopKAbundances`: file size, write and read times,
+and the largest and mean absolute errors of the proportions read back.
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from endmember_utils.storage import TopKAbundances
+from endmember_utils.synthetic import synthetic_cube
+
+shape, n_endmembers, n_features = (1000, 1000), 6, 10
+endmembers = np.random.default_rng(0).random((n_endmembers, n_features))
+_, proportions = synthetic_cube(
+    shape, endmembers=endmembers, contrast=6.0, random_state=0
+)
+A = proportions.reshape(-1, n_endmembers).astype(float)
+print(
+    f"{A.shape[0]} samples, {n_endmembers} endmembers; "
+    f"{np.mean(A < 1e-3):.0%} of the proportions below 1e-3"
+)
+directory = tempfile.mkdtemp()
+
+
+def csv(path):
+    path = f"{path}.csv"
+    pd.DataFrame(A).to_csv(path, index=False)
+    return path, lambda: pd.read_csv(path).to_numpy()
+
+
+def npy(path):
+    path = f"{path}.npy"
+    np.save(path, A)
+    return path, lambda: np.load(path)
+
+
+def top_k(k):
+    def write(path):
+        path = TopKAbundances.from_dense(A, k).save(path)
+        return path, lambda: TopKAbundances.load(path).to_dense()
+
+    return write
+
+
+formats = {"csv": csv, "npy": npy, **{f"top-{k}": top_k(k) for k in (1, 2, 3)}}
+header = f"{'format':>8}{'size (MiB)':>12}{'ratio':>8}{'write (s)':>11}{'read (s)':>10}"
+print(header + f"{'max error':>12}{'mean error':>12}")
+for name, write in formats.items():
+    start = time.perf_counter()
+    path, read = write(os.path.join(directory, f"proportions_{name}"))
+    write_time = time.perf_counter() - start
+    start = time.perf_counter()
+    A_read = read()
+    read_time = time.perf_counter() - start
+    size = os.path.getsize(path)
+    error = np.abs(A_read - A)
+    if name == "csv":
+        csv_size = size
+    print(
+        f"{name:>8}{size / (1 << 20):>12.1f}{csv_size / size:>8.1f}"
+        f"{write_time:>11.2f}{read_time:>10.2f}"
+        f"{error.max():>12.2e}{error.mean():>12.2e}"
+    )
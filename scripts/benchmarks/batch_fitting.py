@@ -0,0 +1,57 @@
+"""
+Time fitting AA to many small datasets (Panola-like: a few solutes in each of
+hundreds of catchments) one at a time with `archetypes.AA`, one at a time with
+the SPGD-AA of `endmember_utils` (`weighted_AA`), and all at once with
+`batch_AA`, and compare the RSS reached.
+"""
+
+import time
+import numpy as np
+from archetypes import AA
+from endmember_utils.analysis import batch_AA, weighted_AA
+
+aa_params = dict(
+    n_init=10,
+    max_iter=2000,
+    tol=1e-10,
+    method="pgd",
+    init="furthest_sum",
+    method_kwargs={"max_iter_optimizer": 25},
+    random_state=0,
+)
+n_datasets, n_features, n_archetypes = 300, 6, 3
+rng = np.random.default_rng(0)
+datasets = []
+for _ in range(n_datasets):
+    endmembers = rng.random((n_archetypes, n_features))
+    proportions = rng.dirichlet(np.ones(n_archetypes), rng.integers(15, 60))
+    noise = 0.01 * rng.normal(size=(len(proportions), n_features))
+    datasets.append(proportions @ endmembers + noise)
+
+n_looped = 30  # the loops are timed on the first datasets only
+print(f"{'method':>14}{'ms / dataset':>14}{'median RSS ratio':>18}{'max RSS ratio':>15}")
+reference = []
+start = time.perf_counter()
+for X in datasets[:n_looped]:
+    reference.append(AA(n_archetypes, **aa_params).fit(X).rss_)
+elapsed = time.perf_counter() - start
+reference = np.array(reference)
+print(f"{'archetypes':>14}{1e3 * elapsed / n_looped:>14.1f}{1:>18.4f}{1:>15.4f}")
+
+start = time.perf_counter()
+rss = [weighted_AA(X, n_archetypes, **aa_params)[0].rss_ for X in datasets[:n_looped]]
+elapsed = time.perf_counter() - start
+ratio = np.array(rss) / reference
+print(
+    f"{'weighted_AA':>14}{1e3 * elapsed / n_looped:>14.1f}"
+    f"{np.median(ratio):>18.4f}{ratio.max():>15.4f}"
+)
+
+start = time.perf_counter()
+aa_list, _ = batch_AA(datasets, n_archetypes, **aa_params)
+elapsed = time.perf_counter() - start
+ratio = np.array([aa.rss_ for aa in aa_list[:n_looped]]) / reference
+print(
+    f"{'batch_AA':>14}{1e3 * elapsed / n_datasets:>14.1f}"
+    f"{np.median(ratio):>18.4f}{ratio.max():>15.4f}"
+)
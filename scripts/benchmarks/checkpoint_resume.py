@@ -0,0 +1,76 @@
+"""
+Check that a checkpointed `multi_AA` sweep, interrupted at arbitrary times and
+resumed, gives exactly the fits of a plain `multi_AA` sweep.
+
+The sweep is interrupted by a timer after 0.05 s, then resumed from the
+checkpoint directory with a timer twice as long each time, until it finishes.
+Exits with status 1 if any fitted attribute differs.
+"""
+
+import signal
+import sys
+import tempfile
+import numpy as np
+from endmember_utils.analysis import multi_AA
+from endmember_utils.synthetic import synthetic
+
+aa_params = {
+    "n_init": 3,
+    "max_iter": 500,
+    "tol": 1e-10,
+    "method_kwargs": {"max_iter_optimizer": 25},
+    "init": "furthest_sum",
+    "method": "pgd",
+    "random_state": 42,
+}
+
+endmembers = np.array(
+    [
+        [1.3, 1.2, 1.0, 0.6, 0.3, 0.2, 0.2, 0.1],
+        [0.3, 0.4, 0.9, 1.3, 1.0, 0.5, 0.4, 0.2],
+        [0.2, 0.8, 1.2, 0.4, 0.3, 1.2, 0.9, 0.3],
+        [0.2, 0.3, 0.1, 0.2, 0.5, 0.9, 1.4, 1.0],
+    ]
+)
+X, _ = synthetic(500, endmembers=endmembers, sample_noise=0.02, random_state=0)
+archetype_numbers = range(1, 6)
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+aa_list, _ = multi_AA(X, archetype_numbers, **aa_params)
+
+signal.signal(signal.SIGALRM, interrupt)
+with tempfile.TemporaryDirectory() as checkpoint_dir:
+    timeout, interruptions = 0.05, 0
+    while True:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            resumed_list, _ = multi_AA(
+                X,
+                archetype_numbers,
+                checkpoint_dir=checkpoint_dir,
+                checkpoint_interval=0,
+                **aa_params,
+            )
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            break
+        except KeyboardInterrupt:
+            interruptions += 1
+            timeout *= 2
+
+print(f"checkpointed sweep resumed after {interruptions} interruptions")
+attributes = ["A_", "B_", "archetypes_", "n_iter_", "loss_", "rss_"]
+mismatches = [
+    f"{aa.n_archetypes} archetypes: {name}"
+    for aa, resumed in zip(aa_list, resumed_list)
+    for name in attributes
+    if not np.array_equal(getattr(aa, name), getattr(resumed, name))
+]
+for mismatch in mismatches:
+    print(f"differs from the plain sweep: {mismatch}", file=sys.stderr)
+if not mismatches:
+    print("all fits equal to the plain sweep")
+sys.exit(1 if mismatches else 0)
@@ -0,0 +1,63 @@
+"""
+Fit time of AA on data with repeated samples, on all samples (`weighted_AA` with
+unit weights) and on the unique samples weighted by their counts
+(`collapsed_AA`), for several duplication ratios, plus the RSS of both fits on
+the full data. Both use the same solver, so the speedup is the duplication
+ratio rather than a difference between implementations. Collapsing reorders the
+samples, which changes the furthest-sum initialization and thus the number of
+iterations, so the time per iteration is reported as well.
+"""
+
+import time
+import numpy as np
+from endmember_utils.analysis import collapsed_AA, weighted_AA
+from endmember_utils.synthetic import synthetic
+
+aa_params = {
+    "n_init": 3,
+    "max_iter": 2000,
+    "tol": 1e-10,
+    "method_kwargs": {"max_iter_optimizer": 25},
+    "init": "furthest_sum",
+    "method": "pgd",
+    "random_state": 42,
+}
+
+endmembers = np.array(
+    [
+        [1.3, 1.2, 1.0, 0.6, 0.3, 0.2, 0.2, 0.1],
+        [0.3, 0.4, 0.9, 1.3, 1.0, 0.5, 0.4, 0.2],
+        [0.2, 0.8, 1.2, 0.4, 0.3, 1.2, 0.9, 0.3],
+        [0.2, 0.3, 0.1, 0.2, 0.5, 0.9, 1.4, 1.0],
+    ]
+)
+n_samples = 40000
+
+print(
+    f"{'duplication':>12}{'full (ms/iter)':>16}{'collapsed (ms/iter)':>21}"
+    f"{'full RSS':>14}{'collapsed RSS':>15}"
+)
+for duplication in (1, 2, 5, 10, 20):
+    unique, _ = synthetic(
+        n_samples // duplication,
+        endmembers=endmembers,
+        sample_noise=0.02,
+        random_state=0,
+    )
+    rng = np.random.RandomState(0)
+    X = np.asarray(unique)[rng.randint(len(unique), size=n_samples)]
+
+    start = time.perf_counter()
+    aa, _ = weighted_AA(X, 4, **aa_params)
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    aa_collapsed, A, _ = collapsed_AA(X, 4, **aa_params)
+    collapsed_time = time.perf_counter() - start
+    collapsed_rss = np.sum((X - A @ aa_collapsed.archetypes_) ** 2)
+
+    print(
+        f"{duplication:>12}{1e3 * full_time / aa.n_iter_:>16.2f}"
+        f"{1e3 * collapsed_time / aa_collapsed.n_iter_:>21.2f}"
+        f"{aa.rss_:>14.6f}{collapsed_rss:>15.6f}"
+    )
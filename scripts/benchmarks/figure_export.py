@@ -0,0 +1,57 @@
+"""
+Time saving a 3D figure with Nazca-sized sample layers (samples, stems, links
+to the fitted points, endmembers and their simplex) to PDF and SVG, with every
+artist written as a vector object (`Figure.savefig`) and with the sample
+layers rasterized (`save_figure`), and compare the file sizes.
+"""
+
+import os
+import tempfile
+import time
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from endmember_utils.plot import Scatter, save_figure
+
+rng = np.random.default_rng(0)
+n_samples = 50000
+endmembers = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+proportions = rng.dirichlet(np.ones(len(endmembers)), n_samples)
+fitted = proportions @ endmembers
+samples = fitted + 0.05 * rng.normal(size=fitted.shape)
+
+
+def make_figure():
+    fig = plt.figure(figsize=(6, 6))
+    scatter = Scatter(fig.add_subplot(projection="3d"), ndim=3)
+    scatter.plot_samples(samples, markersize=1, color="tab:blue")
+    scatter.stem_samples(samples[::5], linewidth=0.3)
+    scatter.link_observed_vs_fitted(samples[::5], fitted[::5], linewidths=0.3)
+    scatter.plot_endmembers(
+        endmembers,
+        marker="*",
+        plot_ploygon=True,
+        polygon_kwargs={"edgecolors": "k", "facecolors": "none"},
+        markersize=12,
+        color="tab:red",
+    )
+    return fig
+
+
+directory = tempfile.mkdtemp()
+print(f"{'format':>8}{'mode':>12}{'save (s)':>10}{'size (MiB)':>12}")
+for file_format in ["pdf", "svg"]:
+    for mode in ["vector", "hybrid"]:
+        fig = make_figure()
+        path = os.path.join(directory, f"figure_{mode}.{file_format}")
+        start = time.perf_counter()
+        if mode == "vector":
+            fig.savefig(path, bbox_inches="tight")
+        else:
+            save_figure(fig, path, dpi=300, bbox_inches="tight")
+        elapsed = time.perf_counter() - start
+        plt.close(fig)
+        size = os.path.getsize(path) / (1 << 20)
+        print(f"{file_format:>8}{mode:>12}{elapsed:>10.2f}{size:>12.2f}")
@@ -0,0 +1,57 @@
+"""
+Compare the furthest-sum initialization of archetypes with its approximation
+`ApproxFurthestSum` on a large synthetic dataset: the time to initialize all the
+restarts, and the RSS of SPGD-AA fitted from each initialization.
+"""
+
+import time
+import numpy as np
+from archetypes.numpy._inits import furthest_sum
+from endmember_utils.analysis import weighted_AA
+from endmember_utils.initialization import ApproxFurthestSum
+from endmember_utils.synthetic import synthetic
+
+n_archetypes = 6
+n_init = 10
+aa_params = {
+    "n_init": n_init,
+    "max_iter": 100,
+    "tol": 1e-10,
+    "method_kwargs": {"max_iter_optimizer": 25},
+    "method": "pgd",
+    "random_state": 42,
+}
+
+endmembers = np.random.RandomState(0).uniform(0.1, 1.0, size=(n_archetypes, 50))
+for n_samples in (20000, 100000, 500000):
+    X, _ = synthetic(
+        n_samples,
+        endmembers=endmembers,
+        dirichlet_alpha=0.5,
+        sample_noise=0.02,
+        random_state=0,
+    )
+    X = np.ascontiguousarray(X)
+    print(f"{n_samples} samples, {n_init} restarts")
+
+    inits = {
+        "furthest_sum": "furthest_sum",
+        "approx": ApproxFurthestSum(random_state=0),
+    }
+    for name, init in inits.items():
+        rng = np.random.RandomState(42)
+        start = time.perf_counter()
+        for _ in range(n_init):
+            (furthest_sum if init == "furthest_sum" else init)(
+                X, n_archetypes, random_state=rng
+            )
+        elapsed = time.perf_counter() - start
+        if n_samples <= 100000:
+            aa, _ = weighted_AA(X, n_archetypes, init=init, **aa_params)
+            rss = f"{aa.rss_:.6f}"
+        else:
+            rss = "-"
+        print(
+            f"  {name:<14}init {elapsed:>8.3f} s, "
+            f"RSS after {aa_params['max_iter']} iterations {rss}"
+        )
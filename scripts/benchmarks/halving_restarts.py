@@ -0,0 +1,55 @@
+"""
+Compare AA with exhaustive restarts (`n_init` restarts, each run to convergence)
+with successive halving over more restarts (`halving_AA`), on the noisy synthetic
+dataset: fit time, total number of iterations and final RSS.
+"""
+
+import time
+import numpy as np
+from archetypes import AA
+from endmember_utils.analysis import halving_AA
+from endmember_utils.synthetic import synthetic
+
+aa_params = {
+    "max_iter": 2000,
+    "tol": 1e-10,
+    "method_kwargs": {"max_iter_optimizer": 25},
+    "init": "furthest_sum",
+    "method": "pgd",
+}
+
+endmembers = np.array(
+    [
+        [1.3, 1.2, 1.0, 0.6, 0.3, 0.2, 0.2, 0.1],
+        [0.3, 0.4, 0.9, 1.3, 1.0, 0.5, 0.4, 0.2],
+        [0.2, 0.8, 1.2, 0.4, 0.3, 1.2, 0.9, 0.3],
+        [0.2, 0.3, 0.1, 0.2, 0.5, 0.9, 1.4, 1.0],
+    ]
+)
+X, _ = synthetic(
+    1000,
+    endmembers=endmembers,
+    endmember_uncertainty=np.full_like(endmembers, 0.1),
+    sample_noise=0.1,
+    random_state=42,
+)
+
+print(f"{'':<24}{'time (s)':>10}{'iterations':>12}{'RSS':>20}")
+for random_state in range(3):
+    for n_init in (10, 50):
+        start = time.perf_counter()
+        aa = AA(4, n_init=n_init, random_state=random_state, **aa_params).fit(X)
+        elapsed = time.perf_counter() - start
+        # AA only keeps the iterations of the best restart
+        print(
+            f"{f'exhaustive, {n_init} inits':<24}{elapsed:>10.2f}{'-':>12}{aa.rss_:>20.10f}"
+        )
+
+    start = time.perf_counter()
+    aa, _, rounds = halving_AA(X, 4, 50, random_state=random_state, **aa_params)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{'halving, 50 restarts':<24}{elapsed:>10.2f}"
+        f"{rounds[-1]['total_iter']:>12}{aa.rss_:>20.10f}"
+    )
+    print()
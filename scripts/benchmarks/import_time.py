@@ -0,0 +1,36 @@
+"""
+Measure the time to import parts of `endmember_utils` in a fresh interpreter.
+Each statement is run in a new process several times and the median is reported,
+minus the startup time of an empty interpreter.
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+n_repeats = 5
+statements = [
+    "import endmember_utils",
+    "from endmember_utils.synthetic import synthetic",
+    "from endmember_utils.pipeline import Pipeline",
+    "from endmember_utils import match_endmembers; match_endmembers",
+    "from endmember_utils import multi_AA; import archetypes",
+    "from endmember_utils.plot import Scatter",
+    "from endmember_utils.plot import Scatter; import seaborn, scipy.spatial, mpl_toolkits.mplot3d",
+]
+
+
+def run_time(statement):
+    times = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+baseline = run_time("pass")
+print(f"interpreter startup: {baseline * 1000:.0f} ms")
+for statement in statements:
+    print(f"{(run_time(statement) - baseline) * 1000:7.0f} ms  {statement}")
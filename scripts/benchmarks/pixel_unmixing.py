@@ -0,0 +1,44 @@
+"""
+Time unmixing the pixels of a Jasper Ridge-like scene (100 x 100 pixels, 198
+bands, smooth abundance maps) with the endmembers of a fitted AA: with its
+``transform`` (projected gradient), with `unmix` (active set, started from the
+least squares solutions), and with `unmix_image` (the same, row by row).
+Reports the iterations per pixel and the largest difference to the
+abundances of `unmix`.
+"""
+
+import time
+import numpy as np
+from archetypes import AA
+from endmember_utils.unmixing import unmix, unmix_image
+
+rng = np.random.default_rng(0)
+lines, samples, n_bands, n_endmembers = 100, 100, 198, 4
+wavelengths = np.linspace(0, 1, n_bands)
+frequencies, phases = rng.random((2, n_endmembers, 1))
+endmembers = 0.3 + 0.2 * np.sin(2 * np.pi * (3 * frequencies * wavelengths + phases))
+y, x = np.mgrid[0:lines, 0:samples] / 100
+offsets = 6 * rng.random((n_endmembers, 2))
+logits = np.stack([np.sin(3 * x + a) + np.cos(4 * y + b) for a, b in offsets], -1)
+abundances = np.exp(4 * logits)
+abundances /= abundances.sum(axis=-1, keepdims=True)
+cube = abundances @ endmembers + 0.005 * rng.normal(size=(lines, samples, n_bands))
+X = cube.reshape(-1, n_bands)
+
+aa = AA(n_endmembers, method="pgd", max_iter=100, random_state=0).fit(X)
+# transform with the tolerance of the pipeline
+aa.set_params(max_iter=2000, tol=1e-10)
+reference, _ = unmix(X, aa.archetypes_)
+print(f"{'method':>22}{'time (ms)':>11}{'iterations / pixel':>20}{'max difference':>16}")
+runs = {
+    "AA.transform": lambda: (aa.transform(X), None),
+    "unmix": lambda: unmix(X, aa.archetypes_),
+    "unmix_image": lambda: unmix_image(cube, aa.archetypes_),
+}
+for name, run in runs.items():
+    start = time.perf_counter()
+    A, n_iter = run()
+    elapsed = time.perf_counter() - start
+    difference = np.abs(A.reshape(-1, n_endmembers) - reference).max()
+    iterations = "-" if n_iter is None else f"{n_iter.mean():.2f}"
+    print(f"{name:>22}{1e3 * elapsed:>11.1f}{iterations:>20}{difference:>16.2g}")
@@ -0,0 +1,81 @@
+"""
+Compare storing a reflectance scene (400 x 400 pixels, 198 bands) as float32
+with storing it quantized to uint16 and float16 (`quantize_cube`): the file
+size, the time of a chunked pass over the dequantized pixels (from the page
+cache, so memory rather than disk bandwidth), the error of the values, and the
+difference between the endmembers fitted by AA on a 100 x 100 crop of the
+original and of the dequantized scene (same seed). The AA fits are not
+converged, so the difference to a fit on the original perturbed by 1e-7 (below
+the float32 precision) is shown as the noise floor of the comparison.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from archetypes import AA
+from endmember_utils.evaluation import endmember_errors
+from endmember_utils.storage import MapWriter, QuantizedCube, quantize_cube
+from endmember_utils.storage import read_maps
+
+rng = np.random.default_rng(0)
+lines, samples, n_bands, n_endmembers = 400, 400, 198, 4
+wavelengths = np.linspace(0, 1, n_bands)
+frequencies, phases = rng.random((2, n_endmembers, 1))
+endmembers = 0.3 + 0.2 * np.sin(2 * np.pi * (3 * frequencies * wavelengths + phases))
+y, x = np.mgrid[0:lines, 0:samples] / 100
+offsets = 6 * rng.random((n_endmembers, 2))
+logits = np.stack([np.sin(3 * x + a) + np.cos(4 * y + b) for a, b in offsets], -1)
+abundances = np.exp(4 * logits)
+abundances /= abundances.sum(axis=-1, keepdims=True)
+cube = abundances @ endmembers + 0.005 * rng.normal(size=(lines, samples, n_bands))
+cube = cube.astype(np.float32)
+chunk_size = 16384
+
+
+def read_pass(read):
+    start = time.perf_counter()
+    total = 0.0
+    for first in range(0, lines * samples, chunk_size):
+        total += read(first, first + chunk_size).sum()
+    return time.perf_counter() - start
+
+
+aa_params = dict(n_init=1, max_iter=200, method="pgd", random_state=0)
+crop = (slice(0, 100), slice(0, 100))
+X_crop = cube[crop].reshape(-1, n_bands)
+reference = AA(n_endmembers, **aa_params).fit(X_crop).archetypes_
+perturbed = X_crop + 1e-7 * rng.uniform(-1, 1, X_crop.shape)
+fitted = AA(n_endmembers, **aa_params).fit(perturbed).archetypes_
+noise_floor = endmember_errors(reference, fitted)["sad"].max()
+
+with tempfile.TemporaryDirectory() as directory:
+    band_names = [f"Band {i + 1}" for i in range(n_bands)]
+    path = Path(directory) / "float32.npy"
+    with MapWriter(path, (lines, samples), band_names) as writer:
+        writer.write(0, cube.reshape(-1, n_bands))
+    pixels = read_maps(writer.path)[0].reshape(-1, n_bands)
+    print(
+        f"{'storage':>9}{'MiB':>7}{'pass (ms)':>11}{'max error':>11}{'RMSE':>10}"
+        f"{'endmember SAD':>15}"
+    )
+    elapsed = min(
+        read_pass(lambda a, b: np.asarray(pixels[a:b], dtype=np.float32))
+        for _ in range(3)
+    )
+    print(
+        f"{'float32':>9}{pixels.nbytes / 2**20:>7.1f}{1e3 * elapsed:>11.1f}"
+        f"{0:>11.2g}{0:>10.2g}{noise_floor:>15.2g}"
+    )
+    for dtype in ["uint16", "float16"]:
+        report = quantize_cube(cube, Path(directory) / f"{dtype}.npy", dtype=dtype)
+        quantized = QuantizedCube.load(report["path"])
+        elapsed = min(read_pass(quantized.pixels) for _ in range(3))
+        fitted = AA(n_endmembers, **aa_params).fit(
+            quantized[crop].reshape(-1, n_bands)
+        ).archetypes_
+        sad = endmember_errors(reference, fitted)["sad"].max()
+        print(
+            f"{dtype:>9}{quantized.nbytes / 2**20:>7.1f}{1e3 * elapsed:>11.1f}"
+            f"{report['max_error']:>11.2g}{report['rmse']:>10.2g}{sad:>15.2g}"
+        )
@@ -0,0 +1,251 @@
+"""
+Re-run the workflow of each shipped dataset (scaling, fit, matching) with the
+fixed seeds of the pipeline, and check that it is neither slower nor less
+accurate than recorded.
+
+For each dataset, the wall time of the workflow and the mean Euclidean and
+spectral angle distances (SAD) of the fitted endmembers to the reference ones
+(ground truth or literature) and to the stored ones in ``results/`` are
+measured. The run fails (exit status 1) if the time exceeds the recorded one
+by more than ``--time-tolerance``, if an error to the reference exceeds the
+recorded one by more than ``--error-tolerance``, or if the endmembers moved
+from the stored ones by more than ``--stored-tolerance``.
+
+The times are recorded in ``regression_baseline.json``, which is local to the
+machine and not committed. Without a recorded baseline, the errors are
+compared to those of the stored endmembers in ``results/``, so a fresh
+checkout checks the accuracy, and the baseline is recorded only if the checks
+pass. A run with ``--update`` records the times and errors without checking.
+
+Run from the root directory of the repo::
+
+    python scripts/benchmarks/regression.py
+    python scripts/benchmarks/regression.py panola nazca --repeat 3
+    python scripts/benchmarks/regression.py --update
+
+Datasets whose files are not available (e.g. Git LFS pointers that were not
+pulled) are skipped.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from endmember_utils import pipeline
+from endmember_utils.evaluation import endmember_errors
+
+BASELINE = Path(__file__).with_name("regression_baseline.json")
+AA_PARAMS = pipeline.GLOBAL_AA_PARAMS
+
+
+def synthetic_case(dataset_name):
+    def reference():
+        return pd.read_csv("data/synthetic/endmembers.csv", index_col=0)
+
+    def run():
+        endmembers, endmembers_fitted, _ = pipeline.synthetic_workflow(
+            dataset_name, 4, AA_PARAMS
+        )
+        return endmembers, endmembers_fitted
+
+    return {
+        "files": [
+            f"data/synthetic/{dataset_name}_samples.csv",
+            "data/synthetic/endmembers.csv",
+            f"results/synthetic/AA_{dataset_name}_endmembers.csv",
+        ],
+        "run": run,
+        "reference": reference,
+        "stored": lambda: pd.read_csv(
+            f"results/synthetic/AA_{dataset_name}_endmembers.csv", index_col=0
+        ),
+    }
+
+
+def jasper_run():
+    endmembers, _, endmembers_fitted_normalized = pipeline.jasper_workflow(
+        4, AA_PARAMS
+    )
+    return endmembers, endmembers_fitted_normalized
+
+
+def jasper_reference():
+    import scipy.io
+    from sklearn.preprocessing import normalize
+
+    return normalize(scipy.io.loadmat("data/jasper_ridge/end4.mat")["M"].T, axis=1)
+
+
+CASES = {
+    **{
+        f"synthetic-{name}": synthetic_case(name)
+        for name in ["noisefree", "noisy", "alpha=2", "alpha=4"]
+    },
+    "panola": {
+        "files": [
+            "data/panola/panola_data.csv",
+            "data/panola/panola_end_members.csv",
+            "results/panola/endmembers_fitted.csv",
+        ],
+        "run": lambda: pipeline.panola_workflow(3, AA_PARAMS),
+        "reference": lambda: pd.read_csv(
+            "data/panola/panola_end_members.csv", index_col=0
+        ),
+        "stored": lambda: pd.read_csv(
+            "results/panola/endmembers_fitted.csv", index_col=0
+        ),
+    },
+    "nazca": {
+        "files": [
+            "data/nazca/ggge20247-sup-001a-supinfo1a.xlsx",
+            "data/nazca/Dymond1981_endmember_fraction.csv",
+            "results/nazca/endmembers_fitted.csv",
+        ],
+        "run": lambda: pipeline.nazca_workflow(5, AA_PARAMS),
+        "reference": lambda: pd.read_csv(
+            "data/nazca/Dymond1981_endmember_fraction.csv", index_col=0
+        ),
+        "stored": lambda: pd.read_csv(
+            "results/nazca/endmembers_fitted.csv", index_col=0
+        ),
+    },
+    "jasper-ridge": {
+        "files": [
+            "data/jasper_ridge/end4.mat",
+            "data/jasper_ridge/jasperRidge2_R198.hdr",
+            "data/jasper_ridge/jasperRidge2_R198.img",
+            "results/jasper_ridge/endmembers_fitted_normalized.npy",
+        ],
+        "run": jasper_run,
+        "reference": jasper_reference,
+        "stored": lambda: np.load(
+            "results/jasper_ridge/endmembers_fitted_normalized.npy"
+        ),
+    },
+}
+
+
+def available(path) -> bool:
+    """Whether a file exists and is not a Git LFS pointer."""
+    path = Path(path)
+    if not path.is_file():
+        return False
+    with open(path, "rb") as f:
+        return not f.read(100).startswith(b"version https://git-lfs")
+
+
+def mean_errors(endmembers, endmembers_fitted) -> dict:
+    errors = endmember_errors(endmembers, endmembers_fitted)
+    return {metric: float(errors[metric].mean()) for metric in ["euclidean", "sad"]}
+
+
+def measure(case, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        endmembers, endmembers_fitted = case["run"]()
+        times.append(time.perf_counter() - start)
+    return {
+        "time": min(times),
+        "reference": mean_errors(endmembers, endmembers_fitted),
+        "stored": mean_errors(case["stored"](), endmembers_fitted),
+    }
+
+
+def check(name, record, baseline, args) -> list[str]:
+    """
+    Compare a record to the baseline, whose time may be missing.
+    """
+    failures = []
+    if "time" in baseline and record["time"] > baseline["time"] * (
+        1 + args.time_tolerance
+    ):
+        failures.append(
+            f"{name}: time {record['time']:.2f} s > {baseline['time']:.2f} s "
+            f"+ {args.time_tolerance:.0%}"
+        )
+    for metric, error in record["reference"].items():
+        recorded = baseline["reference"][metric]
+        if error > recorded + args.error_tolerance:
+            failures.append(
+                f"{name}: {metric} error to the reference {error:.3g} > {recorded:.3g}"
+            )
+    for metric, error in record["stored"].items():
+        if error > args.stored_tolerance:
+            failures.append(
+                f"{name}: {metric} distance to the stored results {error:.3g} "
+                f"> {args.stored_tolerance:.3g}"
+            )
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "datasets", nargs="*", help=f"default: all of {', '.join(CASES)}"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="runs per dataset, the fastest counts"
+    )
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--error-tolerance", type=float, default=1e-6)
+    parser.add_argument("--stored-tolerance", type=float, default=1e-4)
+    parser.add_argument("--update", action="store_true", help="record the baseline")
+    args = parser.parse_args(argv)
+    unknown = set(args.datasets) - set(CASES)
+    if unknown:
+        parser.error(f"unknown datasets: {', '.join(sorted(unknown))}")
+
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    failures = []
+    updated = False
+    print(
+        f"{'dataset':<20}{'time (s)':>10}{'recorded':>10}"
+        f"{'euclidean':>11}{'SAD':>10}{'vs stored':>11}  status"
+    )
+    for name in args.datasets or CASES:
+        case = CASES[name]
+        if not all(available(path) for path in case["files"]):
+            print(f"{name:<20}{'-':>10}{'-':>10}{'-':>11}{'-':>10}{'-':>11}  skipped")
+            continue
+        record = measure(case, args.repeat)
+        baseline = baselines.get(name)
+        if args.update:
+            baselines[name] = record
+            updated = True
+            status = "recorded"
+        else:
+            # without a baseline, the errors of the stored endmembers are the
+            # reference, and there is no time to compare to
+            expected = baseline or {
+                "reference": mean_errors(case["reference"](), case["stored"]())
+            }
+            case_failures = check(name, record, expected, args)
+            failures += case_failures
+            if case_failures:
+                status = "FAILED"
+            elif baseline is None:
+                baselines[name] = record
+                updated = True
+                status = "recorded"
+            else:
+                status = "ok"
+        recorded = "-" if baseline is None else f"{baseline['time']:.2f}"
+        print(
+            f"{name:<20}{record['time']:>10.2f}{recorded:>10}"
+            f"{record['reference']['euclidean']:>11.4g}{record['reference']['sad']:>10.4g}"
+            f"{record['stored']['sad']:>11.2g}  {status}"
+        )
+
+    if updated:
+        BASELINE.write_text(json.dumps(baselines, indent=2) + "\n")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Time redrawing a rotating 3D figure with several overlaid endmember sets and
+stems to the samples, as in the Nazca and synthetic result figures, drawn one
+artist per endmember with `axes.stem` and `axes.plot` (as `Scatter` used to)
+and drawn with the collections of `Scatter`.
+"""
+
+import time
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from endmember_utils.plot import Scatter
+
+rng = np.random.default_rng(0)
+n_sets, n_endmembers, n_stems = 12, 8, 1000
+endmember_sets = rng.normal(size=(n_sets, n_endmembers, 3))
+samples = rng.normal(size=(n_stems, 3))
+colors = plt.get_cmap("tab10").colors[:n_endmembers]
+labels = [f"EM{i + 1}" for i in range(n_endmembers)]
+n_frames = 20
+
+
+def draw_artists(ax):
+    markerline, stemlines, baseline = ax.stem(
+        *samples.T,
+        bottom=ax.get_zbound()[0],
+        linefmt="lightgray",
+        markerfmt="",
+        basefmt="",
+    )
+    markerline.remove()
+    baseline.remove()
+    for endmembers in endmember_sets:
+        for endmember, color, label in zip(endmembers, colors, labels):
+            ax.plot(
+                *([x] for x in endmember),
+                color=color,
+                marker="*",
+                linestyle="",
+                label=label,
+                markersize=8,
+            )
+
+
+def draw_collections(ax):
+    scatter = Scatter(ax, ndim=3)
+    scatter.stem_samples(samples)
+    for endmembers in endmember_sets:
+        scatter.plot_each_endmember(endmembers, "*", colors, labels, markersize=8)
+
+
+print(f"{'backend':>12}{'artists':>9}{'redraw (ms)':>13}")
+for name, draw in [("artists", draw_artists), ("collections", draw_collections)]:
+    fig = plt.figure(figsize=(6, 6))
+    ax = fig.add_subplot(projection="3d")
+    draw(ax)
+    fig.canvas.draw()
+    start = time.perf_counter()
+    for frame in range(n_frames):
+        ax.view_init(azim=frame * 360 / n_frames, elev=30)
+        fig.canvas.draw()
+    elapsed = (time.perf_counter() - start) / n_frames
+    print(f"{name:>12}{len(ax.get_children()):>9}{1e3 * elapsed:>13.1f}")
+    plt.close(fig)
@@ -0,0 +1,49 @@
+"""
+Time the batched unit-simplex projection (`project_simplex`, with a full or a
+partial sort) against projecting one row at a time in a Python loop, and
+against the compiled per-row projection of archetypes (Condat's algorithm).
+The shapes cover mixing proportions (many short rows) and archetype
+coefficients (few long rows), after a small step from the simplex (dense
+projections) or a large one (sparse projections, as usual for B in SPGD-AA).
+"""
+
+import timeit
+import numpy as np
+from archetypes.numpy._projection import unit_simplex_proj
+from endmember_utils.simplex import project_simplex
+
+
+def project_rows_loop(X):
+    return np.stack([project_simplex(x) for x in X])
+
+
+def project_rows_archetypes(X):
+    X = X.copy()
+    unit_simplex_proj(X)
+    return X
+
+
+methods = {
+    "loop": project_rows_loop,
+    "sort": lambda X: project_simplex(X, method="sort"),
+    "partial": lambda X: project_simplex(X, method="partial"),
+    "archetypes": project_rows_archetypes,
+}
+
+rng = np.random.default_rng(0)
+print(f"{'shape':>14}{'step':>7}" + "".join(f"{name + ' (ms)':>17}" for name in methods))
+for shape in [(10000, 4), (100000, 10), (10, 10000), (4, 100000), (1000, 1000)]:
+    for step in ("small", "large"):
+        X = rng.dirichlet(np.ones(shape[1]), size=shape[0])
+        X += (0.1 / np.sqrt(shape[1]) if step == "small" else 1.0) * rng.normal(size=shape)
+        reference = project_rows_archetypes(X)
+        times = []
+        for name, project in methods.items():
+            if name == "loop" and shape[0] > 10000:
+                times.append(float("nan"))
+                continue
+            assert np.allclose(project(X), reference), name
+            timer = timeit.Timer(lambda: project(X))
+            n, _ = timer.autorange()
+            times.append(1e3 * min(timer.repeat(3, n)) / n)
+        print(f"{str(shape):>14}{step:>7}" + "".join(f"{t:>17.3f}" for t in times))
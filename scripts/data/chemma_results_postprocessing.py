@@ -1,18 +1,10 @@
 """
-Match CHEMMA endmembers to real ones.
+Match CHEMMA endmembers to real ones, with the stage action of the pipeline
+(the same as ``endmembers run match-CHEMMA-noisefree match-CHEMMA-noisy``).
 """
 
-import numpy as np
-import pandas as pd
-from endmember_utils import match_endmembers
+from endmember_utils.pipeline import match_raw_output
 
-endmembers = pd.read_csv("data/synthetic/endmembers.csv", index_col=0)
 for dataset_name in ("noisefree", "noisy"):
 # for dataset_name in ("alpha=2", "alpha=4"):
-    chemma_endmembers = np.loadtxt(
-        f"results/synthetic/CHEMMA_{dataset_name}_endmembers_raw_output.csv", delimiter=","
-    )
-    matched_endmembers = match_endmembers(endmembers, chemma_endmembers)
-    matched_endmembers.to_csv(
-        f"results/synthetic/CHEMMA_{dataset_name}_endmembers.csv"
-    )
+    match_raw_output("CHEMMA", dataset_name)
@@ -2,24 +2,31 @@
 Compute the error between the true endmembers and the fitted endmembers for the synthetic datasets.
 """
 
-import numpy as np
 import pandas as pd
+from endmember_utils.evaluation import evaluate_results
 
-np.set_printoptions(precision=3)
+pd.set_option("display.precision", 3)
 
 true_endmembers = pd.read_csv("data/synthetic/endmembers.csv", index_col=0)
+methods = ("AA", "NMF", "CHEMMA", "EDAA")
+dataset_names = ("noisefree", "noisy")
 
-for dataset_name in ("noisefree", "noisy"):
-    for method in ("AA", "NMF", "CHEMMA", "EDAA"):
-        endmembers_fitted = pd.read_csv(
-            f"results/synthetic/{method}_{dataset_name}_endmembers.csv", index_col=0
-        )
-        distance = np.linalg.norm(
-            true_endmembers.values - endmembers_fitted.values,
-            axis=1,
-        )
+errors = evaluate_results(
+    true_endmembers,
+    methods=methods,
+    datasets=dataset_names,
+    results_dir="results/synthetic",
+    mixing_proportions={
+        "noisefree": "data/synthetic/mixing_proportions.csv",
+        "noisy": "data/synthetic/mixing_proportions.csv",
+    },
+)
+
+for dataset_name in dataset_names:
+    for method in methods:
+        table = errors[(errors["dataset"] == dataset_name) & (errors["method"] == method)]
         print(
             f"Dataset: {dataset_name}, Method: {method}",
-            distance,
-            sep="\n" 
+            table.drop(columns=["method", "dataset"]).set_index("endmember"),
+            sep="\n",
         )
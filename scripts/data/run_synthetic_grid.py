@@ -0,0 +1,43 @@
+"""
+Run the synthetic experiments (Dirichlet alpha, noise, shifted endmembers) as one
+resumable grid, instead of one hand-coded dataset at a time.
+Re-running the script after an interruption only runs the unfinished cells.
+"""
+
+import pandas as pd
+from endmember_utils.experiments import run_grid
+from endmember_utils.pipeline import GLOBAL_AA_PARAMS
+
+# the AA parameters of the pipeline, but seeded by the random_state of each
+# cell (see `run_cell`)
+aa_params = {
+    key: value for key, value in GLOBAL_AA_PARAMS.items() if key != "random_state"
+}
+
+param_grid = [
+    {  # noise-free and noisy datasets
+        "dirichlet_alpha": [1],
+        "endmember_noise": [0, 0.1],
+        "sample_noise": [0, 0.1],
+        "clip_negative": [True],
+        "random_state": [42],
+        "aa_params": [aa_params],
+    },
+    {  # different alpha, shifted or not
+        "dirichlet_alpha": [1, 2, 4],
+        "offset": [0, 10],
+        "random_state": [42],
+        "aa_params": [aa_params],
+    },
+]
+
+if __name__ == "__main__":
+    endmembers = pd.read_csv("data/synthetic/endmembers.csv", index_col=0)
+    results = run_grid(
+        endmembers,
+        param_grid,
+        checkpoint_dir="results/synthetic/grid_checkpoints",
+        verbose=True,
+    )
+    results.to_csv("results/synthetic/grid_results.csv", index=False)
+    print(results.drop(columns=["cell", "aa_params"]))
@@ -8,7 +8,7 @@ from sklearn.preprocessing import normalize
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-from endmember_utils.plot import Scatter
+from endmember_utils.plot import Scatter, save_figure
 
 # Change default behavior of matplotlib
 plt.rcParams["font.family"] = "Arial"
@@ -149,7 +149,8 @@ for label, ax in zip("ab", axs):
 
 plt.show()
 
-fig.savefig(
+save_figure(
+    fig,
     "images/nazca_other_perspectives.pdf",
     #bbox_inches="tight",
     #bbox_extra_artists=[axs[0].xaxis.label],
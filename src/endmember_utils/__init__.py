@@ -1 +1,69 @@
-from .analysis import *
\ No newline at end of file
+"""
+Utilities for end-member mixing analysis with archetypal analysis.
+
+The public API is available at the top level, e.g.
+``from endmember_utils import multi_AA``, but submodules (and their heavy
+dependencies, such as archetypes, scikit-learn and matplotlib) are only imported
+when one of their names is first accessed.
+"""
+
+import importlib
+
+_exports = {
+    "aio": ["multi_AA_async", "AsyncFit", "FitCancelled"],
+    "analysis": [
+        "multi_AA",
+        "halving_AA",
+        "weighted_AA",
+        "collapsed_AA",
+        "batch_AA",
+        "collapse_duplicates",
+        "consensus_archetypes",
+        "update_AA",
+        "ReducedAA",
+        "normalize_losses",
+        "spectral_angle_distances",
+        "match_endmembers",
+    ],
+    "evaluation": [
+        "endmember_errors",
+        "proportion_errors",
+        "evaluate",
+        "evaluate_results",
+        "load_results",
+    ],
+    "experiments": ["run_cell", "run_grid"],
+    "initialization": ["ApproxFurthestSum"],
+    "pipeline": ["Pipeline", "Stage"],
+    "plot": ["EndmemberHeatmap", "Scatter", "save_figure"],
+    "profiling": ["profile", "Profiler"],
+    "residuals": ["residual_summary", "residual_norms"],
+    "simplex": ["project_simplex"],
+    "storage": [
+        "MapWriter",
+        "write_maps",
+        "read_maps",
+        "quantize_cube",
+        "QuantizedCube",
+        "TopKAbundances",
+    ],
+    "unmixing": ["unmix", "unmix_image"],
+}
+_submodules = {"cli", "synthetic", *_exports}
+_origins = {name: module for module, names in _exports.items() for name in names}
+
+__all__ = sorted(_origins)
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _origins:
+        value = getattr(importlib.import_module(f".{_origins[name]}", __name__), name)
+        globals()[name] = value  # cache, so __getattr__ is not called again
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _submodules | set(_origins))
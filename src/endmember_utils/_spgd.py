@@ -0,0 +1,477 @@
+"""
+A resumable implementation of SPGD-AA (the ``method="pgd"`` of `archetypes.AA`).
+
+`archetypes.AA` runs each restart to convergence in one call. Here the state of
+a run (A, B, step sizes, losses) is kept in an object that can be advanced by
+any number of iterations, which the schedulers in `endmember_utils.analysis`
+build on. The updates follow archetypes: alternate projected gradient steps on
+A and B with a backtracking step size, and stop when the RSS changes by less
+than `tol`. Gradients are computed from the residuals, without the
+(n_samples, n_samples) Gram matrix. Samples can be weighted, e.g. by how many
+times they occur in the data, in which case the RSS is the weighted sum of the
+squared residual norms.
+"""
+
+import functools
+import numpy as np
+from archetypes.numpy._projection import unit_simplex_proj
+
+
+class SPGDRun:
+    """
+    The state of one SPGD-AA run.
+
+    Attributes
+    ----------
+    X: ndarray of shape (n_samples, n_features)
+        The data, C-contiguous.
+    A: ndarray of shape (n_samples, n_archetypes)
+        The mixing proportions.
+    B: ndarray of shape (n_archetypes, n_samples)
+        The archetype coefficients.
+    sample_weight: ndarray of shape (n_samples,) or None
+        The weights of the samples in the RSS, or None for unit weights.
+    archetypes: ndarray of shape (n_archetypes, n_features)
+        ``B @ X``.
+    rss: float
+        The current residual sum of squares.
+    loss: list of float
+        The RSS after each iteration, starting with the initial one.
+    n_iter: int
+        The number of iterations run.
+    converged: bool
+        Whether the last iteration changed the RSS by less than the tolerance.
+    """
+
+    def __init__(
+        self,
+        X: np.ndarray,
+        A: np.ndarray,
+        B: np.ndarray,
+        *,
+        sample_weight: np.ndarray | None = None,
+        step_size: float = 1.0,
+        max_iter_optimizer: int = 10,
+        beta: float = 0.5,
+        **kwargs,
+    ) -> None:
+        self.X = X
+        self.A = np.ascontiguousarray(A, dtype=X.dtype)
+        self.B = np.ascontiguousarray(B, dtype=X.dtype)
+        self.sample_weight = sample_weight
+        self.archetypes = self.B @ X
+        self.residuals = self.A @ self.archetypes - X
+        self.rss = self._rss(self.residuals)
+        self.loss = [self.rss]
+        self.n_iter = 0
+        self.converged = False
+        self.step_size_A = step_size
+        self.step_size_B = step_size
+        self.max_iter_optimizer = max_iter_optimizer
+        self.beta = beta
+
+    def step(self, n_iter: int, tol: float) -> bool:
+        """
+        Run up to `n_iter` iterations, stopping early at convergence.
+
+        Returns
+        -------
+        converged: bool
+            Whether the run has converged.
+        """
+        for _ in range(n_iter):
+            if self.converged:
+                break
+            self._update_A()
+            self._update_B()
+            self.n_iter += 1
+            self.converged = abs(self.loss[-1] - self.rss) < tol
+            self.loss.append(self.rss)
+        return self.converged
+
+    def _update_A(self) -> None:
+        # The rows of A are independent, so the weights only scale the gradient
+        # of each row; leaving them out keeps light rows from being stalled by
+        # the step size of heavy ones, and the line search still uses the
+        # weighted RSS.
+        gradient = self.residuals @ self.archetypes.T
+        A_new, residuals, rss, self.step_size_A = self._line_search(
+            self.A, gradient, self.step_size_A, lambda A: A @ self.archetypes
+        )
+        if A_new is not None:
+            self.A, self.residuals, self.rss = A_new, residuals, rss
+
+    def _update_B(self) -> None:
+        residuals = self.residuals
+        if self.sample_weight is not None:
+            residuals = self.sample_weight[:, None] * residuals
+        gradient = (self.A.T @ residuals) @ self.X.T
+        B_new, residuals, rss, self.step_size_B = self._line_search(
+            self.B, gradient, self.step_size_B, lambda B: self.A @ (B @ self.X)
+        )
+        if B_new is not None:
+            self.B, self.residuals, self.rss = B_new, residuals, rss
+            self.archetypes = self.B @ self.X
+
+    def _line_search(self, M, gradient, step_size, reconstruct):
+        """
+        Shrink the step size until the projected step decreases the RSS.
+        Return the new matrix (None if no step improved), its residuals and
+        RSS, and the step size for the next iteration.
+        """
+        for _ in range(self.max_iter_optimizer):
+            M_new = M - step_size * gradient
+            unit_simplex_proj(M_new)
+            residuals = reconstruct(M_new)
+            residuals -= self.X
+            rss = self._rss(residuals)
+            if rss < self.rss:
+                return M_new, residuals, rss, step_size / self.beta
+            step_size *= self.beta
+        return None, None, None, step_size
+
+    def _rss(self, residuals: np.ndarray) -> float:
+        if self.sample_weight is None:
+            return _squared_norm(residuals)
+        return float(self.sample_weight @ np.einsum("ij,ij->i", residuals, residuals))
+
+
+class BatchSPGDRun:
+    """
+    SPGD-AA runs on a batch of datasets with the same shape, updated together.
+
+    The updates are those of `SPGDRun`, on stacked arrays with a step size per
+    run, so that many small problems cost a few large matrix products per
+    iteration instead of many small ones. Runs leave the batch as they
+    converge. Datasets with fewer samples can be padded, e.g. with copies of
+    one of their samples, with zero weights.
+
+    Attributes
+    ----------
+    X: ndarray of shape (n_runs, n_samples, n_features)
+        The data of each run.
+    A: ndarray of shape (n_runs, n_samples, n_archetypes)
+        The mixing proportions.
+    B: ndarray of shape (n_runs, n_archetypes, n_samples)
+        The archetype coefficients.
+    sample_weight: ndarray of shape (n_runs, n_samples) or None
+        The weights of the samples in the RSS, or None for unit weights.
+    archetypes: ndarray of shape (n_runs, n_archetypes, n_features)
+        ``B @ X``.
+    rss: ndarray of shape (n_runs,)
+        The current residual sum of squares of each run.
+    loss: list of list of float
+        The RSS of each run after each of its iterations, starting with the
+        initial one.
+    n_iter: ndarray of shape (n_runs,)
+        The number of iterations run.
+    converged: ndarray of shape (n_runs,)
+        Whether the last iteration of each run changed its RSS by less than the
+        tolerance.
+    """
+
+    def __init__(
+        self,
+        X: np.ndarray,
+        A: np.ndarray,
+        B: np.ndarray,
+        *,
+        sample_weight: np.ndarray | None = None,
+        step_size: float = 1.0,
+        max_iter_optimizer: int = 10,
+        beta: float = 0.5,
+        **kwargs,
+    ) -> None:
+        n_runs = len(X)
+        self.X = np.ascontiguousarray(X)
+        self.A = np.array(A, dtype=X.dtype, order="C")
+        self.B = np.array(B, dtype=X.dtype, order="C")
+        self.sample_weight = sample_weight
+        self.archetypes = self.B @ self.X
+        residuals = self.A @ self.archetypes - self.X
+        self.rss = _batch_rss(residuals, sample_weight)
+        self.loss = [[rss] for rss in self.rss.tolist()]
+        self.n_iter = np.zeros(n_runs, dtype=int)
+        self.converged = np.zeros(n_runs, dtype=bool)
+        self.step_size_A = np.full(n_runs, float(step_size))
+        self.step_size_B = np.full(n_runs, float(step_size))
+        self.max_iter_optimizer = max_iter_optimizer
+        self.beta = beta
+        self._residuals = residuals
+
+    def step(self, n_iter: int, tol: float) -> bool:
+        """
+        Run up to `n_iter` iterations of each run, stopping each run early at
+        its convergence.
+
+        Returns
+        -------
+        converged: bool
+            Whether all the runs have converged.
+        """
+        active = np.flatnonzero(~self.converged)
+        batch = self._take(active)
+        for _ in range(n_iter):
+            if not len(active):
+                break
+            previous_rss = batch["rss"].copy()
+            self._update_A(batch)
+            self._update_B(batch)
+            self.n_iter[active] += 1
+            for i, rss in zip(active.tolist(), batch["rss"].tolist()):
+                self.loss[i].append(rss)
+            converged = np.abs(previous_rss - batch["rss"]) < tol
+            if converged.any():
+                self._put(active, batch)
+                self.converged[active[converged]] = True
+                batch = {key: value[~converged] for key, value in batch.items()}
+                active = active[~converged]
+        self._put(active, batch)
+        return bool(self.converged.all())
+
+    def _take(self, runs: np.ndarray) -> dict:
+        """Copy the state of `runs` into a working batch."""
+        batch = {
+            "X": self.X[runs],
+            "A": self.A[runs],
+            "B": self.B[runs],
+            "archetypes": self.archetypes[runs],
+            "residuals": self._residuals[runs],
+            "rss": self.rss[runs],
+            "step_size_A": self.step_size_A[runs],
+            "step_size_B": self.step_size_B[runs],
+        }
+        if self.sample_weight is not None:
+            batch["sample_weight"] = self.sample_weight[runs]
+        return batch
+
+    def _put(self, runs: np.ndarray, batch: dict) -> None:
+        """Copy the state of a working batch back into `runs`."""
+        for key in ["A", "B", "archetypes", "rss", "step_size_A", "step_size_B"]:
+            getattr(self, key)[runs] = batch[key]
+        self._residuals[runs] = batch["residuals"]
+
+    def _update_A(self, batch: dict) -> None:
+        archetypes = batch["archetypes"]
+        gradient = batch["residuals"] @ archetypes.transpose(0, 2, 1)
+        self._line_search(
+            batch, "A", gradient, lambda select, A: A @ select(archetypes)
+        )
+
+    def _update_B(self, batch: dict) -> None:
+        residuals = batch["residuals"]
+        if "sample_weight" in batch:
+            residuals = batch["sample_weight"][:, :, None] * residuals
+        X = batch["X"]
+        gradient = (batch["A"].transpose(0, 2, 1) @ residuals) @ X.transpose(0, 2, 1)
+        A = batch["A"]
+        accepted = self._line_search(
+            batch, "B", gradient, lambda select, B: select(A) @ (B @ select(X))
+        )
+        if len(accepted) == len(X):
+            batch["archetypes"] = batch["B"] @ X
+        else:
+            batch["archetypes"][accepted] = batch["B"][accepted] @ X[accepted]
+
+    def _line_search(self, batch, name, gradient, reconstruct) -> np.ndarray:
+        """
+        Shrink the step size of each run until its projected step decreases
+        its RSS, and update the runs that improved. Return their indices in
+        the batch.
+        """
+        M = batch[name]
+        step_size = batch[f"step_size_{name}"]
+        weights = batch.get("sample_weight")
+        searching = np.arange(len(M))
+        accepted = []
+        for _ in range(self.max_iter_optimizer):
+            if not len(searching):
+                break
+            # views while all runs are searching, which is the usual case
+            if len(searching) == len(M):
+                select = _all
+            else:
+                select = functools.partial(np.take, indices=searching, axis=0)
+            M_new = M if select is _all else select(M)
+            M_new = M_new - select(step_size)[:, None, None] * select(gradient)
+            unit_simplex_proj(M_new.reshape(-1, M_new.shape[-1]))
+            residuals = reconstruct(select, M_new)
+            residuals -= select(batch["X"])
+            rss = _batch_rss(residuals, None if weights is None else select(weights))
+            improved = rss < select(batch["rss"])
+            runs = searching[improved]
+            if select is _all and improved.all():
+                batch[name], batch["residuals"], batch["rss"] = M_new, residuals, rss
+                M = M_new
+            else:
+                M[runs] = M_new[improved]
+                batch["residuals"][runs] = residuals[improved]
+                batch["rss"][runs] = rss[improved]
+            step_size[runs] /= self.beta
+            step_size[searching[~improved]] *= self.beta
+            accepted.append(runs)
+            searching = searching[~improved]
+        return np.concatenate(accepted) if accepted else np.empty(0, dtype=int)
+
+
+def _all(array: np.ndarray) -> np.ndarray:
+    return array
+
+
+def _batch_rss(residuals: np.ndarray, sample_weight: np.ndarray | None) -> np.ndarray:
+    squared_norms = np.einsum("bij,bij->bi", residuals, residuals)
+    if sample_weight is not None:
+        squared_norms *= sample_weight
+    return squared_norms.sum(axis=1)
+
+
+def init_runs(X: np.ndarray, aa, n_runs: int, rng) -> list[SPGDRun]:
+    """
+    Initialize `n_runs` runs the same way `aa` initializes its restarts.
+
+    Parameters
+    ----------
+    X: ndarray of shape (n_samples, n_features)
+        The data, C-contiguous.
+    aa: archetypes.AA
+        An (unfitted) AA object, giving the initialization and optimizer
+        parameters.
+    n_runs: int
+        The number of runs.
+    rng: RandomState
+        The random number generator, shared by the runs.
+    """
+    method_kwargs = {} if aa.method_kwargs is None else aa.method_kwargs
+    runs = []
+    for _ in range(n_runs):
+        A, B, _ = aa._init_archetypes(X, rng)
+        runs.append(SPGDRun(X, A, B, **method_kwargs))
+    return runs
+
+
+class Restarts:
+    """
+    The `n_init` restarts of `aa`, run one after the other, keeping the best.
+
+    The restarts can be advanced by any number of iterations.
+
+    Parameters
+    ----------
+    X: ndarray of shape (n_samples, n_features)
+        The data, C-contiguous.
+    aa: archetypes.AA
+        An (unfitted) AA object, giving the initialization and optimizer
+        parameters.
+    sample_weight: ndarray of shape (n_samples,), optional
+        The weights of the samples in the RSS.
+
+    Attributes
+    ----------
+    restart: int
+        The index of the current restart, -1 before the first one.
+    run: SPGDRun or None
+        The current run.
+    best: SPGDRun or None
+        The best finished run.
+    """
+
+    def __init__(
+        self, X: np.ndarray, aa, *, sample_weight: np.ndarray | None = None
+    ) -> None:
+        from sklearn.utils import check_random_state
+
+        self.X = X
+        self.aa = aa
+        self.sample_weight = sample_weight
+        self.method_kwargs = {} if aa.method_kwargs is None else aa.method_kwargs
+        self.rng = check_random_state(aa.random_state)
+        self.restart = -1
+        self.run = None
+        self.best = None
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether all the restarts have finished.
+        """
+        return self.restart == self.aa.n_init - 1 and self._finished(self.run)
+
+    def step(self, n_iter: int) -> None:
+        """
+        Run up to `n_iter` iterations of the current restart, starting the next
+        restart first if the current one has finished.
+        """
+        if self.run is None or self._finished(self.run):
+            self.restart += 1
+            A, B, _ = self.aa._init_archetypes(self.X, self.rng)
+            self.run = self._new_run(A, B)
+        run = self.run
+        run.step(min(n_iter, self.aa.max_iter - run.n_iter), self.aa.tol)
+        if self._finished(run):
+            if self.aa.verbose:
+                print(
+                    f"Initialization {self.restart + 1}: RSS = {run.rss}, "
+                    f"{run.n_iter} iterations"
+                )
+            if self.best is None or run.rss < self.best.rss:
+                self.best = run
+
+    def _new_run(self, A: np.ndarray, B: np.ndarray) -> SPGDRun:
+        return SPGDRun(
+            self.X, A, B, sample_weight=self.sample_weight, **self.method_kwargs
+        )
+
+    def _finished(self, run: SPGDRun) -> bool:
+        return run.converged or run.n_iter >= self.aa.max_iter
+
+
+def fit_runs(
+    X: np.ndarray,
+    aa,
+    *,
+    sample_weight: np.ndarray | None = None,
+) -> SPGDRun:
+    """
+    Run the `n_init` restarts of `aa` to convergence, one after the other, and
+    return the best one.
+
+    Parameters
+    ----------
+    X: ndarray of shape (n_samples, n_features)
+        The data, C-contiguous.
+    aa: archetypes.AA
+        An (unfitted) AA object, giving the initialization and optimizer
+        parameters.
+    sample_weight: ndarray of shape (n_samples,), optional
+        The weights of the samples in the RSS.
+    """
+    restarts = Restarts(X, aa, sample_weight=sample_weight)
+    while not restarts.done:
+        restarts.step(aa.max_iter)
+    return restarts.best
+
+
+def set_fitted_attributes(aa, data, run: SPGDRun) -> None:
+    """
+    Store the result of a run in `aa` as if `aa.fit` had produced it, so that
+    `aa.transform` and the usual attributes (`archetypes_`, `rss_`, ...) work.
+    """
+    aa.A_ = run.A
+    aa.B_ = run.B
+    aa.archetypes_ = run.archetypes
+    aa.n_iter_ = run.n_iter
+    aa.loss_ = run.loss
+    aa.rss_ = run.rss
+    aa.similarity_degree_ = aa.A_
+    aa.archetypes_similarity_degree_ = aa.B_
+    aa.n_archetypes_ = aa.B_.shape[0]
+    aa.labels_ = np.argmax(aa.A_, axis=1)
+    aa.reconstruction_error_ = aa.rss_
+    aa.n_features_in_ = run.X.shape[1]
+    if hasattr(data, "columns"):
+        aa.feature_names_in_ = np.asarray(data.columns, dtype=object)
+
+
+def _squared_norm(x: np.ndarray) -> float:
+    x = x.ravel()
+    return float(np.dot(x, x))
@@ -0,0 +1,178 @@
+"""
+Asynchronous counterparts of the fitting functions, for notebooks and services.
+
+Fits run in an executor, so the event loop (and e.g. interactive figures in a
+notebook) stays responsive. They report their progress as an async iterator
+and can be cancelled::
+
+    fit = multi_AA_async(X, range(1, 9), **aa_params)
+    async for event in fit:
+        losses[event["n_archetypes"]] = event["loss"]
+        line.set_data(*zip(*sorted(losses.items())))
+        fig.canvas.draw_idle()
+    aa_list, transformed_data_list = await fit
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor
+from typing import Callable, Iterable
+from numpy.typing import ArrayLike
+
+
+class FitCancelled(Exception):
+    """
+    Raised in the executor by the progress callback of a cancelled fit, to
+    stop it; awaiting the fit then raises `asyncio.CancelledError`.
+    """
+
+
+class AsyncFit:
+    """
+    A fit running in an executor.
+
+    Iterate over it (``async for``) to receive its progress events, await it to
+    get its result, and call `cancel` to stop it. Cancelling the task awaiting
+    it also stops the fit.
+
+    Parameters
+    ----------
+    function : callable
+        The fit, called in the executor as ``function(report)``, where
+        ``report(event)`` sends a progress event to the iterator and raises
+        `FitCancelled` once the fit is cancelled.
+    executor : concurrent.futures.Executor, default=None
+        The executor, the default executor of the event loop if None. It must
+        run the fit in a thread of this process, e.g. a `ThreadPoolExecutor`.
+    """
+
+    def __init__(self, function: Callable, executor: Executor | None = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._cancelled = threading.Event()
+        self._finished = False
+        self._future = self._loop.run_in_executor(executor, self._run, function)
+
+    def cancel(self) -> None:
+        """
+        Stop the fit at its next progress event.
+        """
+        self._cancelled.set()
+        # the fit then ends with FitCancelled, which nobody needs to retrieve
+        self._future.add_done_callback(
+            lambda future: future.cancelled() or future.exception()
+        )
+
+    def cancelled(self) -> bool:
+        """
+        Whether the fit was cancelled.
+        """
+        return self._cancelled.is_set()
+
+    def done(self) -> bool:
+        """
+        Whether the fit has finished, was cancelled or failed.
+        """
+        return self._future.done()
+
+    async def __aiter__(self):
+        # the end of the events is only sent once, later iterations stop here
+        while not self._finished:
+            event = await self._events.get()
+            if event is None:
+                self._finished = True
+            else:
+                yield event
+
+    def __await__(self):
+        return self._result().__await__()
+
+    async def _result(self):
+        try:
+            return await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        except FitCancelled:
+            raise asyncio.CancelledError("The fit was cancelled.") from None
+
+    def _run(self, function: Callable):
+        try:
+            return function(self._report)
+        finally:
+            self._loop.call_soon_threadsafe(self._events.put_nowait, None)
+
+    def _report(self, event: dict) -> None:
+        if self._cancelled.is_set():
+            raise FitCancelled("The fit was cancelled.")
+        self._loop.call_soon_threadsafe(self._events.put_nowait, event)
+
+
+def multi_AA_async(
+    data: ArrayLike,
+    archetype_numbers: Iterable[int],
+    *,
+    executor: Executor | None = None,
+    **aa_kwargs,
+) -> AsyncFit:
+    """
+    Run `endmember_utils.analysis.multi_AA` in an executor, reporting progress
+    after each restart.
+
+    Must be called from a running event loop, e.g. in a notebook cell.
+
+    Parameters
+    ----------
+    data : array-like
+        The data to be decomposed.
+    archetype_numbers : iterable of int
+        The numbers of archetypes to use.
+    executor : concurrent.futures.Executor, default=None
+        See `AsyncFit`.
+    aa_kwargs : dict
+        Keyword arguments to pass to the AA constructor.
+
+    Returns
+    -------
+    fit : AsyncFit
+        Iterating over it gives the progress events, dicts with the number of
+        archetypes (``n_archetypes``), the restart (``restart``), and the
+        number of iterations (``n_iter``) and RSS (``loss``) of the restart.
+        Awaiting it gives the result of `multi_AA`: the fitted AA objects and
+        the transformed data.
+
+    Notes
+    -----
+    The restarts (``n_init``) are fitted one at a time by `archetypes.AA`,
+    drawing their initializations from one random state in turn as
+    ``AA.fit`` does, so the fits are the same as those of `multi_AA`. A fit
+    is only cancelled between two restarts.
+    """
+    archetype_numbers = list(archetype_numbers)
+
+    def fit(report):
+        from .analysis import _fit_restarts
+        from .initialization import AA
+
+        aa_list = []
+        transformed_data_list = []
+        for n_archetypes in archetype_numbers:
+            aa = AA(n_archetypes, **aa_kwargs)
+            aa._validate_params()
+            aa = _fit_restarts(
+                aa,
+                data,
+                callback=lambda restart, run: report(
+                    {
+                        "n_archetypes": n_archetypes,
+                        "restart": restart,
+                        "n_iter": run.n_iter_,
+                        "loss": run.rss_,
+                    }
+                ),
+            )
+            aa_list.append(aa)
+            transformed_data_list.append(aa.A_)
+        return aa_list, transformed_data_list
+
+    return AsyncFit(fit, executor)
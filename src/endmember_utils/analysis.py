@@ -1,16 +1,25 @@
 """
 Utilities for data analysis and AA.
+
+`archetypes`, scikit-learn and pandas are imported in the functions that use
+them, so that importing this module stays cheap.
 """
 
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 from typing import Iterable, Literal
 from numpy.typing import ArrayLike
-from archetypes import AA
+from .profiling import profiled, stage
 
 
-def multi_AA(data: ArrayLike, archetype_numbers: Iterable[int], **aa_kwargs):
+@profiled("fit")
+def multi_AA(
+    data: ArrayLike,
+    archetype_numbers: Iterable[int],
+    *,
+    checkpoint_dir=None,
+    checkpoint_interval: float = 60.0,
+    **aa_kwargs,
+):
     """
     Run a series of AA with multiple numbers of archetypes and return the results.
 
@@ -20,6 +29,18 @@ def multi_AA(data: ArrayLike, archetype_numbers: Iterable[int], **aa_kwargs):
         The data to be decomposed.
     archetype_numbers : iterable of int
         The numbers of archetypes to use.
+    checkpoint_dir : str or Path, optional
+        A directory where the fits are saved as they progress: each finished
+        fit, and between the restarts (``n_init``) of the current one, the best
+        restart so far and the random state of the initializations. Calling
+        `multi_AA` again with the same directory, data and parameters loads the
+        finished fits and resumes the current one at the restart where it
+        stopped, with the same result as an uninterrupted run. Files are named
+        after the hash of the data and parameters. Requires an int
+        `random_state`, so that the restarts can be reproduced.
+    checkpoint_interval : float, default=60.0
+        The minimum number of seconds between saves of the current fit, which
+        happen at the end of a restart.
     aa_kwargs : dict
         Keyword arguments to pass to the AA constructor.
 
@@ -30,6 +51,13 @@ def multi_AA(data: ArrayLike, archetype_numbers: Iterable[int], **aa_kwargs):
     transformed_data_list : list of array-like
         The transformed data for each AA object.
     """
+    from .initialization import AA
+
+    if checkpoint_dir is not None:
+        return _checkpointed_multi_AA(
+            data, archetype_numbers, checkpoint_dir, checkpoint_interval, aa_kwargs
+        )
+
     aa_list: list[AA] = []
     transformed_data_list: list[np.ndarray] = []
     for n_archetypes in archetype_numbers:
@@ -41,6 +69,789 @@ def multi_AA(data: ArrayLike, archetype_numbers: Iterable[int], **aa_kwargs):
     return aa_list, transformed_data_list
 
 
+def _checkpointed_multi_AA(
+    data, archetype_numbers, checkpoint_dir, checkpoint_interval, aa_kwargs
+):
+    import hashlib
+    import json
+    from pathlib import Path
+    from .initialization import AA
+
+    random_state = aa_kwargs.get("random_state")
+    if not isinstance(random_state, (int, np.integer)) or isinstance(
+        random_state, bool
+    ):
+        raise ValueError(
+            "checkpoint_dir requires an int random_state, so that the fits "
+            f"can be resumed, not {random_state!r}."
+        )
+    checkpoint_dir = Path(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    X = np.ascontiguousarray(data, dtype=float)
+    data_hash = hashlib.sha256(X.tobytes()).hexdigest()
+
+    aa_list = []
+    transformed_data_list = []
+    for n_archetypes in archetype_numbers:
+        fit_id = hashlib.sha256(
+            json.dumps(
+                [n_archetypes, aa_kwargs, list(X.shape), data_hash],
+                sort_keys=True,
+                default=_params_repr,
+            ).encode()
+        ).hexdigest()[:16]
+        fit_path = checkpoint_dir / f"{fit_id}.pkl"
+        state_path = checkpoint_dir / f"{fit_id}.restarts.pkl"
+
+        if fit_path.exists():
+            aa = _load_pickle(fit_path)
+        else:
+            aa = AA(n_archetypes, **aa_kwargs)
+            aa._validate_params()
+            if n_archetypes > 1 and aa.n_init > 1:
+                aa = _fit_restarts(
+                    aa,
+                    data,
+                    state_path=state_path,
+                    checkpoint_interval=checkpoint_interval,
+                )
+            else:
+                aa.fit(data)
+            _dump_pickle(aa, fit_path)
+            state_path.unlink(missing_ok=True)
+        aa_list.append(aa)
+        transformed_data_list.append(aa.A_)
+
+    return aa_list, transformed_data_list
+
+
+def _fit_restarts(
+    aa, data, *, state_path=None, checkpoint_interval=0.0, callback=None
+):
+    """
+    Fit `aa` one restart at a time, optionally saving the best restart so far
+    and the random state to `state_path`, and resuming from it if it exists.
+    `callback`, if given, is called as ``callback(restart, run)`` with the AA
+    fitted by each restart.
+
+    ``aa.fit`` draws the initializations of its restarts from one random state
+    in turn, so fitting a copy with ``n_init=1`` and that random state for each
+    restart, and keeping the first one with the lowest RSS, gives the same
+    result.
+    """
+    import time
+    from sklearn.base import clone
+    from sklearn.utils import check_random_state
+
+    rng = check_random_state(aa.random_state)
+    first, best = 0, None
+    if state_path is not None and state_path.exists():
+        first, rng_state, best = _load_pickle(state_path)
+        rng.set_state(rng_state)
+    last_save = time.perf_counter()
+    for restart in range(first, aa.n_init):
+        run = clone(aa).set_params(n_init=1, random_state=rng).fit(data)
+        if best is None or run.rss_ < best.rss_:
+            best = run
+        if callback is not None:
+            callback(restart, run)
+        if (
+            state_path is not None
+            and restart + 1 < aa.n_init
+            and time.perf_counter() - last_save >= checkpoint_interval
+        ):
+            _dump_pickle((restart + 1, rng.get_state(), best), state_path)
+            last_save = time.perf_counter()
+    return best.set_params(n_init=aa.n_init, random_state=aa.random_state)
+
+
+def _load_pickle(path):
+    import pickle
+
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _dump_pickle(obj, path) -> None:
+    """Pickle `obj` to `path` atomically, through a temporary file."""
+    import os
+    import pickle
+
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(temp_path, path)
+
+
+def _params_repr(value):
+    """JSON-serializable stand-in for parameters such as initializer objects."""
+    if hasattr(value, "__dict__"):
+        public = {k: v for k, v in vars(value).items() if not k.startswith("_")}
+        return [type(value).__qualname__, public]
+    return repr(value)
+
+
+@profiled("fit")
+def halving_AA(
+    data: ArrayLike,
+    n_archetypes: int,
+    n_restarts: int = 50,
+    *,
+    keep_fraction: float = 0.5,
+    min_iter: int = 25,
+    **aa_kwargs,
+):
+    """
+    Run AA with many restarts, pruned by successive halving.
+
+    All restarts first run `min_iter` iterations. After each round, only the
+    best `keep_fraction` of them (by current RSS) are kept, and the survivors
+    run ``1 / keep_fraction`` times more iterations in the next round, so that
+    each round costs about the same. The last restart left runs until
+    convergence, or until it has run `max_iter` iterations in total.
+    50 restarts cost about as much as 10 restarts run to convergence.
+
+    Parameters
+    ----------
+    data : array-like of shape (n_samples, n_features)
+        The data to be decomposed.
+    n_archetypes : int
+        The number of archetypes.
+    n_restarts : int, default=50
+        The number of restarts (initializations) to start with.
+    keep_fraction : float, default=0.5
+        The fraction of restarts kept after each round.
+    min_iter : int, default=25
+        The number of iterations of the first round.
+    aa_kwargs : dict
+        Keyword arguments to pass to the AA constructor, giving the
+        initialization, `max_iter`, `tol`, `method_kwargs` and `random_state`.
+        `n_init` is ignored, and `method` must be ``"pgd"``.
+
+    Returns
+    -------
+    aa : AA
+        An AA object holding the best restart, as if it had been fitted.
+    transformed_data : ndarray of shape (n_samples, n_archetypes)
+        The mixing proportions.
+    rounds : list of dict
+        For each round, the number of restarts (``n_restarts``), the
+        iterations given to each of them (``n_iter``), the total iterations
+        run so far (``total_iter``) and the best and worst RSS after the round
+        (``best_rss``, ``worst_rss``).
+    """
+    from .initialization import AA
+    from sklearn.utils import check_random_state
+    from ._spgd import init_runs, set_fitted_attributes
+
+    aa = AA(n_archetypes, **aa_kwargs)
+    aa._validate_params()
+    if aa.method != "pgd":
+        raise ValueError("halving_AA only supports method='pgd'.")
+    if n_archetypes == 1:
+        return aa, aa.fit_transform(data), []
+
+    X = np.ascontiguousarray(data, dtype=float)
+    rng = check_random_state(aa.random_state)
+    runs = init_runs(X, aa, n_restarts, rng)
+
+    rounds = []
+    n_iter = min_iter
+    total_iter = 0
+    while True:
+        if len(runs) == 1:
+            n_iter = aa.max_iter
+        for run in runs:
+            n_iter_before = run.n_iter
+            run.step(min(n_iter, aa.max_iter - run.n_iter), aa.tol)
+            total_iter += run.n_iter - n_iter_before
+        runs.sort(key=lambda run: run.rss)
+        rounds.append(
+            {
+                "n_restarts": len(runs),
+                "n_iter": n_iter,
+                "total_iter": total_iter,
+                "best_rss": runs[0].rss,
+                "worst_rss": runs[-1].rss,
+            }
+        )
+        if aa.verbose:
+            print(
+                f"Round {len(rounds)}: {len(runs)} restarts, "
+                f"best RSS = {runs[0].rss}, worst RSS = {runs[-1].rss}"
+            )
+        if len(runs) == 1 or all(
+            run.converged or run.n_iter >= aa.max_iter for run in runs
+        ):
+            break
+        runs = runs[: max(1, int(np.ceil(len(runs) * keep_fraction)))]
+        n_iter = int(np.ceil(n_iter / keep_fraction))
+
+    set_fitted_attributes(aa, data, runs[0])
+    return aa, aa.A_, rounds
+
+
+@profiled("preprocess")
+def collapse_duplicates(data: ArrayLike, grid_size: float | ArrayLike | None = None):
+    """
+    Collapse duplicate samples into unique samples with counts.
+
+    Parameters
+    ----------
+    data : array-like of shape (n_samples, n_features)
+        The samples.
+    grid_size : float or array-like of shape (n_features,), default=None
+        If None, only identical samples are collapsed. Otherwise, samples
+        falling in the same cell of a grid with this spacing are collapsed too,
+        and represented by their mean.
+
+    Returns
+    -------
+    unique : ndarray of shape (n_unique, n_features)
+        The unique samples.
+    counts : ndarray of shape (n_unique,)
+        The number of samples collapsed into each unique sample.
+    inverse : ndarray of shape (n_samples,)
+        The index of the unique sample of each sample, so that
+        ``unique[inverse]`` approximates (or, without a grid, equals) `data`.
+    """
+    X = np.asarray(data, dtype=float)
+    if grid_size is None:
+        unique, inverse, counts = np.unique(
+            X, axis=0, return_inverse=True, return_counts=True
+        )
+        return unique, counts, inverse.ravel()
+
+    cells = np.floor(X / np.asarray(grid_size, dtype=float)).astype(np.int64)
+    _, inverse, counts = np.unique(
+        cells, axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.ravel()
+    unique = np.column_stack(
+        [np.bincount(inverse, weights=column, minlength=len(counts)) for column in X.T]
+    )
+    unique /= counts[:, None]
+    return unique, counts, inverse
+
+
+@profiled("fit")
+def weighted_AA(
+    data: ArrayLike,
+    n_archetypes: int,
+    sample_weight: ArrayLike | None = None,
+    **aa_kwargs,
+):
+    """
+    Run AA minimizing the sample-weighted RSS.
+
+    Parameters
+    ----------
+    data : array-like of shape (n_samples, n_features)
+        The data to be decomposed.
+    n_archetypes : int
+        The number of archetypes.
+    sample_weight : array-like of shape (n_samples,), default=None
+        The weight of each sample in the RSS, e.g. the counts returned by
+        `collapse_duplicates`. Unit weights if None.
+    aa_kwargs : dict
+        Keyword arguments to pass to the AA constructor, giving the
+        initialization, `n_init`, `max_iter`, `tol`, `method_kwargs` and
+        `random_state`. `method` must be ``"pgd"``.
+
+    Returns
+    -------
+    aa : AA
+        An AA object holding the best restart, as if it had been fitted.
+    transformed_data : ndarray of shape (n_samples, n_archetypes)
+        The mixing proportions.
+    """
+    from .initialization import AA
+    from ._spgd import fit_runs, set_fitted_attributes
+
+    aa = AA(n_archetypes, **aa_kwargs)
+    aa._validate_params()
+    if aa.method != "pgd":
+        raise ValueError("weighted_AA only supports method='pgd'.")
+
+    X = np.ascontiguousarray(data, dtype=float)
+    if sample_weight is not None:
+        sample_weight = np.asarray(sample_weight, dtype=float)
+        if sample_weight.shape != (len(X),):
+            raise ValueError("sample_weight must have shape (n_samples,)")
+
+    set_fitted_attributes(aa, data, fit_runs(X, aa, sample_weight=sample_weight))
+    return aa, aa.A_
+
+
+def collapsed_AA(
+    data: ArrayLike,
+    n_archetypes: int,
+    *,
+    grid_size: float | ArrayLike | None = None,
+    **aa_kwargs,
+):
+    """
+    Run AA on the unique samples of the data, weighted by their counts, and
+    expand the mixing proportions back to all samples.
+
+    Without `grid_size`, the weighted RSS minimized is the RSS of AA on the
+    full data, at a cost proportional to the number of unique samples. The
+    fit itself can differ from AA on the full data: the unique samples are
+    sorted and deduplicated, which changes the furthest-sum initialization
+    and hence the local optimum reached. With `grid_size`, each sample is
+    replaced by the mean of its grid cell, so all samples of a cell get the
+    mixing proportions of that mean.
+
+    Parameters
+    ----------
+    data : array-like of shape (n_samples, n_features)
+        The data to be decomposed.
+    n_archetypes : int
+        The number of archetypes.
+    grid_size : float or array-like of shape (n_features,), default=None
+        Also collapse near-duplicate samples, see `collapse_duplicates`.
+    aa_kwargs : dict
+        Keyword arguments to pass to the AA constructor, see `weighted_AA`.
+
+    Returns
+    -------
+    aa : AA
+        The AA object fitted to the unique samples; ``aa.B_`` refers to them.
+    transformed_data : ndarray of shape (n_samples, n_archetypes)
+        The mixing proportions of all samples.
+    counts : ndarray of shape (n_unique,)
+        The number of samples collapsed into each unique sample.
+    """
+    unique, counts, inverse = collapse_duplicates(data, grid_size)
+    aa, A = weighted_AA(unique, n_archetypes, counts, **aa_kwargs)
+    return aa, A[inverse], counts
+
+
+@profiled("fit")
+def batch_AA(
+    datasets,
+    n_archetypes: int,
+    *,
+    n_samples: ArrayLike | None = None,
+    batch_size: int = 64,
+    **aa_kwargs,
+):
+    """
+    Run AA on many small datasets at once.
+
+    The restarts of all datasets are run together by SPGD-AA on stacked arrays,
+    which for small datasets (e.g. a few solutes in hundreds of catchments) is
+    faster than fitting them one by one, where much of the cost is per-call
+    overhead. Smaller datasets are padded with copies of their first
+    sample, which have no weight in the RSS, and the archetype coefficients
+    on the padding are given back to that sample; datasets are sorted by size
+    and fitted by groups of `batch_size`, so that they are padded to the size
+    of the largest one in their group only. Each dataset is initialized
+    with its own random state, seeded by `random_state`, as if it were fitted
+    alone.
+
+    Parameters
+    ----------
+    datasets : list of array-like of shape (n_samples_i, n_features), or \
+            array-like of shape (n_datasets, n_samples, n_features)
+        The datasets, with the same number of features.
+    n_archetypes : int
+        The number of archetypes of every dataset.
+    n_samples : array-like of int of shape (n_datasets,), optional
+        The number of samples of each dataset, when `datasets` is a padded
+        array whose trailing samples are to be ignored.
+    batch_size : int, default=64
+        The number of datasets fitted together, each with `n_init` restarts.
+    aa_kwargs : dict
+        Keyword arguments to pass to the AA constructor, giving the
+        initialization, `n_init`, `max_iter`, `tol`, `method_kwargs` and
+        `random_state`. `method` must be ``"pgd"``.
+
+    Returns
+    -------
+    aa_list : list of AA
+        An AA object per dataset, holding its best restart as if it had been
+        fitted, with e.g. its archetypes (`archetypes_`) and RSS (`rss_`).
+    transformed_data_list : list of ndarray of shape (n_samples_i, n_archetypes)
+        The mixing proportions of each dataset.
+    """
+    from .initialization import AA
+    from ._spgd import set_fitted_attributes
+
+    if n_samples is not None:
+        datasets = [dataset[:n] for dataset, n in zip(datasets, n_samples)]
+    datasets = [np.ascontiguousarray(dataset, dtype=float) for dataset in datasets]
+    if len({dataset.shape[1] for dataset in datasets}) > 1:
+        raise ValueError("All datasets must have the same number of features.")
+    aa = AA(n_archetypes, **aa_kwargs)
+    aa._validate_params()
+    if aa.method != "pgd":
+        raise ValueError("batch_AA only supports method='pgd'.")
+
+    # datasets of similar sizes are fitted together, to limit the padding
+    method_kwargs = {} if aa.method_kwargs is None else aa.method_kwargs
+    order = np.argsort([len(X) for X in datasets], kind="stable")
+    runs = [None] * len(datasets)
+    for group_start in range(0, len(datasets), batch_size):
+        group = order[group_start : group_start + batch_size]
+        group_runs = _batch_runs([datasets[i] for i in group], aa, method_kwargs)
+        for i, run in zip(group, group_runs):
+            runs[i] = run
+
+    aa_list = []
+    transformed_data_list = []
+    for X, run in zip(datasets, runs):
+        dataset_aa = AA(n_archetypes, **aa_kwargs)
+        set_fitted_attributes(dataset_aa, X, run)
+        aa_list.append(dataset_aa)
+        transformed_data_list.append(dataset_aa.A_)
+    return aa_list, transformed_data_list
+
+
+def _batch_runs(datasets, aa, method_kwargs):
+    """
+    Run the restarts of `aa` on all `datasets` together, and return the best
+    run of each dataset, as an `SPGDRun` on the dataset without padding.
+    """
+    from sklearn.utils import check_random_state
+    from ._spgd import BatchSPGDRun, SPGDRun
+
+    n_max = max(len(X) for X in datasets)
+    n_init = aa.n_init
+    X_batch, A_batch, B_batch, weights = [], [], [], []
+    for X in datasets:
+        padding = n_max - len(X)
+        X_padded = np.concatenate([X, np.repeat(X[:1], padding, axis=0)])
+        weight = np.concatenate([np.ones(len(X)), np.zeros(padding)])
+        rng = check_random_state(aa.random_state)
+        for _ in range(n_init):
+            A, B, _ = aa._init_archetypes(X, rng)
+            X_batch.append(X_padded)
+            A_batch.append(np.concatenate([A, np.repeat(A[:1], padding, axis=0)]))
+            B_batch.append(np.pad(B, ((0, 0), (0, padding))))
+            weights.append(weight)
+
+    batch = BatchSPGDRun(
+        np.stack(X_batch),
+        np.stack(A_batch),
+        np.stack(B_batch),
+        sample_weight=np.stack(weights),
+        **method_kwargs,
+    )
+    batch.step(aa.max_iter, aa.tol)
+
+    runs = []
+    best = batch.rss.reshape(len(datasets), n_init).argmin(axis=1)
+    for i, (X, restart) in enumerate(zip(datasets, best)):
+        r = i * n_init + restart
+        B = batch.B[r, :, : len(X)].copy()
+        B[:, 0] += batch.B[r, :, len(X) :].sum(axis=1)
+        run = SPGDRun(X, batch.A[r, : len(X)], B, **method_kwargs)
+        run.n_iter = int(batch.n_iter[r])
+        run.loss = batch.loss[r]
+        runs.append(run)
+    return runs
+
+
+@profiled("fit")
+def update_AA(aa, data: ArrayLike, new_data: ArrayLike, *, tol: float | None = None):
+    """
+    Update a fitted AA with new samples, refitting only if they are not
+    explained by the current archetypes.
+
+    The mixing proportions of the new samples are computed with the current
+    archetypes. If every new sample lies within `tol` of the simplex spanned
+    by the archetypes, the archetypes are kept as they are. Otherwise AA is
+    refitted on all samples, starting from the current archetypes and mixing
+    proportions, which usually converges in a few iterations.
+
+    Parameters
+    ----------
+    aa : AA
+        An AA object fitted to `data`, with ``method="pgd"``.
+    data : array-like of shape (n_samples, n_features)
+        The samples `aa` was fitted to.
+    new_data : array-like of shape (n_new_samples, n_features)
+        The new samples.
+    tol : float, default=None
+        The largest distance (Euclidean norm of the residual) of a new sample
+        to the simplex for which no refit is needed. Default is the largest
+        distance of the samples in `data`, i.e. new samples must not be worse
+        explained than the old ones.
+
+    Returns
+    -------
+    aa : AA
+        A copy of `aa` fitted to all samples, `data` followed by `new_data`.
+    transformed_data : ndarray of shape (n_samples + n_new_samples, n_archetypes)
+        The mixing proportions of all samples.
+    refitted : bool
+        Whether AA was refitted.
+    """
+    import copy
+    from ._spgd import SPGDRun, set_fitted_attributes
+    from .residuals import residual_norms
+
+    if aa.method != "pgd":
+        raise ValueError("update_AA only supports method='pgd'.")
+    X_old = np.asarray(data, dtype=float)
+    X_new = np.asarray(new_data, dtype=float)
+    if aa.B_.shape[1] != len(X_old):
+        raise ValueError("aa must be fitted to data.")
+    archetypes = np.asarray(aa.archetypes_)
+    if tol is None:
+        tol = residual_norms(X_old, aa.A_, archetypes).max()
+
+    A_new = aa.transform(X_new)
+    distances = residual_norms(X_new, A_new, archetypes)
+    refitted = bool((distances > tol).any())
+
+    X = np.ascontiguousarray(np.concatenate([X_old, X_new]))
+    A = np.concatenate([aa.A_, A_new])
+    B = np.concatenate([aa.B_, np.zeros((len(aa.B_), len(X_new)))], axis=1)
+    method_kwargs = {} if aa.method_kwargs is None else aa.method_kwargs
+    run = SPGDRun(X, A, B, **method_kwargs)
+    if refitted:
+        run.step(aa.max_iter, aa.tol)
+    else:
+        # the RSS of the kept archetypes on all samples ends the loss history
+        run.n_iter = aa.n_iter_
+        run.loss = list(aa.loss_) + [run.rss]
+
+    aa = copy.deepcopy(aa)
+    if hasattr(data, "columns"):
+        data = data.iloc[:0]  # only the column names are used
+    set_fitted_attributes(aa, data, run)
+    return aa, aa.A_, refitted
+
+
+class ReducedAA:
+    """
+    AA fitted in a reduced PCA subspace, with archetypes lifted back to the
+    original feature space.
+
+    Archetypes are convex combinations of samples (``B @ X``), so the
+    coefficient matrix ``B`` found in the subspace gives full-dimensional
+    archetypes exactly, without any back-projection error. Only the fit itself
+    is approximate, through the variance discarded by the truncation, which is
+    reported as ``truncation_error_``.
+
+    Parameters
+    ----------
+    n_archetypes : int
+        The number of archetypes to compute.
+    n_components : int or float
+        The dimension of the subspace. If a float between 0 and 1, the smallest
+        dimension that explains this fraction of the variance, as in
+        `sklearn.decomposition.PCA`.
+    aa_kwargs : dict
+        Keyword arguments to pass to the AA constructor.
+
+    Attributes
+    ----------
+    pca_ : sklearn.decomposition.PCA
+        The fitted projection.
+    aa_ : AA
+        The AA object fitted in the subspace.
+    archetypes_ : ndarray of shape (n_archetypes, n_features)
+        The archetypes in the original feature space.
+    A_ : ndarray of shape (n_samples, n_archetypes)
+        The mixing proportions of the samples.
+    B_ : ndarray of shape (n_archetypes, n_samples)
+        The coefficients expressing archetypes as mixtures of samples.
+    rss_ : float
+        The residual sum of squares in the original feature space.
+    reduced_rss_ : float
+        The residual sum of squares in the subspace.
+    truncation_error_ : float
+        The sum of squared residuals of projecting the data onto the subspace.
+        With ``E`` these residuals, ``rss_ = reduced_rss_ +
+        ||(I - A_ @ B_) @ E||**2``, as the two parts of the residuals are
+        orthogonal; the second term can exceed ``truncation_error_``.
+    truncation_error_ratio_ : float
+        ``truncation_error_`` divided by the total sum of squares of the
+        centered data.
+    """
+
+    def __init__(self, n_archetypes: int, n_components: int | float, **aa_kwargs):
+        self.n_archetypes = n_archetypes
+        self.n_components = n_components
+        self.aa_kwargs = aa_kwargs
+
+    def fit(self, X: ArrayLike, y=None):
+        """
+        Compute the archetypes in the subspace and lift them back.
+        """
+        self.fit_transform(X)
+        return self
+
+    def fit_transform(self, X: ArrayLike, y=None) -> np.ndarray:
+        """
+        Compute the archetypes and return the mixing proportions of `X`.
+
+        Parameters
+        ----------
+        X : array-like of shape (n_samples, n_features)
+            The data to be decomposed.
+
+        Returns
+        -------
+        A : ndarray of shape (n_samples, n_archetypes)
+            The mixing proportions.
+        """
+        from .initialization import AA
+        from sklearn.decomposition import PCA
+        from sklearn.utils.extmath import squared_norm
+        from .residuals import rss
+
+        X = np.asarray(X, dtype=float)
+        with stage("preprocess"):
+            pca = PCA(n_components=self.n_components)
+            X_reduced = pca.fit_transform(X)
+
+        with stage("fit"):
+            aa = AA(self.n_archetypes, **self.aa_kwargs)
+            A = aa.fit_transform(X_reduced)
+
+        # the mean as the single archetype of every sample, so that the total
+        # sum of squares is computed by chunks, without a centered copy of X
+        total_ss = rss(X, np.broadcast_to(1.0, (len(X), 1)), pca.mean_[None])
+        self.pca_ = pca
+        self.aa_ = aa
+        self.A_ = A
+        self.B_ = aa.B_
+        self.archetypes_ = aa.B_ @ X
+        self.rss_ = rss(X, A, self.archetypes_)
+        self.reduced_rss_ = aa.rss_
+        self.truncation_error_ = max(total_ss - squared_norm(X_reduced), 0.0)
+        self.truncation_error_ratio_ = (
+            self.truncation_error_ / total_ss if total_ss > 0 else 0.0
+        )
+        return A
+
+    def transform(self, X: ArrayLike) -> np.ndarray:
+        """
+        Compute the mixing proportions of new samples in the subspace.
+        """
+        return self.aa_.transform(self.pca_.transform(np.asarray(X, dtype=float)))
+
+
+def consensus_archetypes(
+    archetype_sets: Iterable[ArrayLike],
+    threshold: float = 0.1,
+    metric: Literal["sad", "cosine"] = "sad",
+    *,
+    n_refine: int = 3,
+    chunk_size: int = 8192,
+):
+    """
+    Cluster the archetypes of many runs (restarts, bootstraps, different
+    numbers of archetypes) into consensus endmembers.
+
+    Archetypes are compared by direction only (cosine or spectral angle). They
+    are first grouped greedily: each archetype joins the most similar cluster
+    within `threshold`, or starts a new one. The clusters are then refined by
+    reassigning every archetype to the nearest cluster center (spherical
+    k-means). Archetypes are only ever compared with cluster centers, in chunks,
+    so the cost grows linearly with the number of archetypes.
+
+    Parameters
+    ----------
+    archetype_sets : iterable of array-like of shape (n_archetypes, n_features)
+        The archetypes of each run, e.g. ``[aa.archetypes_ for aa in aa_list]``.
+    threshold : float, default=0.1
+        The largest distance between an archetype and the center of its
+        cluster when clusters are formed: a spectral angle in radians for
+        ``"sad"``, ``1 - cosine similarity`` for ``"cosine"``.
+    metric : {"sad", "cosine"}, default="sad"
+        The distance between archetypes.
+    n_refine : int, default=3
+        The number of refinement passes.
+    chunk_size : int, default=8192
+        The number of archetypes compared with the cluster centers at a time.
+
+    Returns
+    -------
+    consensus : ndarray of shape (n_clusters, n_features)
+        The mean archetype of each cluster, by decreasing stability.
+    stability : ndarray of shape (n_clusters,)
+        The fraction of runs with at least one archetype in each cluster.
+    membership : list of ndarray
+        For each cluster, the runs (indices in `archetype_sets`) of its
+        archetypes.
+    labels : ndarray of shape (n_total_archetypes,)
+        The cluster of each archetype, in the order of the runs.
+    """
+    sets = [
+        np.atleast_2d(np.asarray(archetypes, dtype=float)) for archetypes in archetype_sets
+    ]
+    X = np.concatenate(sets)
+    runs = np.repeat(np.arange(len(sets)), [len(archetypes) for archetypes in sets])
+    if metric == "sad":
+        min_similarity = np.cos(threshold)
+    elif metric == "cosine":
+        min_similarity = 1 - threshold
+    else:
+        raise ValueError("metric must be either 'sad' or 'cosine'")
+    # similarities only decide the clusters, single precision is enough
+    U = (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+
+    # greedy (leader) clustering
+    centers = np.empty((0, X.shape[1]), dtype=np.float32)
+    for start in range(0, len(U), chunk_size):
+        chunk = U[start : start + chunk_size]
+        if len(centers):
+            unassigned = chunk[(chunk @ centers.T).max(axis=1) < min_similarity]
+        else:
+            unassigned = chunk
+        new_centers = []
+        while len(unassigned):
+            members = unassigned @ unassigned[0] >= min_similarity
+            new_centers.append(_normalize(unassigned[members].sum(axis=0)))
+            unassigned = unassigned[~members]
+        if new_centers:
+            centers = np.vstack([centers, new_centers])
+
+    # refinement
+    labels = None
+    for _ in range(n_refine + 1):
+        new_labels = np.concatenate(
+            [
+                (U[start : start + chunk_size] @ centers.T).argmax(axis=1)
+                for start in range(0, len(U), chunk_size)
+            ]
+        )
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        kept, labels = np.unique(new_labels, return_inverse=True)
+        centers = _normalize(_sum_by_label(U, labels, len(kept)))
+
+    n_clusters = len(centers)
+    counts = np.bincount(labels, minlength=n_clusters)
+    consensus = _sum_by_label(X, labels, n_clusters) / counts[:, None]
+    run_pairs = np.unique(np.column_stack([labels, runs]), axis=0)
+    stability = np.bincount(run_pairs[:, 0], minlength=n_clusters) / len(sets)
+
+    order = np.argsort(-stability, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(n_clusters)
+    labels = rank[labels]
+    by_cluster = np.argsort(labels, kind="stable")
+    membership = np.split(runs[by_cluster], np.cumsum(counts[order])[:-1])
+    return consensus[order], stability[order], membership, labels
+
+
+def _normalize(X: np.ndarray) -> np.ndarray:
+    return X / np.linalg.norm(X, axis=-1, keepdims=True)
+
+
+def _sum_by_label(X: np.ndarray, labels: np.ndarray, n_labels: int) -> np.ndarray:
+    """Sum the rows of `X` with the same label, all labels being present."""
+    order = np.argsort(labels, kind="stable")
+    starts = np.searchsorted(labels[order], np.arange(n_labels))
+    return np.add.reduceat(X[order], starts, axis=0)
+
+
 def normalize_losses(losses):
     """
     Divide RSS losses by the first loss (RSS(1)) to normalize them.
@@ -80,6 +891,7 @@ def spectral_angle_distances(x, y, output: Literal["rad", "deg"] = "rad") -> flo
     return distance
 
 
+@profiled("match")
 def match_endmembers(endmembers, endmembers_fitted, mixing_proportions=None):
     """
     Match the fitted endmembers to the true endmembers, based on cosine similarity.
@@ -103,6 +915,9 @@ def match_endmembers(endmembers, endmembers_fitted, mixing_proportions=None):
     rearranged_mixing_proportions: array-like, shape (n_samples, n_endmembers)
         The rearranged mixing proportions. Returned only if `mixing_proportions` is provided.
     """
+    import pandas as pd
+    from sklearn.metrics.pairwise import cosine_similarity
+
     new_index = cosine_similarity(endmembers, endmembers_fitted).argmax(axis=1)
     assert np.unique(new_index).size == new_index.size, "One-to-one mapping not found"
     endmembers_rearranged = np.asarray(endmembers_fitted)[new_index]
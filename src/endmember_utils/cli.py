@@ -0,0 +1,107 @@
+"""
+Command line interface of the repo, installed as ``endmembers``.
+
+Run from the root directory of the repo::
+
+    endmembers status
+    endmembers run                        # bring everything up to date
+    endmembers run fit-panola -j 4        # one stage and its upstream stages
+    endmembers run --dry-run
+    endmembers quantize data/jasper_ridge/jasperRidge2_R198.hdr jasper_uint16.hdr
+"""
+
+import argparse
+import sys
+
+from .pipeline import Pipeline, repo_stages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="endmembers",
+        description="Reproduce the data, results and figures of the repo.",
+    )
+    parser.add_argument(
+        "--root", default=".", help="root directory of the repo (default: .)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the stale stages")
+    run_parser.add_argument(
+        "stages", nargs="*", help="stages to bring up to date (default: all)"
+    )
+    run_parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="number of parallel stages"
+    )
+    run_parser.add_argument(
+        "-f", "--force", action="store_true", help="run even up-to-date stages"
+    )
+    run_parser.add_argument(
+        "-n", "--dry-run", action="store_true", help="only show what would run"
+    )
+
+    status_parser = subparsers.add_parser("status", help="show the stage status")
+    status_parser.add_argument("stages", nargs="*", help="stages to show")
+
+    subparsers.add_parser("graph", help="show the dependencies of each stage")
+
+    quantize_parser = subparsers.add_parser(
+        "quantize", help="store an image with 16 bits per value"
+    )
+    quantize_parser.add_argument("source", help="the image, .npy or ENVI header")
+    quantize_parser.add_argument(
+        "output", help="the quantized image, .npy or ENVI header (.hdr)"
+    )
+    quantize_parser.add_argument(
+        "--dtype", choices=["uint16", "float16"], default="uint16"
+    )
+    quantize_parser.add_argument(
+        "--chunk-size", type=int, default=65536, help="pixels converted at a time"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "quantize":
+        return quantize(args)
+    pipeline = Pipeline(repo_stages(root=args.root), root=args.root)
+
+    if args.command == "run":
+        results = pipeline.run(
+            args.stages or None,
+            jobs=args.jobs,
+            force=args.force,
+            dry_run=args.dry_run,
+        )
+        if any(result in ("failed", "blocked") for result in results.values()):
+            return 1
+        if not any(result == "done" for result in results.values()):
+            print("everything is up to date")
+    elif args.command == "status":
+        for name, status in pipeline.status(args.stages or None).items():
+            print(f"{status:>10}  {name}")
+    elif args.command == "graph":
+        for name, dependencies in pipeline.dependencies().items():
+            print(f"{name}: {', '.join(sorted(dependencies)) or '-'}")
+    return 0
+
+
+def quantize(args) -> int:
+    from .storage import quantize_cube, read_maps
+
+    cube, band_names = read_maps(args.source)
+    report = quantize_cube(
+        cube,
+        args.output,
+        band_names=band_names,
+        dtype=args.dtype,
+        chunk_size=args.chunk_size,
+    )
+    print(
+        f"wrote {report['path']}: {report['nbytes'] / 2**20:.1f} MiB "
+        f"({report['nbytes'] / report['source_nbytes']:.0%} of the source)"
+    )
+    print(f"max error {report['max_error']:.3g}, RMSE {report['rmse']:.3g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
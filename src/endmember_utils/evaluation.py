@@ -0,0 +1,284 @@
+"""
+Utilities for evaluating fitted endmembers and mixing proportions against
+reference ones, for many methods and datasets at once.
+
+Fitted results are stacked into arrays of shape
+``(n_methods, n_datasets, n_endmembers, n_features)`` (and
+``(n_methods, n_datasets, n_samples, n_endmembers)`` for mixing proportions),
+with missing results filled with NaN, so that every error is computed in a
+single vectorized pass.
+"""
+
+from pathlib import Path
+from typing import Iterable, Mapping
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+
+def endmember_errors(endmembers: ArrayLike, endmembers_fitted: ArrayLike):
+    """
+    Compute the errors between true and fitted endmembers, row by row.
+
+    Parameters
+    ----------
+    endmembers : array-like of shape (..., n_endmembers, n_features)
+        The true (referential) endmembers.
+    endmembers_fitted : array-like of shape (..., n_endmembers, n_features)
+        The fitted endmembers, matched to `endmembers`. Leading dimensions
+        are broadcast against those of `endmembers`.
+
+    Returns
+    -------
+    errors : dict of str to ndarray of shape (..., n_endmembers)
+        Euclidean distance (``"euclidean"``), root mean squared error over
+        features (``"rmse"``) and spectral angle distance in radians
+        (``"sad"``) of each endmember.
+    """
+    endmembers = np.asarray(endmembers, dtype=float)
+    endmembers_fitted = np.asarray(endmembers_fitted, dtype=float)
+    diff = endmembers_fitted - endmembers
+    squared_distance = np.einsum("...ij,...ij->...i", diff, diff)
+
+    dot_product = np.einsum("...ij,...ij->...i", endmembers, endmembers_fitted)
+    norm_product = np.linalg.norm(endmembers, axis=-1) * np.linalg.norm(
+        endmembers_fitted, axis=-1
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosine = np.clip(dot_product / norm_product, -1, 1)
+
+    return {
+        "euclidean": np.sqrt(squared_distance),
+        "rmse": np.sqrt(squared_distance / endmembers.shape[-1]),
+        "sad": np.arccos(cosine),
+    }
+
+
+def proportion_errors(
+    mixing_proportions: ArrayLike, mixing_proportions_fitted: ArrayLike
+) -> np.ndarray:
+    """
+    Compute the root mean squared error of fitted mixing proportions of each
+    endmember. NaN rows (padding of shorter datasets) are ignored.
+
+    Parameters
+    ----------
+    mixing_proportions : array-like of shape (..., n_samples, n_endmembers)
+        The true mixing proportions.
+    mixing_proportions_fitted : array-like of shape (..., n_samples, n_endmembers)
+        The fitted mixing proportions, with columns matched to the true ones.
+
+    Returns
+    -------
+    rmse : ndarray of shape (..., n_endmembers)
+        The error of each endmember. NaN where no proportions are available.
+    """
+    diff = np.asarray(mixing_proportions_fitted, dtype=float) - np.asarray(
+        mixing_proportions, dtype=float
+    )
+    squared_error = diff**2
+    count = np.sum(~np.isnan(squared_error), axis=-2)
+    total = np.nansum(squared_error, axis=-2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(np.where(count > 0, total / count, np.nan))
+
+
+def evaluate(
+    endmembers: ArrayLike,
+    endmembers_fitted: ArrayLike,
+    methods: Iterable[str],
+    datasets: Iterable[str],
+    *,
+    mixing_proportions: ArrayLike | None = None,
+    mixing_proportions_fitted: ArrayLike | None = None,
+    endmember_names: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Evaluate stacked fitted results and return a tidy DataFrame.
+
+    Parameters
+    ----------
+    endmembers : array-like of shape (n_endmembers, n_features)
+        The true endmembers. A DataFrame provides the endmember names.
+    endmembers_fitted : array-like of shape (n_methods, n_datasets, n_endmembers, n_features)
+        The stacked fitted endmembers, NaN for missing results.
+    methods : iterable of str
+        Names along the first axis of `endmembers_fitted`.
+    datasets : iterable of str
+        Names along the second axis of `endmembers_fitted`.
+    mixing_proportions : array-like of shape (n_datasets, n_samples, n_endmembers), optional
+        The true mixing proportions of each dataset, NaN-padded.
+    mixing_proportions_fitted : array-like of shape (n_methods, n_datasets, n_samples, n_endmembers), optional
+        The stacked fitted mixing proportions, NaN for missing results.
+    endmember_names : iterable of str, optional
+        Names of the endmembers. Default is the index of `endmembers` if it
+        is a DataFrame, otherwise ``EM1``, ``EM2``, ...
+
+    Returns
+    -------
+    errors : pandas.DataFrame
+        One row per method, dataset and endmember, with columns ``method``,
+        ``dataset``, ``endmember``, ``euclidean``, ``rmse``, ``sad`` and
+        ``proportion_rmse``. Missing results are dropped.
+    """
+    methods = list(methods)
+    datasets = list(datasets)
+    if endmember_names is None:
+        if isinstance(endmembers, pd.DataFrame):
+            endmember_names = endmembers.index
+        else:
+            endmember_names = [f"EM{i+1}" for i in range(np.shape(endmembers)[0])]
+    endmember_names = list(endmember_names)
+
+    endmembers_fitted = np.asarray(endmembers_fitted, dtype=float)
+    errors = endmember_errors(endmembers, endmembers_fitted)
+
+    errors["proportion_rmse"] = np.full(endmembers_fitted.shape[:-1], np.nan)
+    if mixing_proportions is not None and mixing_proportions_fitted is not None:
+        errors["proportion_rmse"] = proportion_errors(
+            np.asarray(mixing_proportions, dtype=float)[np.newaxis],
+            mixing_proportions_fitted,
+        )
+
+    index = pd.MultiIndex.from_product(
+        [methods, datasets, endmember_names], names=["method", "dataset", "endmember"]
+    )
+    errors = pd.DataFrame(
+        {name: values.reshape(-1) for name, values in errors.items()}, index=index
+    )
+    return errors.dropna(subset=["euclidean"]).reset_index()
+
+
+def load_results(
+    methods: Iterable[str],
+    datasets: Iterable[str],
+    *,
+    results_dir: str | Path = "results/synthetic",
+    kind: str = "endmembers",
+) -> np.ndarray:
+    """
+    Load result files named ``{method}_{dataset}_{kind}.csv`` into one stack.
+
+    Parameters
+    ----------
+    methods : iterable of str
+        The methods, e.g. ``("AA", "NMF", "CHEMMA", "EDAA")``.
+    datasets : iterable of str
+        The datasets, e.g. ``("noisefree", "noisy")``.
+    results_dir : str or Path, default="results/synthetic"
+        The directory of the result files.
+    kind : str, default="endmembers"
+        ``"endmembers"`` (files with an index column) or
+        ``"mixing_proportions"`` (files without).
+
+    Returns
+    -------
+    results : ndarray of shape (n_methods, n_datasets, n_rows, n_columns)
+        The stacked results. Missing files and rows are filled with NaN.
+    """
+    results_dir = Path(results_dir)
+    index_col = 0 if kind == "endmembers" else None
+    tables = [
+        [
+            _read_optional_csv(
+                results_dir / f"{method}_{dataset}_{kind}.csv", index_col=index_col
+            )
+            for dataset in datasets
+        ]
+        for method in methods
+    ]
+    return _stack_padded(tables)
+
+
+def evaluate_results(
+    endmembers: ArrayLike,
+    methods: Iterable[str],
+    datasets: Iterable[str],
+    *,
+    results_dir: str | Path = "results/synthetic",
+    mixing_proportions: Mapping[str, ArrayLike | str | Path] | None = None,
+) -> pd.DataFrame:
+    """
+    Load the result files of all methods and datasets and evaluate them.
+
+    Parameters
+    ----------
+    endmembers : array-like of shape (n_endmembers, n_features)
+        The true endmembers.
+    methods : iterable of str
+        The methods, e.g. ``("AA", "NMF", "CHEMMA", "EDAA")``.
+    datasets : iterable of str
+        The datasets, e.g. ``("noisefree", "noisy")``.
+    results_dir : str or Path, default="results/synthetic"
+        The directory of the result files, named as in `load_results`.
+    mixing_proportions : mapping of str to array-like or path, optional
+        The true mixing proportions (or a CSV file of them) of each dataset.
+        Datasets that are not in the mapping get no proportion error.
+
+    Returns
+    -------
+    errors : pandas.DataFrame
+        The tidy error table, see `evaluate`.
+    """
+    methods = list(methods)
+    datasets = list(datasets)
+    endmembers_fitted = load_results(
+        methods, datasets, results_dir=results_dir, kind="endmembers"
+    )
+
+    true_proportions = None
+    fitted_proportions = None
+    if mixing_proportions:
+        true_proportions = _stack_padded(
+            [
+                [_read_optional_csv(mixing_proportions.get(dataset))]
+                for dataset in datasets
+            ]
+        )[:, 0]
+        fitted_proportions = load_results(
+            methods, datasets, results_dir=results_dir, kind="mixing_proportions"
+        )
+        n_samples = max(true_proportions.shape[1], fitted_proportions.shape[2])
+        true_proportions = _pad_axis(true_proportions, n_samples, axis=1)
+        fitted_proportions = _pad_axis(fitted_proportions, n_samples, axis=2)
+
+    return evaluate(
+        endmembers,
+        endmembers_fitted,
+        methods,
+        datasets,
+        mixing_proportions=true_proportions,
+        mixing_proportions_fitted=fitted_proportions,
+        endmember_names=(
+            endmembers.index if isinstance(endmembers, pd.DataFrame) else None
+        ),
+    )
+
+
+def _read_optional_csv(source, index_col=None) -> np.ndarray | None:
+    if source is None:
+        return None
+    if not isinstance(source, (str, Path)):
+        return np.asarray(source, dtype=float)
+    if not Path(source).exists():
+        return None
+    return pd.read_csv(source, index_col=index_col).to_numpy(dtype=float)
+
+
+def _stack_padded(tables: list[list[np.ndarray | None]]) -> np.ndarray:
+    """Stack a nested list of 2D arrays, padding with NaN."""
+    shapes = [table.shape for row in tables for table in row if table is not None]
+    n_rows = max((shape[0] for shape in shapes), default=0)
+    n_columns = max((shape[1] for shape in shapes), default=0)
+    stacked = np.full((len(tables), len(tables[0]), n_rows, n_columns), np.nan)
+    for i, row in enumerate(tables):
+        for j, table in enumerate(row):
+            if table is not None:
+                stacked[i, j, : table.shape[0], : table.shape[1]] = table
+    return stacked
+
+
+def _pad_axis(array: np.ndarray, size: int, axis: int) -> np.ndarray:
+    pad_width = [(0, 0)] * array.ndim
+    pad_width[axis] = (0, size - array.shape[axis])
+    return np.pad(array, pad_width, constant_values=np.nan)
@@ -0,0 +1,249 @@
+"""
+Utilities for running grids of synthetic experiments.
+
+Each cell of a parameter grid generates a synthetic dataset with
+`endmember_utils.synthetic.synthetic`, fits AA to it and scores the fitted
+endmembers and mixing proportions against the true ones. Cells run on a
+process pool, and every finished cell is saved to its own file in a checkpoint
+directory, so that an interrupted sweep resumes where it stopped.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, Mapping
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+from sklearn.model_selection import ParameterGrid
+from archetypes import AA
+
+from .analysis import match_endmembers
+from .evaluation import endmember_errors, proportion_errors
+from .synthetic import synthetic
+
+
+def run_cell(
+    endmembers: ArrayLike,
+    *,
+    n_samples: int = 1000,
+    dirichlet_alpha: float = 1,
+    endmember_noise: float = 0,
+    sample_noise: float = 0,
+    offset: float = 0,
+    clip_negative: bool = False,
+    n_archetypes: int | None = None,
+    aa_params: Mapping | None = None,
+    random_state: int | None = None,
+) -> dict:
+    """
+    Generate one synthetic dataset, fit AA and score the results.
+
+    Parameters
+    ----------
+    endmembers : array-like of shape (n_endmembers, n_features)
+        The true endmembers.
+    n_samples : int, default=1000
+        Number of samples.
+    dirichlet_alpha : float, default=1
+        Concentration parameter of the mixing proportions.
+    endmember_noise : float, default=0
+        Standard deviation of the normal uncertainty of the endmembers.
+    sample_noise : float, default=0
+        Standard deviation of the Gaussian noise added to each sample.
+    offset : float, default=0
+        Value added to all features of the endmembers, e.g. 10 for the
+        shifted datasets.
+    clip_negative : bool, default=False
+        Whether to set negative values of the samples to 0.
+    n_archetypes : int, optional
+        Number of archetypes. Default is the number of endmembers.
+    aa_params : dict, optional
+        Keyword arguments to pass to the AA constructor.
+    random_state : int, optional
+        Seed of the data generation (and of AA, unless set in `aa_params`).
+
+    Returns
+    -------
+    scores : dict
+        RSS, number of iterations and fit time, and when the fitted endmembers
+        can be matched one-to-one to the true ones, the mean and max Euclidean
+        distance, mean RMSE, mean and max SAD and mean proportion RMSE.
+        Scores that are not available are NaN.
+    """
+    endmembers = np.asarray(endmembers, dtype=float) + offset
+    n_archetypes = endmembers.shape[0] if n_archetypes is None else n_archetypes
+    aa_params = {"random_state": random_state, **(aa_params or {})}
+
+    X, proportions = synthetic(
+        n_samples,
+        endmembers=endmembers,
+        endmember_uncertainty=(
+            np.full_like(endmembers, endmember_noise) if endmember_noise else None
+        ),
+        dirichlet_alpha=dirichlet_alpha,
+        sample_noise=sample_noise,
+        random_state=random_state,
+    )
+    if clip_negative:
+        X[X < 0] = 0
+
+    start = time.perf_counter()
+    aa = AA(n_archetypes, **aa_params)
+    proportions_fitted = aa.fit_transform(X)
+    fit_time = time.perf_counter() - start
+
+    scores = {
+        "rss": float(aa.rss_),
+        "n_iter": int(aa.n_iter_),
+        "fit_time": fit_time,
+        "euclidean_mean": np.nan,
+        "euclidean_max": np.nan,
+        "rmse_mean": np.nan,
+        "sad_mean": np.nan,
+        "sad_max": np.nan,
+        "proportion_rmse_mean": np.nan,
+    }
+    if n_archetypes != endmembers.shape[0]:
+        return scores
+    try:
+        endmembers_fitted, proportions_fitted = match_endmembers(
+            endmembers, aa.archetypes_, proportions_fitted
+        )
+    except AssertionError:  # no one-to-one mapping
+        return scores
+
+    errors = endmember_errors(endmembers, endmembers_fitted)
+    scores.update(
+        euclidean_mean=float(errors["euclidean"].mean()),
+        euclidean_max=float(errors["euclidean"].max()),
+        rmse_mean=float(errors["rmse"].mean()),
+        sad_mean=float(errors["sad"].mean()),
+        sad_max=float(errors["sad"].max()),
+        proportion_rmse_mean=float(
+            proportion_errors(proportions, proportions_fitted).mean()
+        ),
+    )
+    return scores
+
+
+def run_grid(
+    endmembers: ArrayLike,
+    param_grid: Mapping[str, Iterable] | Iterable[Mapping[str, Iterable]],
+    *,
+    checkpoint_dir: str | Path,
+    n_jobs: int | None = None,
+    verbose: bool = False,
+) -> pd.DataFrame:
+    """
+    Run `run_cell` on every cell of a parameter grid, resuming from the cells
+    already saved in `checkpoint_dir`.
+
+    A cell that raises an exception does not stop the others: its parameters
+    and error are saved to ``<cell>.error.json`` in `checkpoint_dir`, and once
+    all cells have run, a RuntimeError lists the failed cells. They are run
+    again by the next call.
+
+    Parameters
+    ----------
+    endmembers : array-like of shape (n_endmembers, n_features)
+        The true endmembers, shared by all cells.
+    param_grid : dict of str to list, or list of such dicts
+        Keyword arguments of `run_cell` and the values to try, as in
+        `sklearn.model_selection.ParameterGrid`, e.g.
+        ``{"dirichlet_alpha": [1, 2, 4], "offset": [0, 10],
+        "random_state": range(5), "aa_params": [{"n_init": 10}]}``.
+    checkpoint_dir : str or Path
+        Directory where each finished cell is saved as a JSON file, named by
+        the hash of its parameters and of `endmembers`.
+    n_jobs : int, optional
+        Number of worker processes. Default is the number of CPUs.
+    verbose : bool, default=False
+        Whether to print the progress.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per cell, with its parameters and its scores.
+
+    Raises
+    ------
+    RuntimeError
+        If any cell failed, after all the others have been run and saved.
+    """
+    endmembers = np.asarray(endmembers, dtype=float)
+    checkpoint_dir = Path(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    endmembers_hash = hashlib.sha256(endmembers.tobytes()).hexdigest()
+
+    cells = {}
+    for params in ParameterGrid(param_grid):
+        params = json.loads(json.dumps(params))  # normalize ranges, tuples etc.
+        cell_id = hashlib.sha256(
+            json.dumps([params, endmembers_hash], sort_keys=True).encode()
+        ).hexdigest()[:16]
+        cells[cell_id] = params
+
+    todo = {
+        cell_id: params
+        for cell_id, params in cells.items()
+        if not (checkpoint_dir / f"{cell_id}.json").exists()
+    }
+    if verbose:
+        print(f"{len(cells) - len(todo)}/{len(cells)} cells already done")
+
+    failed = {}
+    if todo:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {
+                executor.submit(run_cell, endmembers, **params): cell_id
+                for cell_id, params in todo.items()
+            }
+            for i, future in enumerate(as_completed(futures), start=1):
+                cell_id = futures[future]
+                error_path = checkpoint_dir / f"{cell_id}.error.json"
+                try:
+                    scores = future.result()
+                except Exception as error:
+                    failed[cell_id] = repr(error)
+                    record = {"params": todo[cell_id], "error": repr(error)}
+                    _write_json(error_path, record)
+                    if verbose:
+                        print(f"{i}/{len(todo)} cells failed: {todo[cell_id]}")
+                    continue
+                record = {"params": todo[cell_id], "scores": scores}
+                _write_json(checkpoint_dir / f"{cell_id}.json", record)
+                error_path.unlink(missing_ok=True)
+                if verbose:
+                    print(f"{i}/{len(todo)} cells finished: {todo[cell_id]}")
+
+    if failed:
+        details = "\n".join(
+            f"  {cells[cell_id]}: {error}" for cell_id, error in failed.items()
+        )
+        raise RuntimeError(
+            f"{len(failed)}/{len(cells)} cells failed, the others are saved in "
+            f"{checkpoint_dir}:\n{details}"
+        )
+
+    records = []
+    for cell_id in cells:
+        with open(checkpoint_dir / f"{cell_id}.json") as f:
+            record = json.load(f)
+        params = {
+            key: json.dumps(value, sort_keys=True) if isinstance(value, dict) else value
+            for key, value in record["params"].items()
+        }
+        records.append({"cell": cell_id, **params, **record["scores"]})
+    return pd.DataFrame.from_records(records)
+
+
+def _write_json(path: Path, content) -> None:
+    """Write atomically, so that an interrupted write leaves no partial cell."""
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(content, f)
+    os.replace(temp_path, path)
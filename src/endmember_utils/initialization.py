@@ -0,0 +1,163 @@
+"""
+Initializations of the archetypes for large datasets.
+
+`archetypes.AA` only accepts the names of its own initializations, so this
+module also provides `AA`, which accepts any initializer with the same
+signature, ``init(X, n_archetypes, random_state=rng)`` returning the indices
+of the initial archetypes::
+
+    aa = AA(4, init=ApproxFurthestSum(random_state=0), n_init=10, method="pgd")
+
+The fitting functions of `endmember_utils.analysis` use this class, so they
+accept ``init=ApproxFurthestSum()`` too.
+"""
+
+import weakref
+import numpy as np
+import archetypes
+from sklearn.utils import check_random_state
+
+
+class AA(archetypes.AA):
+    """
+    `archetypes.AA`, whose `init` may also be a callable, called as
+    ``init(X, n_archetypes, random_state=rng, **init_kwargs)`` and returning
+    the indices of the samples used as initial archetypes.
+    """
+
+    _parameter_constraints: dict = {
+        **archetypes.AA._parameter_constraints,
+        "init": archetypes.AA._parameter_constraints["init"] + [callable],
+    }
+
+    def _init_archetypes(self, X, rng):
+        if not callable(self.init):
+            return super()._init_archetypes(X, rng)
+
+        n_samples = X.shape[0]
+        init_kwargs = {} if self.init_kwargs is None else self.init_kwargs
+        ind = self.init(X, self.n_archetypes, random_state=rng, **init_kwargs)
+        B = np.zeros((self.n_archetypes, n_samples), dtype=X.dtype)
+        B[np.arange(self.n_archetypes), ind] = 1
+        A = np.zeros((n_samples, self.n_archetypes), dtype=X.dtype)
+        A[np.arange(n_samples), rng.choice(self.n_archetypes, n_samples)] = 1
+        return A, B, X[ind]
+
+
+class ApproxFurthestSum:
+    """
+    An approximation of the furthest-sum initialization (Mørup and Hansen,
+    2012) for large datasets.
+
+    Furthest sum picks, one at a time, the sample with the largest sum of
+    distances to the samples already picked, which takes a pass over the data
+    per archetype and per restart. These samples lie on the boundary of the
+    data, so they are looked for among candidates only: the most extreme
+    samples along random directions and the samples furthest from the mean.
+    The candidates and their pairwise distances are computed once, by chunks
+    of samples, and cached for all the restarts on the same data. Each restart
+    then costs one pass over the candidates per archetype.
+
+    Parameters
+    ----------
+    n_projections : int, default=32
+        The number of random directions.
+    n_extreme : int, default=8
+        The number of candidates at each end of each direction, and the number
+        of candidates furthest from the mean.
+    chunk_size : int, default=65536
+        The number of samples projected at a time.
+    random_state : int, RandomState or None, default=None
+        The seed of the random directions. The restarts draw their first
+        sample from the random state passed by `AA`, as furthest sum does.
+    """
+
+    def __init__(
+        self,
+        n_projections: int = 32,
+        n_extreme: int = 8,
+        chunk_size: int = 65536,
+        random_state=None,
+    ) -> None:
+        self.n_projections = n_projections
+        self.n_extreme = n_extreme
+        self.chunk_size = chunk_size
+        self.random_state = random_state
+        self._data = None
+        self._cache = None
+
+    def __call__(self, X: np.ndarray, k: int, random_state=None, **kwargs) -> list:
+        """
+        Return the indices of `k` samples of `X` to use as initial archetypes.
+        """
+        candidates, X_candidates, distances = self.candidates(X)
+        random_state = check_random_state(random_state)
+
+        # the first sample is random and forgotten at the end, as in furthest sum
+        first = random_state.choice(X.shape[0], 1).item()
+        initial_dist = np.linalg.norm(X_candidates - X[first], axis=1)
+        dist = initial_dist.copy()
+        chosen = []
+        for _ in range(k - 1):
+            dist[chosen] = 0.0
+            i = dist.argmax()
+            chosen.append(i)
+            dist += distances[i]
+        dist -= initial_dist
+        dist[chosen] = 0.0
+        chosen.append(dist.argmax())
+        return list(candidates[chosen])
+
+    def candidates(self, X: np.ndarray):
+        """
+        Return the candidates for `X`: their indices, their values and their
+        pairwise distances. They are cached as long as `X` is alive.
+        """
+        if self._data is not None and self._data() is X:
+            return self._cache
+
+        rng = check_random_state(self.random_state)
+        directions = rng.normal(size=(X.shape[1], self.n_projections))
+        mean = X.mean(axis=0)
+        t = self.n_extreme
+        best_values = np.empty((0, 2 * self.n_projections + 1))
+        best_indices = np.empty((0, 2 * self.n_projections + 1), dtype=int)
+        for start in range(0, X.shape[0], self.chunk_size):
+            centered = X[start : start + self.chunk_size] - mean
+            # large values are extreme: both ends of the projections, and norms
+            values = centered @ directions
+            squared_norms = np.einsum("ij,ij->i", centered, centered)
+            values = np.hstack([values, -values, squared_norms[:, None]])
+            values = np.vstack([best_values, values])
+            indices = np.vstack(
+                [
+                    best_indices,
+                    np.broadcast_to(
+                        np.arange(start, start + len(centered))[:, None],
+                        (len(centered), values.shape[1]),
+                    ),
+                ]
+            )
+            if len(values) > t:
+                top = np.argpartition(-values, t - 1, axis=0)[:t]
+                values = np.take_along_axis(values, top, axis=0)
+                indices = np.take_along_axis(indices, top, axis=0)
+            best_values, best_indices = values, indices
+
+        candidates = np.unique(best_indices)
+        X_candidates = X[candidates]
+        squared_norms = np.einsum("ij,ij->i", X_candidates, X_candidates)
+        squared_distances = (
+            squared_norms[:, None] + squared_norms - 2 * X_candidates @ X_candidates.T
+        )
+        distances = np.sqrt(np.maximum(squared_distances, 0.0))
+
+        self._data = weakref.ref(X)
+        self._cache = candidates, X_candidates, distances
+        return self._cache
+
+    def __getstate__(self):
+        # the cache is not worth copying, and weak references cannot be pickled
+        state = self.__dict__.copy()
+        state["_data"] = state["_cache"] = None
+        return state
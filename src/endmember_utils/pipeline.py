@@ -0,0 +1,766 @@
+"""
+Utilities for running the data -> results -> images workflow as an
+incremental pipeline.
+
+Each stage declares the files it reads, the files it writes, the code it
+depends on and its parameters. The dependency graph is derived from the files:
+a stage depends on every stage that writes one of its inputs. A stage is only
+re-run when the hash of its inputs, code or parameters differs from the one
+recorded after its last successful run, or when one of its outputs is missing
+or was modified. Independent stages run in parallel.
+"""
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, Mapping
+
+STATE_FILE = ".endmembers_pipeline.json"
+PACKAGE_DIR = "src/endmember_utils"
+
+# global parameters passed to all `archetypes.AA`, here and in
+# examples/demo.ipynb
+GLOBAL_AA_PARAMS = {
+    "n_init": 10,  # number of initializations
+    "max_iter": 2000,  # maximum number of iterations
+    "tol": 1e-10,  # tolerance for convergence
+    "method_kwargs": {"max_iter_optimizer": 25},  # parameters of the optimizer
+    "init": "furthest_sum",  # efficient initialization by Morup and Hansen (2012)
+    "method": "pgd",  # NOTE: this option is necessary to use the SPGD method
+    "random_state": 42,  # for reproducibility
+}
+
+
+class Stage:
+    """
+    A step of the pipeline.
+
+    Attributes
+    ----------
+    name: str
+        Unique name of the stage.
+    action: callable or str
+        Either a module-level function, called with `params` as keyword
+        arguments, or the path of a Python script, run with the current
+        interpreter from the root directory.
+    inputs: tuple of str
+        Files read by the stage, relative to the root directory.
+    outputs: tuple of str
+        Files written by the stage, relative to the root directory.
+    code: tuple of str
+        Source files the stage depends on, besides the action itself (and,
+        for a function, the functions of its module that it calls).
+    params: dict
+        Parameters of the stage. They must be JSON serializable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        action: Callable | str,
+        *,
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        code: Iterable[str] = (),
+        params: Mapping | None = None,
+    ) -> None:
+        self.name = name
+        self.action = action
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.code = tuple(code) + ((action,) if isinstance(action, str) else ())
+        self.params = {} if params is None else dict(params)
+
+    def run(self, root: str | Path) -> None:
+        """
+        Run the stage from the root directory.
+        """
+        root = Path(root)
+        for output in self.outputs:
+            (root / output).parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(self.action, str):
+            subprocess.run([sys.executable, self.action], cwd=root, check=True)
+        else:
+            cwd = os.getcwd()
+            os.chdir(root)
+            try:
+                self.action(**self.params)
+            finally:
+                os.chdir(cwd)
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r})"
+
+
+class Pipeline:
+    """
+    A set of stages, run incrementally.
+
+    Attributes
+    ----------
+    stages: dict of str to Stage
+        The stages, by name.
+    root: Path
+        The directory that all paths are relative to.
+    state_file: Path
+        The file recording the signature of each stage after its last
+        successful run, and a cache of file hashes.
+    """
+
+    def __init__(
+        self, stages: Iterable[Stage], root: str | Path = ".", state_file=STATE_FILE
+    ) -> None:
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.root = Path(root)
+        self.state_file = self.root / state_file
+        self._state = self._load_state()
+
+    def dependencies(self) -> dict[str, set[str]]:
+        """
+        Return the names of the upstream stages of each stage.
+        """
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(
+                        f"{output} is written by both {producers[output]} and {stage.name}"
+                    )
+                producers[output] = stage.name
+        return {
+            stage.name: {producers[f] for f in stage.inputs if f in producers}
+            for stage in self.stages.values()
+        }
+
+    def select(self, targets: Iterable[str] | None = None) -> list[str]:
+        """
+        Return the names of the target stages and all their upstream stages,
+        in topological order. All stages if `targets` is None.
+        """
+        dependencies = self.dependencies()
+        targets = list(self.stages) if targets is None else list(targets)
+        for target in targets:
+            if target not in self.stages:
+                raise KeyError(f"Unknown stage: {target}")
+
+        ordered = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage {name}")
+            visiting.add(name)
+            for dependency in sorted(dependencies[name]):
+                visit(dependency)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for target in targets:
+            visit(target)
+        return ordered
+
+    def signature(self, name: str) -> str:
+        """
+        Hash the inputs, code and parameters of a stage. The code of a
+        function action includes the functions of its module that it calls.
+        """
+        stage = self.stages[name]
+        if isinstance(stage.action, str):
+            action = stage.action
+        else:
+            action = _hash_bytes(_action_source(stage.action).encode())
+        content = {
+            "action": action,
+            "inputs": {f: self._hash_file(f) for f in stage.inputs},
+            "code": {f: self._hash_file(f) for f in stage.code},
+            "params": stage.params,
+        }
+        return _hash_bytes(json.dumps(content, sort_keys=True, default=repr).encode())
+
+    def is_stale(self, name: str) -> bool:
+        """
+        Whether a stage has to be run, given the current files.
+        """
+        record = self._state["stages"].get(name)
+        if record is None or record["signature"] != self.signature(name):
+            return True
+        return any(
+            self._hash_file(f) != digest for f, digest in record["outputs"].items()
+        )
+
+    def status(self, targets: Iterable[str] | None = None) -> dict[str, str]:
+        """
+        Return the status of the selected stages: ``"up-to-date"``,
+        ``"stale"``, or ``"pending"`` if an upstream stage is stale.
+        """
+        dependencies = self.dependencies()
+        status = {}
+        for name in self.select(targets):
+            if any(status[d] != "up-to-date" for d in dependencies[name]):
+                status[name] = "pending"
+            else:
+                status[name] = "stale" if self.is_stale(name) else "up-to-date"
+        return status
+
+    def run(
+        self,
+        targets: Iterable[str] | None = None,
+        *,
+        jobs: int | None = None,
+        force: bool = False,
+        dry_run: bool = False,
+        log: Callable[[str], None] = print,
+    ) -> dict[str, str]:
+        """
+        Run the stale stages among the targets and their upstream stages.
+
+        A stage is checked only after all its upstream stages have finished,
+        so that it sees their new outputs. Stages whose upstream stages are
+        all finished are run in parallel.
+
+        Parameters
+        ----------
+        targets: iterable of str, optional
+            Names of the stages to bring up to date. Default is all stages.
+        jobs: int, optional
+            Maximum number of stages run at the same time.
+            Default is the number of CPUs.
+        force: bool, default=False
+            Run the selected stages even if they are up to date.
+        dry_run: bool, default=False
+            Only report the stages that would run, assuming that running a
+            stage makes its dependents stale.
+        log: callable, default=print
+            Called with a message when a stage starts, is skipped or fails.
+
+        Returns
+        -------
+        results: dict of str to str
+            The result of each selected stage: ``"skipped"``, ``"done"``,
+            ``"failed"`` or ``"blocked"`` (an upstream stage failed).
+        """
+        selected = self.select(targets)
+        dependencies = self.dependencies()
+        results = {}
+
+        if dry_run:
+            for name in selected:
+                upstream_ran = any(results[d] == "done" for d in dependencies[name])
+                if force or upstream_ran or self.is_stale(name):
+                    results[name] = "done"
+                    log(f"would run {name}")
+                else:
+                    results[name] = "skipped"
+            return results
+
+        remaining = list(selected)
+        running = {}
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            while remaining or running:
+                for name in list(remaining):
+                    upstream = [results.get(d) for d in dependencies[name]]
+                    if any(r in ("failed", "blocked") for r in upstream):
+                        results[name] = "blocked"
+                        remaining.remove(name)
+                        log(f"blocked {name}")
+                    elif all(r in ("skipped", "done") for r in upstream):
+                        remaining.remove(name)
+                        signature = self.signature(name)
+                        if not force and not self.is_stale(name):
+                            results[name] = "skipped"
+                            continue
+                        log(f"running {name}")
+                        future = executor.submit(self.stages[name].run, self.root)
+                        running[future] = (name, signature)
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, signature = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as error:
+                        results[name] = "failed"
+                        log(f"failed {name}: {error}")
+                        continue
+                    results[name] = "done"
+                    self._record(name, signature)
+
+        return results
+
+    def _record(self, name: str, signature: str) -> None:
+        stage = self.stages[name]
+        self._state["stages"][name] = {
+            "signature": signature,
+            "outputs": {f: self._hash_file(f) for f in stage.outputs},
+        }
+        self._save_state()
+
+    def _hash_file(self, path: str) -> str | None:
+        """
+        Hash a file, reusing the cached digest if its size and modification
+        time are unchanged. None if the file does not exist.
+        """
+        full_path = self.root / path
+        try:
+            stat = full_path.stat()
+        except FileNotFoundError:
+            return None
+        key = [stat.st_mtime_ns, stat.st_size]
+        cached = self._state["files"].get(path)
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(full_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest = digest.hexdigest()
+        self._state["files"][path] = key + [digest]
+        return digest
+
+    def _load_state(self) -> dict:
+        if self.state_file.exists():
+            with open(self.state_file) as f:
+                return json.load(f)
+        return {"stages": {}, "files": {}}
+
+    def _save_state(self) -> None:
+        temp_file = self.state_file.with_suffix(".tmp")
+        with open(temp_file, "w") as f:
+            json.dump(self._state, f, indent=1, sort_keys=True)
+        os.replace(temp_file, self.state_file)
+
+
+def _hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _package_code(action: Callable | str, root: str | Path = ".") -> list[str]:
+    """
+    Return the source files of this package that an action imports, directly
+    or through other modules of the package, relative to the root directory.
+
+    Imports of the package in the source of a function action or of a script
+    are followed, including the names exported at the top level
+    (``from endmember_utils import match_endmembers``).
+    """
+    root = Path(root)
+    if isinstance(action, str):
+        source = (root / action).read_text()
+    else:
+        source = _action_source(action)
+    files = []
+    pending = _package_imports(source)
+    while pending:
+        path = f"{PACKAGE_DIR}/{pending.pop()}.py"
+        if path in files or not (root / path).is_file():
+            continue
+        files.append(path)
+        pending |= _package_imports((root / path).read_text())
+    return sorted(files)
+
+
+def _action_source(action: Callable) -> str:
+    """
+    Return the source of a function and of the functions of its module that
+    it calls, recursively (e.g. the workflow behind a stage action).
+    """
+    module = inspect.getmodule(action)
+    sources = {}
+    pending = [action]
+    while pending:
+        function = pending.pop()
+        if function.__name__ in sources:
+            continue
+        sources[function.__name__] = inspect.getsource(function)
+        codes = [function.__code__]
+        while codes:
+            code = codes.pop()
+            codes += [c for c in code.co_consts if inspect.iscode(c)]
+            for name in code.co_names:
+                value = getattr(module, name, None)
+                if inspect.isfunction(value) and value.__module__ == module.__name__:
+                    pending.append(value)
+    return "\n".join(sources[name] for name in sorted(sources))
+
+
+def _package_imports(source: str) -> set[str]:
+    """
+    Return the names of the modules of this package imported in a source.
+    """
+    from . import _origins, _submodules
+
+    package = __name__.split(".")[0]
+    modules = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            modules |= {
+                alias.name.split(".")[1]
+                for alias in node.names
+                if alias.name.startswith(f"{package}.")
+            }
+        elif isinstance(node, ast.ImportFrom):
+            if node.level == 1 or node.module == package:
+                parts = [] if node.module in (None, package) else node.module.split(".")
+            elif node.level == 0 and (node.module or "").startswith(f"{package}."):
+                parts = node.module.split(".")[1:]
+            else:
+                continue
+            if parts:
+                modules.add(parts[0])
+                continue
+            # names imported from the package itself: submodules or exports
+            for alias in node.names:
+                if alias.name in _submodules:
+                    modules.add(alias.name)
+                elif alias.name in _origins:
+                    modules.add(_origins[alias.name])
+    return modules
+
+
+# Stage actions of this repo. Heavy dependencies are imported inside the
+# functions, so that the pipeline itself starts quickly.
+
+
+def synthetic_workflow(dataset_name: str, n_archetypes: int, aa_params: dict):
+    """
+    Fit AA to a synthetic dataset and match the endmembers to the true ones.
+
+    Returns the true endmembers, the matched fitted endmembers and the mixing
+    proportions.
+    """
+    import pandas as pd
+    from archetypes import AA
+    from .analysis import match_endmembers
+
+    synthetic_samples = pd.read_csv(f"data/synthetic/{dataset_name}_samples.csv")
+    endmembers = pd.read_csv("data/synthetic/endmembers.csv", index_col=0)
+    aa = AA(n_archetypes, **aa_params)
+    mixing_proportions = aa.fit_transform(synthetic_samples)
+    endmembers_fitted = pd.DataFrame(aa.archetypes_, columns=endmembers.columns)
+    endmembers_fitted, mixing_proportions = match_endmembers(
+        endmembers, endmembers_fitted, mixing_proportions
+    )
+    return endmembers, endmembers_fitted, mixing_proportions
+
+
+def fit_synthetic(dataset_name: str, n_archetypes: int, aa_params: dict) -> None:
+    """
+    Fit AA to a synthetic dataset and save the matched endmembers and mixing
+    proportions.
+    """
+    _, endmembers_fitted, mixing_proportions = synthetic_workflow(
+        dataset_name, n_archetypes, aa_params
+    )
+    endmembers_fitted.to_csv(f"results/synthetic/AA_{dataset_name}_endmembers.csv")
+    mixing_proportions.to_csv(
+        f"results/synthetic/AA_{dataset_name}_mixing_proportions.csv", index=False
+    )
+
+
+def match_raw_output(method: str, dataset_name: str) -> None:
+    """
+    Match the raw endmembers of a compared method to the true ones.
+    """
+    import numpy as np
+    import pandas as pd
+    from .analysis import match_endmembers
+
+    endmembers = pd.read_csv("data/synthetic/endmembers.csv", index_col=0)
+    endmembers_raw = np.loadtxt(
+        f"results/synthetic/{method}_{dataset_name}_endmembers_raw_output.csv",
+        delimiter=",",
+    )
+    match_endmembers(endmembers, endmembers_raw).to_csv(
+        f"results/synthetic/{method}_{dataset_name}_endmembers.csv"
+    )
+
+
+def panola_workflow(n_archetypes: int, aa_params: dict):
+    """
+    Fit AA to the rescaled Panola stream chemistry.
+
+    Returns the endmembers of the literature and the matched fitted endmembers.
+    """
+    import pandas as pd
+    from archetypes import AA
+    from sklearn.preprocessing import StandardScaler
+    from .analysis import match_endmembers
+
+    panola = pd.read_csv("data/panola/panola_data.csv")
+    endmembers = pd.read_csv("data/panola/panola_end_members.csv", index_col=0)
+    rescaler = StandardScaler(with_mean=False, with_std=True)
+    panola_scaled = rescaler.fit_transform(panola)
+
+    aa = AA(n_archetypes, **aa_params).fit(panola_scaled)
+    endmembers_fitted = rescaler.inverse_transform(aa.archetypes_)
+    endmembers_fitted = pd.DataFrame(endmembers_fitted, columns=endmembers.columns)
+    return endmembers, match_endmembers(endmembers, endmembers_fitted)
+
+
+def fit_panola(n_archetypes: int, aa_params: dict) -> None:
+    """
+    Fit AA to the rescaled Panola stream chemistry.
+    """
+    _, endmembers_fitted = panola_workflow(n_archetypes, aa_params)
+    endmembers_fitted.to_csv("results/panola/endmembers_fitted.csv")
+
+
+def nazca_workflow(n_archetypes: int, aa_params: dict):
+    """
+    Fit AA to the Nazca sediment elemental fractions.
+
+    Returns the endmembers of Dymond (1981) and the matched fitted endmembers.
+    """
+    import warnings
+    import pandas as pd
+    from archetypes import AA
+    from sklearn.preprocessing import normalize
+    from .analysis import match_endmembers
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        nazca = pd.read_excel(
+            "data/nazca/ggge20247-sup-001a-supinfo1a.xlsx", usecols="B:I", header=1
+        )
+    endmember_dymond = pd.read_csv(
+        "data/nazca/Dymond1981_endmember_fraction.csv", index_col=0
+    )
+    nazca_normalized = normalize(nazca, norm="l1", axis=1)
+
+    aa = AA(n_archetypes, **aa_params).fit(nazca_normalized)
+    endmembers_fitted = pd.DataFrame(aa.archetypes_, columns=endmember_dymond.columns)
+    return endmember_dymond, match_endmembers(endmember_dymond, endmembers_fitted)
+
+
+def fit_nazca(n_archetypes: int, aa_params: dict) -> None:
+    """
+    Fit AA to the Nazca sediment elemental fractions.
+    """
+    _, endmembers_fitted = nazca_workflow(n_archetypes, aa_params)
+    endmembers_fitted.to_csv("results/nazca/endmembers_fitted.csv")
+
+
+def jasper_workflow(n_archetypes: int, aa_params: dict):
+    """
+    Fit AA to the Jasper Ridge image.
+
+    Returns the normalized reference endmembers, the fitted endmembers, and the
+    normalized fitted endmembers matched to the reference ones.
+    """
+    import numpy as np
+    import scipy.io
+    import spectral
+    from archetypes import AA
+    from sklearn.preprocessing import normalize
+    from .analysis import match_endmembers
+
+    jasper_endmembers = scipy.io.loadmat("data/jasper_ridge/end4.mat")["M"].T
+    jasper = spectral.open_image("data/jasper_ridge/jasperRidge2_R198.hdr").load()
+    jasper = np.asarray(jasper).reshape(-1, jasper.shape[-1])
+
+    aa = AA(n_archetypes, **aa_params).fit(jasper)
+    endmembers_fitted = aa.archetypes_
+    jasper_endmembers_normalized = normalize(jasper_endmembers, axis=1)
+    endmembers_fitted_normalized = match_endmembers(
+        jasper_endmembers_normalized, normalize(endmembers_fitted, axis=1)
+    )
+    return (
+        jasper_endmembers_normalized,
+        endmembers_fitted,
+        endmembers_fitted_normalized,
+    )
+
+
+def fit_jasper(n_archetypes: int, aa_params: dict) -> None:
+    """
+    Fit AA to the Jasper Ridge image.
+    """
+    import numpy as np
+
+    _, endmembers_fitted, endmembers_fitted_normalized = jasper_workflow(
+        n_archetypes, aa_params
+    )
+    np.save("results/jasper_ridge/endmembers_fitted.npy", endmembers_fitted)
+    np.save(
+        "results/jasper_ridge/endmembers_fitted_normalized.npy",
+        endmembers_fitted_normalized,
+    )
+
+
+def repo_stages(
+    aa_params: Mapping = GLOBAL_AA_PARAMS, root: str | Path = "."
+) -> list[Stage]:
+    """
+    Return the stages that reproduce ``data/synthetic``, ``results/`` and
+    ``images/`` of this repo. Figures only made in ``examples/demo.ipynb``
+    are not included.
+
+    The code of each stage is the modules of the package that its action
+    imports, found in the sources under `root`.
+    """
+    aa_params = dict(aa_params)
+    synthetic_dir = "data/synthetic"
+    results_dir = "results/synthetic"
+    alpha_names = [f"alpha={alpha}" for alpha in (2, 4)]
+    shifted_names = [f"{name}_shifted" for name in alpha_names]
+
+    stages = [
+        Stage(
+            "synthetic-data",
+            "scripts/data/generate_synthetic_data.py",
+            outputs=[
+                f"{synthetic_dir}/{name}.csv"
+                for name in [
+                    "endmembers",
+                    "endmembers_shifted",
+                    "mixing_proportions",
+                    "noisefree_samples",
+                    "noisy_samples",
+                ]
+                + [f"{a}_samples" for a in alpha_names + shifted_names]
+                + [f"{a}_mixing_proportions" for a in alpha_names]
+            ],
+        )
+    ]
+
+    for dataset_name in ["noisefree", "noisy"] + alpha_names + shifted_names:
+        stages.append(
+            Stage(
+                f"fit-synthetic-{dataset_name}",
+                fit_synthetic,
+                inputs=[
+                    f"{synthetic_dir}/{dataset_name}_samples.csv",
+                    f"{synthetic_dir}/endmembers.csv",
+                ],
+                outputs=[
+                    f"{results_dir}/AA_{dataset_name}_endmembers.csv",
+                    f"{results_dir}/AA_{dataset_name}_mixing_proportions.csv",
+                ],
+                params={
+                    "dataset_name": dataset_name,
+                    "n_archetypes": 4,
+                    "aa_params": aa_params,
+                },
+            )
+        )
+
+    for dataset_name in ["noisefree", "noisy"] + alpha_names:
+        stages.append(
+            Stage(
+                f"match-CHEMMA-{dataset_name}",
+                match_raw_output,
+                inputs=[
+                    f"{results_dir}/CHEMMA_{dataset_name}_endmembers_raw_output.csv",
+                    f"{synthetic_dir}/endmembers.csv",
+                ],
+                outputs=[f"{results_dir}/CHEMMA_{dataset_name}_endmembers.csv"],
+                params={"method": "CHEMMA", "dataset_name": dataset_name},
+            )
+        )
+
+    stages += [
+        Stage(
+            "fit-panola",
+            fit_panola,
+            inputs=["data/panola/panola_data.csv", "data/panola/panola_end_members.csv"],
+            outputs=["results/panola/endmembers_fitted.csv"],
+            params={"n_archetypes": 3, "aa_params": aa_params},
+        ),
+        Stage(
+            "fit-nazca",
+            fit_nazca,
+            inputs=[
+                "data/nazca/ggge20247-sup-001a-supinfo1a.xlsx",
+                "data/nazca/Dymond1981_endmember_fraction.csv",
+            ],
+            outputs=["results/nazca/endmembers_fitted.csv"],
+            params={"n_archetypes": 5, "aa_params": aa_params},
+        ),
+        Stage(
+            "fit-jasper",
+            fit_jasper,
+            inputs=[
+                "data/jasper_ridge/end4.mat",
+                "data/jasper_ridge/jasperRidge2_R198.hdr",
+                "data/jasper_ridge/jasperRidge2_R198.img",
+            ],
+            outputs=[
+                "results/jasper_ridge/endmembers_fitted.npy",
+                "results/jasper_ridge/endmembers_fitted_normalized.npy",
+            ],
+            params={"n_archetypes": 4, "aa_params": aa_params},
+        ),
+    ]
+
+    stages += [
+        Stage(
+            "plot-aa-basic-concepts",
+            "scripts/plots/plot_aa_basic_concepts.py",
+            outputs=["images/aa_basic_concepts.pdf"],
+        ),
+        Stage(
+            "plot-synthetic-results",
+            "scripts/plots/plot_synthetic_data_results.py",
+            inputs=[f"{synthetic_dir}/endmembers.csv"]
+            + [
+                f"{synthetic_dir}/{dataset_name}_samples.csv"
+                for dataset_name in ("noisefree", "noisy")
+            ]
+            + [
+                f"{results_dir}/{method}_{dataset_name}_endmembers.csv"
+                for method in ("AA", "NMF", "CHEMMA", "EDAA")
+                for dataset_name in ("noisefree", "noisy")
+            ],
+            outputs=["images/synthetic_results.pdf"],
+        ),
+        Stage(
+            "plot-synthetic-mixing-proportions",
+            "scripts/plots/plot_synthetic_mixing_proportions.py",
+            inputs=[f"{synthetic_dir}/mixing_proportions.csv"]
+            + [
+                f"{results_dir}/AA_{dataset_name}_mixing_proportions.csv"
+                for dataset_name in ("noisefree", "noisy")
+            ],
+            outputs=["images/synthetic_mixing_proportions.pdf"],
+        ),
+        Stage(
+            "plot-shifted-synthetic-NMF",
+            "scripts/plots/plot_shifted_synthetic_NMF_results.py",
+            inputs=[f"{synthetic_dir}/endmembers_shifted.csv"]
+            + [f"{synthetic_dir}/{name}_samples.csv" for name in shifted_names]
+            + [
+                f"{results_dir}/{method}_{name}_endmembers.csv"
+                for method in ("AA", "NMF")
+                for name in shifted_names
+            ],
+            outputs=["images/synthetic_NMF_shifted.pdf"],
+        ),
+        Stage(
+            "plot-nazca-other-perspectives",
+            "scripts/plots/plot_nazca_other_perspectives.py",
+            inputs=[
+                "data/nazca/ggge20247-sup-001a-supinfo1a.xlsx",
+                "data/nazca/LP1984_endmember_fraction.csv",
+                "data/nazca/Dymond1981_endmember_fraction.csv",
+                "results/nazca/endmembers_fitted.csv",
+            ],
+            outputs=["images/nazca_other_perspectives.pdf"],
+        ),
+    ]
+    for stage in stages:
+        stage.code += tuple(_package_code(stage.action, root))
+    return stages
@@ -1,15 +1,17 @@
 """
 Utilities for plotting.
+
+seaborn, scipy.spatial and mplot3d are imported in the methods that use them.
 """
 
-from scipy.spatial import ConvexHull
+from os import PathLike
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
-from matplotlib.collections import LineCollection
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection, Line3DCollection
-import seaborn as sns
+from matplotlib.collections import Collection, LineCollection
+from matplotlib.lines import Line2D
 import numpy as np
 from numpy.typing import ArrayLike
+from .profiling import profiled
 
 
 class EndmemberHeatmap:
@@ -43,6 +45,8 @@ class EndmemberHeatmap:
         -------
         None
         """
+        import seaborn as sns
+
         sns.heatmap(data, annot=annot, cmap=cmap, ax=self.ax, **kwargs)
 
 
@@ -128,13 +132,20 @@ class Scatter:
         """
         add stem lines to the scatter plot of samples.
 
+        The stems go from the bottom of the plot to each sample, and are drawn
+        as a single collection. If any of the format strings `linefmt`,
+        `markerfmt` or `basefmt` is given, they are drawn by `axes.stem`
+        instead, with its markers and baseline only if their format is given.
+
         Parameters
         ----------
         X: (N, 2) or (N,3) ArrayLike
             The samples to be plotted.
         **kwargs
-            Additional keyword arguments to be passed to the `axes.stem` function,
-            e.g. `linefmt`, `markerfmt`, `basefmt`, `label`, etc.
+            Additional keyword arguments to be passed to the
+            `matplotlib.collections.LineCollection` constructor,
+            e.g. `colors`, `linestyles`, `label`, etc., or to `axes.stem`
+            with the format strings.
 
         Returns
         -------
@@ -142,19 +153,50 @@ class Scatter:
             The stem lines object.
         """
         X, ax = self._validate_data(X)
+        formats = {
+            key: kwargs.pop(key)
+            for key in ("linefmt", "markerfmt", "basefmt")
+            if key in kwargs
+        }
+        if formats:
+            return self._stem(X, ax, linewidth, formats, kwargs)
+
+        kwargs.setdefault("colors", "lightgray")
+        kwargs.setdefault("zorder", -1)
+        bottom = X.copy()
+        if self.ndim == 2:
+            bottom[:, 1] = ax.get_ybound()[0]
+        else:
+            bottom[:, 2] = ax.get_zbound()[0]
+        segments = np.stack([bottom, X], axis=1)
+        if self.ndim == 2:
+            stemlines = LineCollection(segments, linewidths=linewidth, **kwargs)
+            ax.add_collection(stemlines)
+        else:
+            from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+            stemlines = Line3DCollection(segments, linewidths=linewidth, **kwargs)
+            ax.add_collection3d(stemlines)
+
+        return stemlines
+
+    def _stem(self, X, ax, linewidth, formats, kwargs):
+        """
+        Draw the stems of `stem_samples` with `axes.stem` and format strings.
+        """
+        bottom = ax.get_ybound()[0] if self.ndim == 2 else ax.get_zbound()[0]
         markerline, stemlines, baseline = ax.stem(
             *(X[:, i] for i in range(self.ndim)),
-            bottom=ax.get_zbound()[0],
-            linefmt="lightgray",
-            markerfmt="",
-            basefmt="",
+            bottom=bottom,
+            **{"linefmt": "lightgray", "markerfmt": "", "basefmt": "", **formats},
             **kwargs,
         )
-        markerline.remove()
-        baseline.remove()
+        if "markerfmt" not in formats:
+            markerline.remove()
+        if "basefmt" not in formats:
+            baseline.remove()
         stemlines.set_linewidth(linewidth)
         stemlines.set_zorder(-1)
-
         return stemlines
 
     def plot_endmembers(
@@ -206,12 +248,14 @@ class Scatter:
             **kwargs,
         )
 
-        if label:
-            (line,) = ax.plot(  # only for legend
-                *([endmembers[0, i]] for i in range(self.ndim)),
-                linestyle=endmember_polygon.get_linestyle() if plot_ploygon else "",
-                color=endmember_polygon.get_edgecolor() if plot_ploygon else None,
-                linewidth=endmember_polygon.get_linewidth() if plot_ploygon else None,
+        if label and not plot_ploygon:
+            line.set_label(label)
+        elif label:
+            (line,) = ax.plot(  # only for legend, so without data to draw
+                *([] for i in range(self.ndim)),
+                linestyle=endmember_polygon.get_linestyle(),
+                color=endmember_polygon.get_edgecolor(),
+                linewidth=endmember_polygon.get_linewidth(),
                 marker=line.get_marker(),
                 markersize=line.get_markersize(),
                 markerfacecolor=line.get_markerfacecolor(),
@@ -232,7 +276,12 @@ class Scatter:
         **kwargs
     ):
         """
-        Plot each endmember with a different color, using `axes.plot` repeatedly.
+        Plot each endmember with a different color.
+
+        The markers are drawn as a single `axes.scatter` collection, with the
+        marker style of `axes.plot`. The label and style of each endmember are
+        held by a line without data added to the axes, so that `axes.legend`
+        shows them.
 
         Parameters
         ----------
@@ -245,32 +294,60 @@ class Scatter:
         labels: list
             The labels for each endmember.
         **kwargs
-            Additional keyword arguments to be passed to the `axes.plot` function.
+            Marker style keyword arguments of the `axes.plot` function:
+            `markersize`, `markeredgecolor`, `markeredgewidth`,
+            `markerfacecolor` (or their aliases), `fillstyle` (``"full"`` or
+            ``"none"``), `alpha`, `zorder`, `clip_on`, `rasterized` and
+            `picker`. Others raise a TypeError.
 
         Returns
         -------
         lines: list of matplotlib.lines.Line2D
-            The line objects representing the scatter plot.
+            The legend-only line of each endmember, e.g. for the `handles` of a
+            figure legend, ``fig.legend(handles=lines)``.
         """
         endmembers, ax = self._validate_data(endmembers)
         if plot_ploygon:
             endmember_polygon = self.plot_polygon(endmembers, polygon_kwargs)
 
-        lines = []
-        for i, endmember in enumerate(endmembers):
-            (line,) = ax.plot(
-                *([endmember[i]] for i in range(self.ndim)),
+        # one collection for all the markers; drawing even empty lines per
+        # endmember would cost as much as drawing the markers one by one
+        scatter_kwargs = _line_to_scatter_kwargs(
+            kwargs, self.ndim, [colors[i] for i in range(len(endmembers))]
+        )
+        ax.scatter(
+            *(endmembers[:, i] for i in range(self.ndim)),
+            marker=marker,
+            **scatter_kwargs,
+        )
+        lines = [
+            Line2D(
+                [],
+                [],
                 color=colors[i],
                 marker=marker,
                 linestyle="",
                 label=labels[i],
                 **kwargs,
             )
-            lines.append(line)
+            for i in range(len(endmembers))
+        ]
+        for line in lines:
+            ax.add_line(line)
 
         return lines
 
-    def link_observed_vs_fitted(self, observed: ArrayLike, fitted: ArrayLike, **kwargs):
+    @profiled("plot")
+    def link_observed_vs_fitted(
+        self,
+        observed: ArrayLike,
+        fitted: ArrayLike | None = None,
+        *,
+        A: ArrayLike | None = None,
+        archetypes: ArrayLike | None = None,
+        features=None,
+        **kwargs,
+    ):
         """
         Link observed and fitted data points.
 
@@ -278,8 +355,17 @@ class Scatter:
         ----------
         observed: (N, 2) or (N, 3) ArrayLike
             The observed data points.
-        fitted: (N, 2) or (N, 3) ArrayLike
-            The fitted data points.
+        fitted: (N, 2) or (N, 3) ArrayLike, optional
+            The fitted data points. If None, they are reconstructed from `A`
+            and `archetypes`.
+        A: (N, n_archetypes) ArrayLike, optional
+            The mixing proportions of the observed data points, e.g. ``aa.A_``.
+        archetypes: (n_archetypes, n_features) ArrayLike, optional
+            The archetypes, e.g. ``aa.archetypes_``.
+        features: list of int, optional
+            The columns of `archetypes` plotted as `observed`. Only these are
+            reconstructed, as ``A @ archetypes[:, features]``, rather than all
+            features. Default is all the columns of `archetypes`.
         **kwargs
             Additional keyword arguments to be passed to the
             `matplotlib.collections.LineCollection` constructor.
@@ -290,6 +376,13 @@ class Scatter:
         lines: matplotlib.collections.LineCollection
             The line object representing the links.
         """
+        if fitted is None:
+            if A is None or archetypes is None:
+                raise ValueError("Either fitted or both A and archetypes are needed.")
+            archetypes = np.asarray(archetypes)
+            if features is not None:
+                archetypes = archetypes[:, features]
+            fitted = np.asarray(A) @ archetypes
         observed, ax = self._validate_data(observed)
         fitted, ax = self._validate_data(fitted)
         assert (
@@ -302,6 +395,8 @@ class Scatter:
             lines = LineCollection(lines, **kwargs)
             ax.add_collection(lines)
         elif self.ndim == 3:
+            from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
             lines = Line3DCollection(lines, **kwargs)
             ax.add_collection3d(lines)
         return lines
@@ -324,6 +419,8 @@ class Scatter:
         hull_polygon: matplotlib.patches.Polygon
             The polygon object representing the convex hull.
         """
+        from scipy.spatial import ConvexHull
+
         X, ax = self._validate_data(X)
         assert self.ndim == 2, "only 2D scatter plots are supported."
         convex_hull = ConvexHull(X)
@@ -341,6 +438,9 @@ class Scatter:
             )
             ax.add_patch(endmember_polygon)
         elif self.ndim == 3:
+            from scipy.spatial import ConvexHull
+            from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
             hull = ConvexHull(endmembers)
             simplices = hull.simplices
             facets = [endmembers[simplex] for simplex in simplices]
@@ -357,3 +457,129 @@ class Scatter:
             data.shape[1] == self.ndim
         ), "data must have the same dimension as the scatter plot."
         return data, ax
+
+
+@profiled("plot")
+def save_figure(
+    fig,
+    path: str | PathLike,
+    *,
+    rasterize_above: int = 1000,
+    dpi: float = 300,
+    **kwargs,
+) -> list:
+    """
+    Save a figure to a vector format with its heavy layers rasterized.
+
+    Lines and collections with more than `rasterize_above` points or paths,
+    such as the layers of `Scatter.plot_samples`, `Scatter.scatter`,
+    `Scatter.stem_samples` and `Scatter.link_observed_vs_fitted` for thousands
+    of samples, are written as images at `dpi`, which keeps PDF and SVG files
+    small and fast to save and open. Axes, text, endmember markers and
+    polygons stay vector. The rasterization is undone after saving.
+
+    Parameters
+    ----------
+    fig: matplotlib.figure.Figure
+        The figure to save.
+    path: str or path-like
+        The file to write, whose extension gives the format unless `format`
+        is passed.
+    rasterize_above: int, default=1000
+        The number of points (or paths, for collections) above which a layer
+        is rasterized.
+    dpi: float, default=300
+        The resolution of the rasterized layers.
+    **kwargs
+        Additional keyword arguments to be passed to `Figure.savefig`, e.g.
+        `bbox_inches`.
+
+    Returns
+    -------
+    rasterized: list of matplotlib.artist.Artist
+        The layers that were rasterized.
+    """
+    rasterized = [
+        artist
+        for ax in fig.axes
+        for artist in ax.get_children()
+        if not artist.get_rasterized() and _n_elements(artist) > rasterize_above
+    ]
+    for artist in rasterized:
+        artist.set_rasterized(True)
+    try:
+        fig.savefig(path, dpi=dpi, **kwargs)
+    finally:
+        for artist in rasterized:
+            artist.set_rasterized(False)
+    return rasterized
+
+
+def _line_to_scatter_kwargs(kwargs: dict, ndim: int, colors) -> dict:
+    """
+    Translate the marker style of `axes.plot` keyword arguments to those of
+    `axes.scatter`, so that both draw the same markers, each point with its
+    color in `colors`. Raise TypeError for the arguments without a
+    counterpart.
+    """
+    aliases = {
+        "ms": "markersize",
+        "mec": "markeredgecolor",
+        "mew": "markeredgewidth",
+        "mfc": "markerfacecolor",
+    }
+    kwargs = {aliases.get(key, key): value for key, value in kwargs.items()}
+    supported = {
+        "markersize",
+        "markeredgecolor",
+        "markeredgewidth",
+        "markerfacecolor",
+        "fillstyle",
+        "alpha",
+        "zorder",
+        "clip_on",
+        "rasterized",
+        "picker",
+    }
+    unsupported = sorted(set(kwargs) - supported)
+    if unsupported:
+        raise TypeError(
+            f"Marker style arguments not supported: {', '.join(unsupported)}."
+        )
+    fillstyle = kwargs.get("fillstyle", "full")
+    if fillstyle not in ("full", "none"):
+        raise TypeError(f"fillstyle {fillstyle!r} not supported, only 'full' or 'none'.")
+
+    markersize = kwargs.get("markersize", plt.rcParams["lines.markersize"])
+    scatter_kwargs = {
+        "s": markersize**2,
+        "linewidths": kwargs.get(
+            "markeredgewidth", plt.rcParams["lines.markeredgewidth"]
+        ),
+    }
+    if fillstyle == "none" or "markerfacecolor" in kwargs:
+        # as with axes.plot, the edges keep the color of the line
+        scatter_kwargs["facecolors"] = (
+            "none" if fillstyle == "none" else kwargs["markerfacecolor"]
+        )
+        scatter_kwargs["edgecolors"] = kwargs.get("markeredgecolor", colors)
+    else:
+        scatter_kwargs["c"] = colors
+        scatter_kwargs["edgecolors"] = kwargs.get("markeredgecolor", "face")
+    for key in ("alpha", "zorder", "clip_on", "rasterized", "picker"):
+        if key in kwargs:
+            scatter_kwargs[key] = kwargs[key]
+    if ndim == 3:
+        scatter_kwargs["depthshade"] = False
+    return scatter_kwargs
+
+
+def _n_elements(artist) -> int:
+    """The number of points or paths drawn by a line or collection, else 0."""
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata())
+    if isinstance(artist, Collection):
+        # 3D line collections only set their (projected) paths when drawn
+        segments = getattr(artist, "_segments3d", ())
+        return max(len(artist.get_paths()), len(artist.get_offsets()), len(segments))
+    return 0
@@ -0,0 +1,229 @@
+"""
+Opt-in profiling of the memory and time used by analysis stages.
+
+Stages are delimited with `stage` (or the `profiled` decorator). They cost
+nothing unless a profiler is active, which is done with `profile`::
+
+    from endmember_utils.profiling import profile, stage
+
+    with profile() as profiler:
+        with stage("load"):
+            X = np.load("scene.npy")
+        aa_list, A_list = multi_AA(X, [4])  # recorded as a "fit" stage
+    print(profiler.report())
+
+Stages of `endmember_utils` itself (``synthetic``, ``preprocess``, ``fit``,
+``match``, ``unmix``, ``plot``) are already delimited.
+"""
+
+import functools
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import PathLike
+import numpy as np
+
+DEFAULT_THRESHOLD = 1 << 20
+
+_active_profiler: ContextVar["Profiler | None"] = ContextVar(
+    "active_profiler", default=None
+)
+
+
+class Profiler:
+    """
+    Record the wall time and traced memory of nested stages.
+
+    Memory is traced with `tracemalloc`, which also sees NumPy array buffers.
+    For each stage, the record holds the peak memory reached during the stage
+    and the memory still allocated at its end, both relative to the start of
+    the stage, and the NumPy allocations made during the stage, still alive at
+    its end and above `threshold`, by source line. Short-lived arrays only show
+    in the peak. Listing allocations takes a snapshot of all traced memory at
+    the start and end of each stage, which is slow when many objects are
+    allocated while profiling, e.g. when modules are imported for the first
+    time.
+
+    Parameters
+    ----------
+    threshold : int, default=1 MiB
+        The size in bytes above which allocations (summed by source line) are
+        listed. No allocations are listed if None, which is faster.
+
+    Attributes
+    ----------
+    stages : list of dict
+        One record per finished stage, in the order they finished: the name
+        (``name``, nested names joined by ``/``), wall time in seconds
+        (``wall_time``), peak and retained memory in bytes (``peak_memory``,
+        ``retained_memory``) and the allocations (``allocations``, a list of
+        dicts with ``location``, ``size`` and ``count``).
+    peak_memory : int
+        The peak memory traced while the profiler was active, in bytes.
+    """
+
+    def __init__(self, threshold: int | None = DEFAULT_THRESHOLD) -> None:
+        self.threshold = threshold
+        self.stages: list[dict] = []
+        self.peak_memory = 0
+        self._stack: list[dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Record a stage, which may contain other stages.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("The profiler is only active within `profile`.")
+        self._update_peak()
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        frame = {
+            "name": "/".join([f["name"] for f in self._stack] + [name]),
+            "peak": start_memory,
+            "snapshot": self._snapshot(),
+        }
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            self._update_peak()
+            self._stack.pop()
+            end_memory = tracemalloc.get_traced_memory()[0]
+            self.stages.append(
+                {
+                    "name": frame["name"],
+                    "wall_time": wall_time,
+                    "peak_memory": frame["peak"] - start_memory,
+                    "retained_memory": end_memory - start_memory,
+                    "allocations": self._allocations(frame["snapshot"]),
+                }
+            )
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], frame["peak"])
+
+    def report(self) -> str:
+        """
+        Return a table of the stages, with their allocations below them.
+        """
+        mib = 1 << 20
+        lines = [
+            f"{'stage':<40}{'wall (s)':>10}{'peak (MiB)':>12}{'retained (MiB)':>16}"
+        ]
+        for record in self.stages:
+            lines.append(
+                f"{record['name']:<40}{record['wall_time']:>10.3f}"
+                f"{record['peak_memory'] / mib:>12.1f}"
+                f"{record['retained_memory'] / mib:>16.1f}"
+            )
+            for allocation in record["allocations"]:
+                lines.append(
+                    f"  {allocation['location']:<48}"
+                    f"{allocation['size'] / mib:>10.1f} MiB in {allocation['count']}"
+                )
+        lines.append(f"peak traced memory: {self.peak_memory / mib:.1f} MiB")
+        return "\n".join(lines)
+
+    def to_json(self, path: str | PathLike | None = None) -> str:
+        """
+        Return the records as JSON, and write them to `path` if given.
+        """
+        text = json.dumps(
+            {"peak_memory": self.peak_memory, "stages": self.stages}, indent=2
+        )
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def _update_peak(self) -> None:
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak_memory = max(self.peak_memory, peak)
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+    def _snapshot(self):
+        if self.threshold is None:
+            return None
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+        )
+
+    def _allocations(self, start_snapshot) -> list[dict]:
+        if start_snapshot is None:
+            return []
+        differences = self._snapshot().compare_to(start_snapshot, "lineno")
+        return [
+            {
+                "location": f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}",
+                "size": diff.size_diff,
+                "count": diff.count_diff,
+            }
+            for diff in differences
+            if diff.size_diff >= self.threshold
+        ]
+
+
+@contextmanager
+def profile(threshold: int | None = DEFAULT_THRESHOLD):
+    """
+    Activate a profiler for the stages run within the context.
+
+    Memory tracing is started (and stopped at the end, unless it was already
+    running), which slows down allocations, so that profiling is opt-in.
+
+    Parameters
+    ----------
+    threshold : int, default=1 MiB
+        See `Profiler`.
+
+    Yields
+    ------
+    profiler : Profiler
+        The profiler holding the records.
+    """
+    profiler = Profiler(threshold)
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        profiler._update_peak()
+        _active_profiler.reset(token)
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Delimit a stage, recorded by the active profiler if there is one.
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
+
+
+def profiled(name: str):
+    """
+    Decorate a function so that each call is a stage.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
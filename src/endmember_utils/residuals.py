@@ -0,0 +1,156 @@
+"""
+Reconstruction errors of fitted mixing proportions, computed by chunks of
+samples.
+
+The reconstruction ``A @ archetypes`` has the shape of the data, so building
+it at once doubles the memory used by pixel-scale data. The functions here
+reconstruct `chunk_size` samples at a time, so that their peak memory is that
+of a chunk, and read the data and mixing proportions chunk by chunk, so that
+they can be memory-mapped arrays (see `endmember_utils.storage`)::
+
+    summary = residual_summary(X, aa.A_, aa.archetypes_, n_worst=20)
+    X[summary["worst"]]  # the worst explained samples
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def residual_summary(
+    X: ArrayLike,
+    A: ArrayLike,
+    archetypes: ArrayLike,
+    *,
+    sample_weight: ArrayLike | None = None,
+    n_worst: int = 10,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Compute the reconstruction errors of `X` by ``A @ archetypes`` in one
+    chunked pass.
+
+    Parameters
+    ----------
+    X : array-like of shape (n_samples, n_features)
+        The data, e.g. a memory-mapped array.
+    A : array-like of shape (n_samples, n_archetypes)
+        The mixing proportions, e.g. ``aa.A_`` or a memory-mapped map.
+    archetypes : array-like of shape (n_archetypes, n_features)
+        The archetypes.
+    sample_weight : array-like of shape (n_samples,), optional
+        The weights of the samples in the RSS and the per-feature errors, e.g.
+        the counts returned by `endmember_utils.analysis.collapse_duplicates`.
+    n_worst : int, default=10
+        The number of worst explained samples to return.
+    chunk_size : int, default=65536
+        The number of samples reconstructed at a time.
+
+    Returns
+    -------
+    summary : dict
+        The residual sum of squares (``rss``, weighted if `sample_weight` is
+        given), the Euclidean norm of the residual of each sample
+        (``residual_norms``, ndarray of shape (n_samples,)), the (weighted)
+        sum of squared residuals of each feature (``feature_rss``, ndarray of
+        shape (n_features,)) and the indices of the `n_worst` samples with the
+        largest residual norms, worst first (``worst``).
+    """
+    X, A, archetypes = _validate(X, A, archetypes)
+    if sample_weight is not None:
+        sample_weight = np.asarray(sample_weight, dtype=float)
+    residual_norms = np.empty(len(X))
+    feature_rss = np.zeros(X.shape[1])
+    for start, residuals in _chunk_residuals(X, A, archetypes, chunk_size):
+        squared = np.square(residuals, out=residuals)
+        squared_norms = squared.sum(axis=1)
+        residual_norms[start : start + len(residuals)] = np.sqrt(squared_norms)
+        if sample_weight is None:
+            feature_rss += squared.sum(axis=0)
+        else:
+            feature_rss += sample_weight[start : start + len(residuals)] @ squared
+
+    n_worst = min(n_worst, len(X))
+    worst = np.argpartition(-residual_norms, n_worst - 1)[:n_worst] if n_worst else []
+    worst = np.asarray(worst, dtype=int)
+    worst = worst[np.argsort(-residual_norms[worst], kind="stable")]
+    return {
+        "rss": float(feature_rss.sum()),
+        "residual_norms": residual_norms,
+        "feature_rss": feature_rss,
+        "worst": worst,
+    }
+
+
+def residual_norms(
+    X: ArrayLike,
+    A: ArrayLike,
+    archetypes: ArrayLike,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    Compute the Euclidean norm of the residual of each sample of `X`,
+    reconstructed as ``A @ archetypes``, by chunks of samples.
+
+    See `residual_summary` for the parameters.
+    """
+    X, A, archetypes = _validate(X, A, archetypes)
+    norms = np.empty(len(X))
+    for start, residuals in _chunk_residuals(X, A, archetypes, chunk_size):
+        norms[start : start + len(residuals)] = np.sqrt(
+            np.einsum("ij,ij->i", residuals, residuals)
+        )
+    return norms
+
+
+def rss(
+    X: ArrayLike,
+    A: ArrayLike,
+    archetypes: ArrayLike,
+    *,
+    sample_weight: ArrayLike | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> float:
+    """
+    Compute the (weighted) residual sum of squares of `X` reconstructed as
+    ``A @ archetypes``, by chunks of samples.
+
+    See `residual_summary` for the parameters.
+    """
+    X, A, archetypes = _validate(X, A, archetypes)
+    if sample_weight is not None:
+        sample_weight = np.asarray(sample_weight, dtype=float)
+    total = 0.0
+    for start, residuals in _chunk_residuals(X, A, archetypes, chunk_size):
+        squared_norms = np.einsum("ij,ij->i", residuals, residuals)
+        if sample_weight is not None:
+            squared_norms *= sample_weight[start : start + len(residuals)]
+        total += squared_norms.sum()
+    return float(total)
+
+
+def _validate(X, A, archetypes):
+    # keep memory-mapped arrays as they are, they are read by chunks
+    X = X if isinstance(X, np.ndarray) else np.asarray(X, dtype=float)
+    A = A if isinstance(A, np.ndarray) else np.asarray(A, dtype=float)
+    archetypes = np.asarray(archetypes, dtype=float)
+    if X.ndim != 2 or A.ndim != 2 or len(X) != len(A):
+        raise ValueError(
+            f"X {X.shape} and A {A.shape} must be 2D with the same number of samples."
+        )
+    if archetypes.shape != (A.shape[1], X.shape[1]):
+        raise ValueError(
+            f"archetypes {archetypes.shape} must have shape "
+            f"{(A.shape[1], X.shape[1])}."
+        )
+    return X, A, archetypes
+
+
+def _chunk_residuals(X, A, archetypes, chunk_size):
+    """Yield the start of each chunk and its residuals, ``A @ archetypes - X``."""
+    for start in range(0, len(X), chunk_size):
+        residuals = np.asarray(A[start : start + chunk_size], dtype=float) @ archetypes
+        residuals -= X[start : start + chunk_size]
+        yield start, residuals
@@ -0,0 +1,94 @@
+"""
+Utilities for projecting onto the unit simplex.
+
+The unit simplex is the set of non-negative vectors summing to one, where the
+mixing proportions (and the archetype coefficients) of AA live.
+"""
+
+from typing import Literal
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+PARTIAL_SORT_SIZE = 64
+
+
+def project_simplex(
+    X: ArrayLike,
+    axis: int = -1,
+    method: Literal["sort", "partial"] = "sort",
+) -> np.ndarray:
+    """
+    Project vectors onto the unit simplex, all at once.
+
+    The Euclidean projection of ``x`` is ``max(x - theta, 0)``, where the
+    threshold ``theta`` makes it sum to one. The thresholds of all vectors are
+    found together, with vectorized operations only.
+
+    Parameters
+    ----------
+    X : array-like of any shape
+        The vectors to project, e.g. of shape (n_samples, n_archetypes), or a
+        stack of such arrays.
+    axis : int, default=-1
+        The axis along which the vectors lie: ``-1`` projects the rows of a 2-D
+        array, ``0`` its columns.
+    method : {"sort", "partial"}, default="sort"
+        How the thresholds are found.
+        ``"sort"`` sorts each vector (Held et al.), in ``O(d log d)`` per vector
+        of length ``d``.
+        ``"partial"`` only sorts the `PARTIAL_SORT_SIZE` largest entries of each
+        vector, found by partitioning in ``O(d)``, and falls back to ``"sort"``
+        for the vectors whose projection has more non-zero entries. It is
+        faster for long vectors with sparse projections, such as the archetype
+        coefficients (``B``) of AA, and slower otherwise.
+
+    Returns
+    -------
+    projection : ndarray of the same shape as `X`
+        The projected vectors.
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 0:
+        raise ValueError("X must have at least one dimension")
+    moved = np.moveaxis(X, axis, -1)
+    V = moved.reshape(-1, moved.shape[-1])
+    if method == "sort":
+        theta = _sort_thresholds(V)
+    elif method == "partial":
+        theta = _partial_sort_thresholds(V, PARTIAL_SORT_SIZE)
+    else:
+        raise ValueError("method must be either 'sort' or 'partial'")
+    projection = np.maximum(V - theta[:, None], 0.0)
+    return np.moveaxis(projection.reshape(moved.shape), -1, axis)
+
+
+def _sort_thresholds(V: np.ndarray) -> np.ndarray:
+    """
+    Thresholds of the rows of `V` by sorting them in decreasing order.
+    """
+    d = V.shape[1]
+    U = -np.sort(-V, axis=1)
+    cumsum = np.cumsum(U, axis=1) - 1.0
+    index = np.arange(1, d + 1)
+    # the number of entries above the threshold is the last k with
+    # u_k > (u_1 + ... + u_k - 1) / k
+    rho = np.count_nonzero(U * index > cumsum, axis=1)
+    return cumsum[np.arange(len(V)), rho - 1] / rho
+
+
+def _partial_sort_thresholds(V: np.ndarray, size: int) -> np.ndarray:
+    """
+    Thresholds of the rows of `V` from their `size` largest entries. The
+    threshold of the largest entries is the one of the whole row if the next
+    entry is below it; the other rows are sorted entirely.
+    """
+    d = V.shape[1]
+    if size >= d:
+        return _sort_thresholds(V)
+    parts = np.partition(V, (d - size - 1, d - size), axis=1)
+    theta = _sort_thresholds(parts[:, d - size :])
+    failed = np.flatnonzero(parts[:, d - size - 1] > theta)
+    if failed.size:
+        theta[failed] = _sort_thresholds(V[failed])
+    return theta
@@ -0,0 +1,701 @@
+"""
+Utilities for writing and reading abundance and residual maps.
+
+Maps are stored as memory-mapped images of shape (lines, samples, bands), either
+as ``.npy`` files, with the band names in a JSON sidecar, or as ENVI images,
+with the band names in the ``.hdr`` header. Pixels are written chunk by chunk,
+so a scene never has to be held in memory (or converted to text) at once.
+
+Mixing proportions dominated by a few endmembers per sample can also be stored
+compactly, as the quantized top-k entries of each sample (`TopKAbundances`),
+and input images with 16 bits per value, with a gain and an offset per band
+(`quantize_cube`, read back with `QuantizedCube`).
+"""
+
+import json
+from os import PathLike
+from pathlib import Path
+from typing import Iterable, Literal
+import numpy as np
+from numpy.typing import ArrayLike, DTypeLike
+from .profiling import profiled
+
+FileFormat = Literal["npy", "envi"]
+
+
+class MapWriter:
+    """
+    Write a (lines, samples, bands) map into a preallocated memory-mapped file,
+    one chunk of pixels at a time.
+
+    Pixels are addressed in raster order (row by row), as in the reshaped
+    ``(lines * samples, bands)`` tables used for fitting.
+
+    Parameters
+    ----------
+    path : str or path-like
+        The output file. ``.npy`` for a NumPy file; ``.hdr`` (or ``.img``) for
+        an ENVI image, whose data is written to the ``.img`` file next to the
+        header.
+    spatial_shape : tuple of int
+        ``(lines, samples)``.
+    band_names : iterable of str
+        The name of each band, e.g. the endmember names.
+    file_format : {"npy", "envi"}, default=None
+        Inferred from the suffix of `path` if None.
+    dtype : data-type, default=np.float32
+        The data type of the stored values.
+    metadata : dict, optional
+        Further entries of the JSON sidecar, or of the ENVI header, where the
+        underscores of the keys are replaced by spaces (e.g.
+        ``data_gain_values`` is written as ``data gain values``).
+
+    Attributes
+    ----------
+    array : numpy.memmap of shape (lines, samples, bands)
+        The mapped image.
+    band_names : list of str
+        The band names.
+    """
+
+    def __init__(
+        self,
+        path: str | PathLike,
+        spatial_shape: tuple[int, int],
+        band_names: Iterable[str],
+        *,
+        file_format: FileFormat | None = None,
+        dtype: DTypeLike = np.float32,
+        metadata: dict | None = None,
+    ) -> None:
+        self.band_names = [str(name) for name in band_names]
+        metadata = {} if metadata is None else metadata
+        self.file_format = _infer_format(path, file_format)
+        lines, samples = spatial_shape
+        shape = (lines, samples, len(self.band_names))
+        if self.file_format == "npy":
+            self.path = Path(path)
+            self.array = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=dtype, shape=shape
+            )
+            _sidecar_path(self.path).write_text(
+                json.dumps(
+                    {
+                        "spatial_shape": [lines, samples],
+                        "band_names": self.band_names,
+                        **metadata,
+                    },
+                    indent=2,
+                )
+            )
+        else:
+            import spectral.io.envi as envi
+
+            self.path = Path(path).with_suffix(".hdr")
+            image = envi.create_image(
+                str(self.path),
+                {
+                    "band names": self.band_names,
+                    **{key.replace("_", " "): value for key, value in metadata.items()},
+                },
+                shape=shape,
+                dtype=dtype,
+                interleave="bip",
+                force=True,
+            )
+            self.array = image.open_memmap(writable=True)
+        self._pixels = self.array.reshape(-1, shape[2])
+
+    def write(self, start: int, values: ArrayLike) -> None:
+        """
+        Write the values of consecutive pixels.
+
+        Parameters
+        ----------
+        start : int
+            The raster index of the first pixel.
+        values : array-like of shape (n_pixels, bands)
+            The values of the pixels.
+        """
+        values = np.asarray(values)
+        if values.ndim != 2 or values.shape[1] != self._pixels.shape[1]:
+            raise ValueError(
+                f"values must have shape (n_pixels, {self._pixels.shape[1]}), "
+                f"got {values.shape}"
+            )
+        if start < 0 or start + len(values) > len(self._pixels):
+            raise ValueError(
+                f"pixels {start} to {start + len(values)} are out of range "
+                f"for {len(self._pixels)} pixels"
+            )
+        self._pixels[start : start + len(values)] = values
+
+    def flush(self) -> None:
+        """
+        Write the changes to disk.
+        """
+        self.array.flush()
+
+    def close(self) -> None:
+        """
+        Flush and release the mapped file.
+        """
+        if self.array is not None:
+            self.flush()
+            self.array = self._pixels = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+@profiled("unmix")
+def write_maps(
+    aa,
+    X: ArrayLike,
+    path: str | PathLike,
+    spatial_shape: tuple[int, int],
+    *,
+    endmember_names: Iterable[str] | None = None,
+    residuals: bool = True,
+    chunk_size: int = 65536,
+    file_format: FileFormat | None = None,
+    dtype: DTypeLike = np.float32,
+) -> Path:
+    """
+    Unmix the pixels of a scene with a fitted AA and stream the abundance maps
+    (and the residual map) to a memory-mapped file.
+
+    Parameters
+    ----------
+    aa : AA or ReducedAA
+        A fitted object, with `transform` and `archetypes_`.
+    X : array-like of shape (lines * samples, n_features) or (lines, samples, n_features)
+        The pixels in raster order. A memory-mapped array is read chunk by
+        chunk.
+    path : str or path-like
+        The output file, see `MapWriter`.
+    spatial_shape : tuple of int
+        ``(lines, samples)``.
+    endmember_names : iterable of str, default=None
+        The names of the abundance bands. ``EM1``, ``EM2``, ... by default.
+    residuals : bool, default=True
+        Whether to add a last band, ``residual``, holding the Euclidean norm of
+        the residual of each pixel.
+    chunk_size : int, default=65536
+        The number of pixels unmixed and written at a time.
+    file_format : {"npy", "envi"}, default=None
+        Inferred from the suffix of `path` if None.
+    dtype : data-type, default=np.float32
+        The data type of the stored values.
+
+    Returns
+    -------
+    path : Path
+        The written file (the header, for ENVI images).
+    """
+    n_features = np.shape(X)[-1]
+    X = np.reshape(X, (-1, n_features))
+    if len(X) != spatial_shape[0] * spatial_shape[1]:
+        raise ValueError(
+            f"{len(X)} pixels do not match the spatial shape {tuple(spatial_shape)}"
+        )
+    archetypes = np.asarray(aa.archetypes_)
+    if endmember_names is None:
+        endmember_names = [f"EM{i + 1}" for i in range(len(archetypes))]
+    band_names = list(endmember_names) + (["residual"] if residuals else [])
+
+    with MapWriter(
+        path, spatial_shape, band_names, file_format=file_format, dtype=dtype
+    ) as writer:
+        for start in range(0, len(X), chunk_size):
+            chunk = np.asarray(X[start : start + chunk_size], dtype=float)
+            A = aa.transform(chunk)
+            if residuals:
+                residual_norm = np.linalg.norm(chunk - A @ archetypes, axis=1)
+                A = np.column_stack([A, residual_norm])
+            writer.write(start, A)
+    return writer.path
+
+
+def read_maps(
+    path: str | PathLike, *, file_format: FileFormat | None = None
+) -> tuple[np.memmap, list[str]]:
+    """
+    Open a map written by `MapWriter` (or any ENVI image) read-only.
+
+    Parameters
+    ----------
+    path : str or path-like
+        The ``.npy`` file or the ENVI header.
+    file_format : {"npy", "envi"}, default=None
+        Inferred from the suffix of `path` if None.
+
+    Returns
+    -------
+    array : numpy.memmap of shape (lines, samples, bands)
+        The mapped image.
+    band_names : list of str
+        The band names (``Band 1``, ``Band 2``, ... if none are stored).
+    """
+    file_format = _infer_format(path, file_format)
+    if file_format == "npy":
+        array = np.load(path, mmap_mode="r")
+        sidecar = _sidecar_path(Path(path))
+        if sidecar.exists():
+            band_names = json.loads(sidecar.read_text())["band_names"]
+        else:
+            band_names = None
+    else:
+        import spectral
+
+        image = spectral.open_image(str(Path(path).with_suffix(".hdr")))
+        array = image.open_memmap(interleave="bip")
+        band_names = image.metadata.get("band names")
+    if band_names is None:
+        band_names = [f"Band {i + 1}" for i in range(array.shape[-1])]
+    return array, band_names
+
+
+@profiled("preprocess")
+def quantize_cube(
+    cube: ArrayLike,
+    path: str | PathLike,
+    *,
+    band_names: Iterable[str] | None = None,
+    dtype: DTypeLike = np.uint16,
+    chunk_size: int = 65536,
+    file_format: FileFormat | None = None,
+) -> dict:
+    """
+    Store an image (e.g. reflectances) with 16 bits per value, with the gain
+    and offset of each band in the header, to be read with `QuantizedCube`.
+
+    With ``uint16``, the range of each band is mapped to the integers 0 to
+    65535, so that the error is at most 1/131070 of the range of the band.
+    With ``float16``, each band is divided by its largest absolute value, so
+    that the relative error is at most ``2 ** -11``; it can only be stored as
+    ``.npy``, as ENVI has no 16-bit float type.
+
+    Parameters
+    ----------
+    cube : array-like of shape (lines, samples, bands)
+        The image, e.g. a memory-mapped image opened with `read_maps`. It is
+        read twice, by chunks of pixels: once for the ranges of the bands, and
+        once to convert it.
+    path : str or path-like
+        The output file, see `MapWriter`.
+    band_names : iterable of str, optional
+        The band names. ``Band 1``, ``Band 2``, ... by default.
+    dtype : {np.uint16, np.float16}, default=np.uint16
+        The data type of the stored values.
+    chunk_size : int, default=65536
+        The number of pixels converted at a time.
+    file_format : {"npy", "envi"}, default=None
+        Inferred from the suffix of `path` if None.
+
+    Returns
+    -------
+    report : dict
+        The written file (``path``, the header for ENVI images), the sizes of
+        the stored and original values in bytes (``nbytes`` and
+        ``source_nbytes``), and the error of the stored values against the
+        original ones: the largest absolute error of each band
+        (``band_max_error``, ndarray of shape (bands,)), over all bands
+        (``max_error``) and the root mean squared error (``rmse``).
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.uint16, np.float16):
+        raise ValueError(f"dtype must be either uint16 or float16, not {dtype}")
+    if dtype == np.float16 and _infer_format(path, file_format) != "npy":
+        raise ValueError("float16 images can only be stored as .npy files")
+    if np.ndim(cube) != 3:
+        raise ValueError(
+            f"cube must have shape (lines, samples, bands), not {np.shape(cube)}"
+        )
+    lines, samples, n_bands = np.shape(cube)
+    pixels = np.reshape(cube, (-1, n_bands))
+    if band_names is None:
+        band_names = [f"Band {i + 1}" for i in range(n_bands)]
+
+    low = np.full(n_bands, np.inf)
+    high = np.full(n_bands, -np.inf)
+    for start in range(0, len(pixels), chunk_size):
+        chunk = np.asarray(pixels[start : start + chunk_size], dtype=float)
+        low = np.minimum(low, chunk.min(axis=0))
+        high = np.maximum(high, chunk.max(axis=0))
+    if dtype == np.uint16:
+        offset = low
+        gain = (high - low) / np.iinfo(np.uint16).max
+    else:
+        offset = np.zeros(n_bands)
+        gain = np.maximum(np.abs(low), np.abs(high))
+    # constant bands are stored exactly by their offset
+    gain[gain == 0] = 1.0
+
+    band_max_error = np.zeros(n_bands)
+    squared_error = 0.0
+    with MapWriter(
+        path,
+        (lines, samples),
+        band_names,
+        file_format=file_format,
+        dtype=dtype,
+        metadata={
+            "data_gain_values": gain.tolist(),
+            "data_offset_values": offset.tolist(),
+        },
+    ) as writer:
+        for start in range(0, len(pixels), chunk_size):
+            chunk = np.asarray(pixels[start : start + chunk_size], dtype=float)
+            scaled = (chunk - offset) / gain
+            if dtype == np.uint16:
+                scaled = np.clip(np.rint(scaled), 0, np.iinfo(np.uint16).max)
+            stored = scaled.astype(dtype)
+            error = stored * gain + offset - chunk
+            band_max_error = np.maximum(band_max_error, np.abs(error).max(axis=0))
+            squared_error += float(np.square(error).sum())
+            writer.write(start, stored)
+    source_dtype = np.dtype(getattr(cube, "dtype", float))
+    return {
+        "path": writer.path,
+        "nbytes": pixels.size * dtype.itemsize,
+        "source_nbytes": pixels.size * source_dtype.itemsize,
+        "band_max_error": band_max_error,
+        "max_error": float(band_max_error.max(initial=0.0)),
+        "rmse": float(np.sqrt(squared_error / max(pixels.size, 1))),
+    }
+
+
+class QuantizedCube:
+    """
+    An image written by `quantize_cube`, dequantized when read.
+
+    The stored values stay memory-mapped: indexing (``cube[i]``, ``cube[a:b]``,
+    ...) and `pixels` only read and dequantize the selected values, into
+    `dtype`, so a scene can be processed row by row or chunk by chunk with half
+    the reads of ``float32`` values. `numpy.asarray` dequantizes it all.
+
+    Parameters
+    ----------
+    raw : ndarray of shape (lines, samples, bands)
+        The stored values, usually memory-mapped.
+    gain, offset : ndarray of shape (bands,)
+        The values are ``raw * gain + offset``.
+    band_names : list of str, optional
+        The band names.
+    dtype : data-type, default=np.float32
+        The data type of the dequantized values.
+
+    Attributes
+    ----------
+    shape : tuple of int
+        ``(lines, samples, bands)``.
+    nbytes : int
+        The size of the stored values in bytes.
+    """
+
+    ndim = 3
+
+    def __init__(
+        self,
+        raw: np.ndarray,
+        gain: ArrayLike,
+        offset: ArrayLike,
+        *,
+        band_names: list[str] | None = None,
+        dtype: DTypeLike = np.float32,
+    ) -> None:
+        if raw.ndim != 3:
+            raise ValueError(
+                f"raw must have shape (lines, samples, bands), not {raw.shape}"
+            )
+        self.raw = raw
+        self.dtype = np.dtype(dtype)
+        self.gain = np.asarray(gain, dtype=self.dtype)
+        self.offset = np.asarray(offset, dtype=self.dtype)
+        if self.gain.shape != (raw.shape[2],) or self.offset.shape != (raw.shape[2],):
+            raise ValueError(
+                f"gain {self.gain.shape} and offset {self.offset.shape} must have "
+                f"one value per band ({raw.shape[2]})"
+            )
+        self.band_names = band_names
+
+    @classmethod
+    def load(
+        cls,
+        path: str | PathLike,
+        *,
+        dtype: DTypeLike = np.float32,
+        file_format: FileFormat | None = None,
+    ) -> "QuantizedCube":
+        """
+        Open a file written by `quantize_cube` read-only.
+        """
+        file_format = _infer_format(path, file_format)
+        raw, band_names = read_maps(path, file_format=file_format)
+        if file_format == "npy":
+            sidecar = _sidecar_path(Path(path))
+            header = json.loads(sidecar.read_text()) if sidecar.exists() else {}
+        else:
+            import spectral
+
+            image = spectral.open_image(str(Path(path).with_suffix(".hdr")))
+            header = {
+                key.replace(" ", "_"): value for key, value in image.metadata.items()
+            }
+        if "data_gain_values" not in header or "data_offset_values" not in header:
+            raise ValueError(f"{str(path)!r} has no data gain and offset values")
+        return cls(
+            raw,
+            np.asarray(header["data_gain_values"], dtype=float),
+            np.asarray(header["data_offset_values"], dtype=float),
+            band_names=band_names,
+            dtype=dtype,
+        )
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.raw.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.raw.nbytes
+
+    def __getitem__(self, key) -> np.ndarray:
+        # the gain and offset of each selected value, without copying them
+        # to the shape of the image
+        gain = np.broadcast_to(self.gain, self.shape)[key]
+        offset = np.broadcast_to(self.offset, self.shape)[key]
+        values = np.asarray(self.raw[key]).astype(self.dtype)
+        values *= gain
+        values += offset
+        return values
+
+    def pixels(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """
+        Return the values of the pixels `start` to `stop`, in raster order, as
+        an array of shape (n_pixels, bands).
+        """
+        raw = self.raw.reshape(-1, self.shape[2])[start:stop]
+        values = raw.astype(self.dtype)
+        values *= self.gain
+        values += self.offset
+        return values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.pixels().reshape(self.shape)
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+
+class TopKAbundances:
+    """
+    Mixing proportions stored as the `k` largest entries of each sample,
+    quantized to ``uint16`` on the simplex.
+
+    The entries kept for each sample are rescaled to sum to one and rounded to
+    multiples of ``1 / 65535`` by the largest remainder method, so that their
+    integer values sum to exactly 65535 and the reconstructed proportions sum
+    to one. A sample then takes ``k * 3`` bytes (``k * 4`` with more than 256
+    endmembers) instead of ``n_endmembers * 8``. The error is that of the
+    dropped entries plus at most ``1 / 65535`` per entry, and is reported as
+    `max_error`.
+
+    Build it with `from_dense`, and get the proportions back with `to_dense`
+    or `numpy.asarray`.
+
+    Parameters
+    ----------
+    indices : ndarray of shape (n_samples, k)
+        The endmember of each kept entry.
+    values : ndarray of uint16 of shape (n_samples, k)
+        The quantized kept entries, summing to 65535 in each sample.
+    n_endmembers : int
+        The number of endmembers.
+    endmember_names : list of str, optional
+        The name of each endmember.
+    max_error : float, optional
+        The largest absolute error of an entry, if known.
+
+    Attributes
+    ----------
+    nbytes : int
+        The size of the indices and values in bytes.
+    """
+
+    SCALE = np.iinfo(np.uint16).max
+
+    def __init__(
+        self,
+        indices: np.ndarray,
+        values: np.ndarray,
+        n_endmembers: int,
+        *,
+        endmember_names: list[str] | None = None,
+        max_error: float | None = None,
+    ) -> None:
+        if indices.shape != values.shape or indices.ndim != 2:
+            raise ValueError(
+                f"indices {indices.shape} and values {values.shape} must be 2D "
+                "with the same shape."
+            )
+        self.indices = indices
+        self.values = values
+        self.n_endmembers = n_endmembers
+        self.endmember_names = endmember_names
+        self.max_error = max_error
+
+    @classmethod
+    def from_dense(
+        cls,
+        A: ArrayLike,
+        k: int = 2,
+        *,
+        endmember_names: Iterable[str] | None = None,
+        chunk_size: int = 65536,
+    ) -> "TopKAbundances":
+        """
+        Keep and quantize the `k` largest proportions of each sample.
+
+        Parameters
+        ----------
+        A : array-like of shape (n_samples, n_endmembers)
+            The mixing proportions, e.g. a memory-mapped map or a DataFrame
+            (whose columns are used as `endmember_names`). Read by chunks.
+        k : int, default=2
+            The number of entries kept per sample.
+        endmember_names : iterable of str, optional
+            The name of each endmember.
+        chunk_size : int, default=65536
+            The number of samples converted at a time.
+        """
+        if endmember_names is None and hasattr(A, "columns"):
+            endmember_names = A.columns
+        if not isinstance(A, np.ndarray):
+            A = np.asarray(A, dtype=float)
+        n_samples, n_endmembers = A.shape
+        k = min(k, n_endmembers)
+        index_dtype = np.uint8 if n_endmembers <= 256 else np.uint16
+        indices = np.empty((n_samples, k), dtype=index_dtype)
+        values = np.empty((n_samples, k), dtype=np.uint16)
+        max_error = 0.0
+        for start in range(0, n_samples, chunk_size):
+            chunk = np.asarray(A[start : start + chunk_size], dtype=float)
+            top = np.argpartition(-chunk, k - 1, axis=1)[:, :k]
+            quantized = _quantize_simplex(np.take_along_axis(chunk, top, axis=1))
+            indices[start : start + len(chunk)] = top
+            values[start : start + len(chunk)] = quantized
+            # dropped entries are lost, kept ones are off by their quantization
+            error = chunk.copy()
+            kept = np.take_along_axis(chunk, top, axis=1) - quantized / cls.SCALE
+            np.put_along_axis(error, top, kept, axis=1)
+            if error.size:
+                max_error = max(max_error, float(np.abs(error).max()))
+        return cls(
+            indices,
+            values,
+            n_endmembers,
+            endmember_names=(
+                None if endmember_names is None else list(endmember_names)
+            ),
+            max_error=max_error,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.indices.nbytes + self.values.nbytes
+
+    def to_dense(
+        self, start: int = 0, stop: int | None = None, dtype: DTypeLike = float
+    ) -> np.ndarray:
+        """
+        Return the proportions of samples `start` to `stop` as a dense array
+        of shape (n_samples, n_endmembers).
+        """
+        indices = self.indices[start:stop]
+        dense = np.zeros((len(indices), self.n_endmembers), dtype=dtype)
+        values = self.values[start:stop] * (1 / self.SCALE)
+        np.put_along_axis(dense, indices.astype(np.intp), values, axis=1)
+        return dense
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_dense(dtype=float if dtype is None else dtype)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def save(self, path: str | PathLike) -> Path:
+        """
+        Save to an uncompressed ``.npz`` file, and return its path.
+        """
+        path = Path(path).with_suffix(".npz")
+        np.savez(
+            path,
+            indices=self.indices,
+            values=self.values,
+            n_endmembers=self.n_endmembers,
+            endmember_names=np.array(self.endmember_names or [], dtype=str),
+            max_error=np.nan if self.max_error is None else self.max_error,
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: str | PathLike) -> "TopKAbundances":
+        """
+        Load a file written by `save`.
+        """
+        with np.load(path) as data:
+            max_error = float(data["max_error"])
+            return cls(
+                data["indices"],
+                data["values"],
+                int(data["n_endmembers"]),
+                endmember_names=[str(n) for n in data["endmember_names"]] or None,
+                max_error=None if np.isnan(max_error) else max_error,
+            )
+
+
+def _quantize_simplex(values: np.ndarray) -> np.ndarray:
+    """
+    Rescale each row of nonnegative `values` to sum to `TopKAbundances.SCALE`
+    and round it to integers with the same sum, by the largest remainder
+    method.
+    """
+    scale = TopKAbundances.SCALE
+    values = np.maximum(values, 0.0)
+    totals = values.sum(axis=1, keepdims=True)
+    # rows without mass are spread evenly
+    values = np.where(totals > 0, values, 1.0)
+    totals = np.where(totals > 0, totals, values.shape[1])
+    scaled = values * (scale / totals)
+    quantized = np.floor(scaled)
+    remainders = scale - quantized.sum(axis=1, keepdims=True)
+    # rank 0 is the largest fractional part of the row
+    ranks = np.argsort(np.argsort(quantized - scaled, axis=1), axis=1)
+    quantized += ranks < remainders
+    return quantized.astype(np.uint16)
+
+
+def _infer_format(path, file_format: FileFormat | None) -> FileFormat:
+    if file_format is None:
+        suffix = Path(path).suffix.lower()
+        if suffix == ".npy":
+            return "npy"
+        if suffix in (".hdr", ".img"):
+            return "envi"
+        raise ValueError(
+            f"Cannot infer the file format from {str(path)!r}; "
+            "use a .npy, .hdr or .img suffix or pass file_format"
+        )
+    if file_format not in ("npy", "envi"):
+        raise ValueError("file_format must be either 'npy' or 'envi'")
+    return file_format
+
+
+def _sidecar_path(path: Path) -> Path:
+    return path.with_suffix(".json")
@@ -1,14 +1,21 @@
 """
 Utilities for generating synthetic data.
+
+pandas and scikit-learn are only imported when needed, so that worker
+processes generating arrays start quickly.
 """
 
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
 import numpy as np
 from numpy.typing import ArrayLike
-import pandas as pd
-from sklearn.utils import check_random_state
+from .profiling import profiled
+
+DEFAULT_CHUNK_SIZE = 65536
 
 
+@profiled("synthetic")
 def synthetic(
     n_samples: int,
     *,
@@ -17,7 +24,11 @@ def synthetic(
     untertainty_type: str = "normal",
     dirichlet_alpha: float = 1,
     sample_noise: float | ArrayLike = 0,
-    random_state: int | np.random.RandomState | None = None,
+    random_state: (
+        int | np.random.RandomState | np.random.Generator | np.random.SeedSequence | None
+    ) = None,
+    chunk_size: int | None = None,
+    n_jobs: int | None = None,
 ):
     """
     Generate synthetic data with noise.
@@ -44,8 +55,22 @@ def synthetic(
     sample_noise : float or array-like of shape (n_features,), default=0
         Standard deviation of Gaussian noise added to each sample.
         If array-like, each feature has its own noise level.
-    random_state : int or RandomState or None, default=None
+    random_state : int, RandomState, Generator, SeedSequence or None, default=None
         Random seed or random number generator.
+        Without chunking, an int seeds a legacy ``RandomState``, so that the
+        datasets in ``data/synthetic`` are reproduced.
+    chunk_size : int, default=None
+        If given (or if `n_jobs` is given), generate the samples in chunks of
+        this many rows, each from an independent child stream spawned from
+        ``SeedSequence(random_state)`` (or from the given Generator or
+        SeedSequence). The output only depends on the seed and `chunk_size`,
+        not on `n_jobs`. Spawning advances a given Generator or SeedSequence,
+        so passing it again gives new data; pass an int to reproduce a
+        dataset. A RandomState cannot be split and is not accepted.
+        Default is 65536 rows when `n_jobs` is given.
+    n_jobs : int, default=None
+        Number of threads filling the chunks. Default is the number of CPUs
+        when `chunk_size` is given.
 
     Returns
     -------
@@ -55,42 +80,264 @@ def synthetic(
         Mixing proportions.
     """
     results_to_dataframe = False
-    if isinstance(endmembers, pd.DataFrame):
+    if _is_dataframe(endmembers):
         results_to_dataframe = True
         feature_names = endmembers.columns
         endmember_names = endmembers.index
 
-    rng = check_random_state(random_state)
-
     endmembers = np.asarray(endmembers, dtype=float)
-    n_endmembers = endmembers.shape[0]
+    n_endmembers, n_features = endmembers.shape
+    if endmember_uncertainty is not None:
+        endmember_uncertainty = np.asarray(endmember_uncertainty)
+    if untertainty_type not in ("normal", "uniform"):
+        raise ValueError("Invalid uncertainty type.")
+
+    X = np.empty((n_samples, n_features))
+    proportions = np.empty((n_samples, n_endmembers))
+
+    def fill(rng, rows):
+        _fill_samples(
+            rng,
+            X[rows],
+            proportions[rows],
+            endmembers,
+            endmember_uncertainty,
+            untertainty_type,
+            dirichlet_alpha,
+            sample_noise,
+        )
+
+    if chunk_size is None and n_jobs is None:
+        fill(_check_random_state(random_state), slice(None))
+    else:
+        chunk_size = DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, not {chunk_size}.")
+        starts = range(0, n_samples, chunk_size)
+        rngs = _spawn_generators(random_state, len(starts))
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(
+                executor.map(
+                    lambda start, rng: fill(rng, slice(start, start + chunk_size)),
+                    starts,
+                    rngs,
+                )
+            )
+
+    if results_to_dataframe:
+        import pandas as pd
+
+        X = pd.DataFrame(data=X, columns=feature_names)
+        proportions = pd.DataFrame(data=proportions, columns=endmember_names)
 
-    proportions = rng.dirichlet(np.ones(n_endmembers) * dirichlet_alpha, n_samples)
+    return X, proportions
+
+
+def _fill_samples(
+    rng,
+    X,
+    proportions,
+    endmembers,
+    endmember_uncertainty,
+    untertainty_type,
+    dirichlet_alpha,
+    sample_noise,
+):
+    """Fill views of the output arrays in place, drawing from `rng`."""
+    n_samples = X.shape[0]
+    n_endmembers = endmembers.shape[0]
+    proportions[:] = rng.dirichlet(np.ones(n_endmembers) * dirichlet_alpha, n_samples)
 
     if endmember_uncertainty is None:
-        X = proportions @ endmembers
+        np.matmul(proportions, endmembers, out=X)
     else:
-        endmember_uncertainty = np.asarray(endmember_uncertainty)
         if untertainty_type == "uniform":
             endmembers_noisy = rng.uniform(
                 endmembers - endmember_uncertainty,
                 endmembers + endmember_uncertainty,
                 (n_samples, *endmembers.shape),
             )
-        elif untertainty_type == "normal":
+        else:
             endmembers_noisy = rng.normal(
                 endmembers, endmember_uncertainty, (n_samples, *endmembers.shape)
             )
-        else:
-            raise ValueError("Invalid uncertainty type.")
+        np.einsum("ij,ijk->ik", proportions, endmembers_noisy, out=X)
 
-        X = np.einsum("ij,ijk->ik", proportions, endmembers_noisy)
+    X += rng.normal(0, sample_noise, X.shape)
 
-    noise = rng.normal(0, sample_noise, X.shape)
-    X += noise
 
-    if results_to_dataframe:
-        X = pd.DataFrame(data=X, columns=feature_names)
-        proportions = pd.DataFrame(data=proportions, columns=endmember_names)
+@profiled("synthetic")
+def synthetic_cube(
+    shape: tuple[int, int],
+    *,
+    endmembers: ArrayLike,
+    correlation_length: float = 20.0,
+    contrast: float = 3.0,
+    sample_noise: float | ArrayLike = 0,
+    n_frequencies: int = 128,
+    path=None,
+    proportions_path=None,
+    dtype=np.float32,
+    random_state: int | np.random.Generator | np.random.SeedSequence | None = None,
+    chunk_rows: int | None = None,
+    n_jobs: int | None = None,
+):
+    """
+    Generate a synthetic image whose mixing proportions vary smoothly in space.
+
+    For each endmember, a stationary Gaussian random field with a Gaussian
+    covariance of length `correlation_length` is drawn, approximated by
+    `n_frequencies` random Fourier features. The proportions of a pixel are the
+    softmax of ``contrast`` times its field values, so they lie on the simplex
+    and form patches of similar composition. Each pixel is the mixture of the
+    endmembers with these proportions, plus Gaussian noise.
 
+    The image is generated in chunks of rows, written directly to
+    memory-mapped files if `path` (and `proportions_path`) are given, so that
+    images larger than memory can be generated.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        ``(height, width)`` of the image, in pixels.
+    endmembers : array-like of shape (n_endmembers, n_features)
+        Endmembers. If a DataFrame, its index and columns name the bands of
+        the written files.
+    correlation_length : float, default=20.0
+        The length, in pixels, over which the proportions vary.
+    contrast : float, default=3.0
+        Higher values give purer pixels and sharper transitions; 0 gives
+        uniform proportions.
+    sample_noise : float or array-like of shape (n_features,), default=0
+        Standard deviation of Gaussian noise added to each pixel.
+        If array-like, each feature has its own noise level.
+    n_frequencies : int, default=128
+        The number of random Fourier features of each field.
+    path : str or path-like, default=None
+        The file to write the image to, a ``.npy`` file or an ENVI header (see
+        `endmember_utils.storage.MapWriter`). Kept in memory if None.
+    proportions_path : str or path-like, default=None
+        The file to write the mixing proportions to, likewise.
+    dtype : data-type, default=np.float32
+        The data type of the image and the proportions.
+    random_state : int, Generator, SeedSequence or None, default=None
+        Random seed or random number generator. The fields only depend on the
+        seed; the noise depends on the seed and `chunk_rows`.
+    chunk_rows : int, default=None
+        The number of rows generated at a time. Default is as many as fit in
+        `DEFAULT_CHUNK_SIZE` pixels.
+    n_jobs : int, default=None
+        Number of threads generating the chunks. Default is the number of CPUs.
+
+    Returns
+    -------
+    X : ndarray of shape (height, width, n_features)
+        The image, memory-mapped read-only if `path` is given.
+    proportions : ndarray of shape (height, width, n_endmembers)
+        The mixing proportions, memory-mapped read-only if `proportions_path`
+        is given.
+    """
+    from .storage import MapWriter, read_maps
+
+    height, width = shape
+    if _is_dataframe(endmembers):
+        feature_names = list(endmembers.columns)
+        endmember_names = list(endmembers.index)
+    else:
+        feature_names = endmember_names = None
+    endmembers = np.asarray(endmembers, dtype=float)
+    n_endmembers, n_features = endmembers.shape
+    if feature_names is None:
+        feature_names = [f"Band {i + 1}" for i in range(n_features)]
+        endmember_names = [f"EM{i + 1}" for i in range(n_endmembers)]
+    if chunk_rows is None:
+        chunk_rows = max(1, DEFAULT_CHUNK_SIZE // width)
+    elif chunk_rows <= 0:
+        raise ValueError(f"chunk_rows must be positive, not {chunk_rows}.")
+
+    starts = range(0, height, chunk_rows)
+    field_rng, *rngs = _spawn_generators(random_state, len(starts) + 1)
+    # random Fourier features: each field is
+    # sqrt(2 / F) * sum_f z_f * cos(w_f . (row, column) + phase_f)
+    frequencies = field_rng.normal(0, 1 / correlation_length, (n_frequencies, 2))
+    phases = field_rng.uniform(0, 2 * np.pi, n_frequencies)
+    weights = field_rng.normal(
+        0, np.sqrt(2 / n_frequencies), (n_frequencies, n_endmembers)
+    )
+    columns = np.arange(width)[:, None] * frequencies[:, 1]
+    cos_columns, sin_columns = np.cos(columns), np.sin(columns)
+
+    def _open_writer(file, band_names, n_bands):
+        if file is None:
+            return None, np.empty((height, width, n_bands), dtype=dtype)
+        map_writer = MapWriter(file, shape, band_names, dtype=dtype)
+        return map_writer, map_writer.array
+
+    X_writer, X = _open_writer(path, feature_names, n_features)
+    proportions_writer, proportions = _open_writer(
+        proportions_path, endmember_names, n_endmembers
+    )
+
+    def fill(start, rng):
+        rows = np.arange(start, min(start + chunk_rows, height))[:, None]
+        rows = rows * frequencies[:, 0] + phases
+        cos_rows, sin_rows = np.cos(rows), np.sin(rows)
+        # cos(a + b) = cos(a) cos(b) - sin(a) sin(b), summed over the features
+        fields = np.stack(
+            [
+                (cos_rows * w) @ cos_columns.T - (sin_rows * w) @ sin_columns.T
+                for w in weights.T
+            ],
+            axis=-1,
+        )
+        fields *= contrast
+        fields -= fields.max(axis=-1, keepdims=True)
+        chunk_proportions = np.exp(fields, out=fields)
+        chunk_proportions /= chunk_proportions.sum(axis=-1, keepdims=True)
+        chunk = chunk_proportions @ endmembers
+        chunk += rng.normal(0, sample_noise, chunk.shape)
+        X[start : start + len(chunk)] = chunk
+        proportions[start : start + len(chunk)] = chunk_proportions
+
+    try:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(fill, starts, rngs))
+    finally:
+        for map_writer in (X_writer, proportions_writer):
+            if map_writer is not None:
+                map_writer.close()
+
+    if path is not None:
+        X = read_maps(X_writer.path)[0]
+    if proportions_path is not None:
+        proportions = read_maps(proportions_writer.path)[0]
     return X, proportions
+
+
+def _is_dataframe(obj) -> bool:
+    # an object can only be a DataFrame if pandas has been imported
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(obj, pd.DataFrame)
+
+
+def _check_random_state(random_state):
+    if isinstance(random_state, np.random.Generator):
+        return random_state
+    if isinstance(random_state, np.random.SeedSequence):
+        return np.random.default_rng(random_state)
+    from sklearn.utils import check_random_state
+
+    return check_random_state(random_state)
+
+
+def _spawn_generators(random_state, n_streams: int) -> list[np.random.Generator]:
+    """Spawn independent child generators, one per chunk."""
+    if isinstance(random_state, np.random.Generator):
+        return random_state.spawn(n_streams)
+    if isinstance(random_state, np.random.RandomState):
+        raise ValueError("A RandomState cannot be split into independent streams.")
+    if isinstance(random_state, np.random.SeedSequence):
+        seed_sequence = random_state
+    else:
+        seed_sequence = np.random.SeedSequence(random_state)
+    return [np.random.default_rng(seed) for seed in seed_sequence.spawn(n_streams)]
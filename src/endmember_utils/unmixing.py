@@ -0,0 +1,209 @@
+"""
+Unmixing of pixels with fixed endmembers.
+
+The abundances of a pixel ``x`` are the point ``a`` of the unit simplex that
+minimizes ``||x - a @ endmembers||``. With a few endmembers, they are found
+exactly by an active set method: each iteration solves the least squares
+problem on the endmembers currently used (the support), all pixels at once,
+then drops the endmember blocking the step to that solution, or adds the one
+that most decreases the RSS, until none does. Only the (n_endmembers,
+n_endmembers) Gram matrix of the endmembers enters the iterations, so their
+cost does not depend on the number of bands, and a pixel usually needs one or
+a few iterations from the support of its projected least squares solution.
+
+`unmix_image` processes an image row by row, so that a memory-mapped image is
+never loaded whole.
+
+Starting each pixel from the solution of the pixel above it was evaluated and
+rejected: on the smooth scene of ``scripts/benchmarks/pixel_unmixing.py``, it
+takes 1.62 iterations per pixel against 1.51 from the least squares solution,
+and starting from the union of both supports takes 1.62 as well. Checking
+first whether the support of the neighbour is optimal for the pixel costs a
+solve on that support, i.e. as much as the first iteration it would save.
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike
+from archetypes.numpy._projection import unit_simplex_proj
+from .profiling import profiled
+
+
+@profiled("unmix")
+def unmix(
+    X: ArrayLike,
+    endmembers: ArrayLike,
+    *,
+    init: ArrayLike | None = None,
+    tol: float = 1e-9,
+    max_iter: int = 100,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the abundances of samples on the unit simplex spanned by fixed,
+    linearly independent endmembers.
+
+    Parameters
+    ----------
+    X : array-like of shape (n_samples, n_features)
+        The samples.
+    endmembers : array-like of shape (n_endmembers, n_features)
+        The endmembers, e.g. ``aa.archetypes_``.
+    init : array-like of shape (n_samples, n_endmembers), default=None
+        The initial abundances, e.g. those of similar samples, projected onto
+        the simplex; their non-zero entries are the initial support. The least
+        squares solution if None.
+    tol : float, default=1e-9
+        The decrease of the gradient of the RSS, relative to the largest
+        eigenvalue of the Gram matrix of the endmembers, below which an
+        endmember is not added to the support.
+    max_iter : int, default=100
+        The maximum number of iterations per sample.
+
+    Returns
+    -------
+    abundances : ndarray of shape (n_samples, n_endmembers)
+        The abundances.
+    n_iter : ndarray of shape (n_samples,)
+        The number of iterations run for each sample, `max_iter` for the
+        samples that did not converge.
+    """
+    X = np.asarray(X, dtype=float)
+    problem = _Problem(endmembers)
+    if init is None:
+        init = X @ problem.pinv
+    return problem.solve(X, init, tol, max_iter)
+
+
+@profiled("unmix")
+def unmix_image(
+    cube: ArrayLike,
+    endmembers: ArrayLike,
+    *,
+    tol: float = 1e-9,
+    max_iter: int = 100,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the abundances of the pixels of an image, row by row.
+
+    Parameters
+    ----------
+    cube : array-like of shape (lines, samples, n_features)
+        The image. A memory-mapped image is read one row at a time.
+    endmembers : array-like of shape (n_endmembers, n_features)
+        The endmembers, e.g. ``aa.archetypes_``.
+    tol : float, default=1e-9
+        See `unmix`.
+    max_iter : int, default=100
+        See `unmix`.
+
+    Returns
+    -------
+    abundances : ndarray of shape (lines, samples, n_endmembers)
+        The abundance maps.
+    n_iter : ndarray of shape (lines, samples)
+        The number of iterations run for each pixel, `max_iter` for the pixels
+        that did not converge.
+    """
+    if np.ndim(cube) != 3:
+        raise ValueError(
+            f"cube must have shape (lines, samples, bands), not {np.shape(cube)}"
+        )
+    problem = _Problem(endmembers)
+    lines, samples, _ = np.shape(cube)
+    abundances = np.empty((lines, samples, problem.n_endmembers))
+    n_iter = np.empty((lines, samples), dtype=int)
+    for i in range(lines):
+        X = np.asarray(cube[i], dtype=float)
+        abundances[i], n_iter[i] = problem.solve(X, X @ problem.pinv, tol, max_iter)
+    return abundances, n_iter
+
+
+class _Problem:
+    """
+    The quantities of the endmembers shared by all the pixels: the Gram matrix,
+    its largest eigenvalue (the scale of the gradients) and the pseudo-inverse.
+    """
+
+    def __init__(self, endmembers: ArrayLike) -> None:
+        self.endmembers = np.asarray(endmembers, dtype=float)
+        self.n_endmembers = len(self.endmembers)
+        self.gram = self.endmembers @ self.endmembers.T
+        self.scale = np.linalg.eigvalsh(self.gram)[-1]
+        self.pinv = np.linalg.pinv(self.endmembers)
+
+    def solve(self, X, init, tol, max_iter):
+        """
+        Run the active set method from `init`, on all the samples at once.
+        """
+        n_samples = len(X)
+        A = np.array(init, dtype=float, order="C")
+        unit_simplex_proj(A)
+        n_iter = np.full(n_samples, max_iter)
+        # the iterations only involve the active samples, converged ones are
+        # written back and dropped
+        active = np.arange(n_samples)
+        correlations = X @ self.endmembers.T
+        A_active = A.copy()
+        support = A_active > 0
+        for i in range(1, max_iter + 1):
+            Z = self._solve_support(correlations, support)
+            infeasible = np.any(support & (Z < 0), axis=1)
+            feasible = np.flatnonzero(~infeasible)
+            infeasible = np.flatnonzero(infeasible)
+
+            # feasible solutions: add the endmember whose abundance would
+            # decrease the RSS the most, if any
+            A_active[feasible] = Z[feasible]
+            gradient = A_active[feasible] @ self.gram - correlations[feasible]
+            on_support = support[feasible]
+            level = (gradient * on_support).sum(axis=1) / on_support.sum(axis=1)
+            violation = np.where(on_support, 0.0, gradient - level[:, None])
+            entering = violation.argmin(axis=1)
+            improvable = (
+                violation[np.arange(len(entering)), entering] < -tol * self.scale
+            )
+            support[feasible[improvable], entering[improvable]] = True
+            done = np.zeros(len(active), dtype=bool)
+            done[feasible[~improvable]] = True
+
+            # infeasible solutions: move towards them until an abundance
+            # reaches zero, and drop it from the support
+            if infeasible.size:
+                a, z = A_active[infeasible], Z[infeasible]
+                blocking = support[infeasible] & (z < 0)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratios = np.where(blocking, a / (a - z), np.inf)
+                leaving = ratios.argmin(axis=1)
+                alpha = ratios[np.arange(len(leaving)), leaving]
+                a += alpha[:, None] * (z - a)
+                a[np.arange(len(leaving)), leaving] = 0.0
+                a[a < 0] = 0.0
+                A_active[infeasible] = a
+                support[infeasible] = a > 0
+
+            if done.any():
+                A[active[done]] = A_active[done]
+                n_iter[active[done]] = i
+                keep = ~done
+                active, correlations = active[keep], correlations[keep]
+                A_active, support = A_active[keep], support[keep]
+                if not active.size:
+                    break
+        A[active] = A_active
+        return A, n_iter
+
+    def _solve_support(self, correlations, support):
+        """
+        Minimize the RSS of each sample over the abundances summing to one and
+        zero outside its support, by solving the KKT systems all at once.
+        """
+        n_samples, k = support.shape
+        s = support.astype(float)
+        system = np.zeros((n_samples, k + 1, k + 1))
+        system[:, :k, :k] = self.gram * (s[:, :, None] * s[:, None, :])
+        system[:, np.arange(k), np.arange(k)] += 1.0 - s
+        system[:, :k, k] = s
+        system[:, k, :k] = s
+        rhs = np.empty((n_samples, k + 1, 1))
+        rhs[:, :k, 0] = correlations * s
+        rhs[:, k, 0] = 1.0
+        return np.linalg.solve(system, rhs)[:, :k, 0]